@@ -2,18 +2,46 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
+import os
 import json
+import mimetypes
+import base64
+import atexit
+import functools
+import hashlib
+import concurrent.futures
+import random
+import time
+from datetime import datetime, timedelta
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
+import click
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, stream_with_context, jsonify, session, g, has_request_context, send_from_directory
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
-from sqlalchemy import or_
+from sqlalchemy import or_, any_
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 from forms import *
+import search
+import counters
+import schedule
+from choices import ChoiceLookup
+from facets import FacetCounts
+from matching import MatchIndex
+from images import ImageProxy, ImageError
+from tasks import TaskQueue
+from feed import HomeFeed, FeedItem, FeedSection
+from dates import DateFormatter
+from cache import PageCache
+from sqlstats import RequestStats, RecentRequests
+from importer import ImportSpec, Importer, read_records
+import exporter
+import assets
+from routing import RoutingSQLAlchemy, engine_options, replica_binds
+from plans import Fetch, run_plan
 from flask_migrate import Migrate
 import sys
 import collections
@@ -27,7 +55,16 @@ collections.Callable = collections.abc.Callable
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+    app.config['SQLALCHEMY_DATABASE_URI'], app.config['DB_POOL_SIZE'], app.config['DB_MAX_OVERFLOW'],
+    app.config['DB_POOL_TIMEOUT'], app.config['DB_POOL_RECYCLE'], app.config['DB_POOL_PRE_PING'],
+    app.config['DB_STATEMENT_TIMEOUT_MS']
+)
+REPLICA_BINDS = sorted(replica_binds(app.config['SQLALCHEMY_REPLICA_URIS']))
+app.config['SQLALCHEMY_BINDS'] = dict(
+    app.config.get('SQLALCHEMY_BINDS') or {}, **replica_binds(app.config['SQLALCHEMY_REPLICA_URIS'])
+)
+db = RoutingSQLAlchemy(app)
 migrate = Migrate(app, db)
 
 
@@ -35,8 +72,21 @@ migrate = Migrate(app, db)
 # Models.
 # ----------------------------------------------------------------------------#
 
+# Postgres column types, with plain fallbacks so the models also create on SQLite
+# test databases (where search runs against the in-process index).
+Genres = db.ARRAY(db.String(130)).with_variant(db.JSON(), 'sqlite')
+SearchVector = TSVECTOR().with_variant(db.Text(), 'sqlite')
+
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_state_city', 'state', 'city'),
+        db.Index('ix_Venue_name_id', 'name', 'id'),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_Venue_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -46,198 +96,1089 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String(130)))
+    genres = db.Column(Genres)
     website_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.Text, nullable=True)
-    shows = db.relationship('Show', backref='Venue', lazy=True, cascade='all, delete')
-
-    @property
-    def upcoming_shows(self):
-        upcoming_shows = [item for item in self.shows if item.start_time > datetime.now()]
-        return upcoming_shows
-
-    @property
-    def upcoming_shows_count(self):
-        return len(self.shows_to_come)
-
-    # @property
-    # def past_shows(self):
-    #     past_shows = [show for show in self.shows if show.start_time < datetime.now()]
-    #     return past_shows
-    #
-    # @property
-    # def num_past_shows(self):
-    #     return len(self.past_shows)
+    search_vector = db.deferred(db.Column(SearchVector))
+    shows = db.relationship('Show', backref='Venue', lazy=True, cascade='all, delete', passive_deletes=True)
+    # upcoming_shows_count and past_shows_count are added with SHOW_COUNTS.
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+        db.Index('ix_Artist_state_city', 'state', 'city'),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_Artist_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, unique=True, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.ARRAY(db.String(130)))
+    genres = db.Column(Genres)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.Text, nullable=True)
-    shows = db.relationship('Show', backref='Artist', lazy=True)
+    search_vector = db.deferred(db.Column(SearchVector))
+    shows = db.relationship('Show', backref='Artist', lazy=True, cascade='all, delete', passive_deletes=True)
+    # upcoming_shows_count and past_shows_count are added with SHOW_COUNTS.
 
-    @property
-    def upcoming_shows(self):
-        upcoming_shows = [show for show in self.shows if show.start_time > datetime.now()]
-        return upcoming_shows
 
-    @property
-    def upcoming_shows_count(self):
-        return len(self.upcoming_shows)
-
-    # @property
-    # def past_shows(self):
-    #     past_shows = [show for show in self.shows if show.start_time < datetime.now()]
-    #
-    #     return past_shows
-    #
-    # @property
-    # def num_past_shows(self):
-    #     return len(self.past_shows)
+def default_show_end_time(context):
+    # Shows inserted without an end time last SHOW_DEFAULT_MINUTES.
+    start_time = context.get_current_parameters()['start_time']
+    return start_time + timedelta(minutes=app.config['SHOW_DEFAULT_MINUTES'])
 
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('ix_Show_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.CheckConstraint('end_time > start_time', name='ck_Show_end_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=True)
     start_time = db.Column(db.DateTime, nullable=False)
-    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False, default=default_show_end_time)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False)
+    search_vector = db.deferred(db.Column(SearchVector))
+
+
+class VenueShowCounts(db.Model):
+    # Upcoming and past show counts per venue, maintained by the Show triggers
+    # in counters.py; venues without shows have no row.
+    __tablename__ = 'VenueShowCounts'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ArtistShowCounts(db.Model):
+    # As VenueShowCounts, per artist.
+    __tablename__ = 'ArtistShowCounts'
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Venue.upcoming_shows_count etc. read the stored counters: a primary-key
+# lookup in the counts table, as an attribute or inside any query selecting it.
+# The triggers keep them exact as shows are added, moved and deleted, but a
+# show only moves from upcoming to past when `flask roll-show-counts` next runs
+# (every few minutes from cron), so between runs a show that has just started
+# is still counted as upcoming. The pages list the shows themselves by
+# start_time (detail_data()), which is always current.
+SHOW_COUNTS = {
+    Venue: (VenueShowCounts, VenueShowCounts.venue_id),
+    Artist: (ArtistShowCounts, ArtistShowCounts.artist_id),
+}
+for owner, (counts, owner_fk) in SHOW_COUNTS.items():
+    for name in ('upcoming_shows_count', 'past_shows_count'):
+        setattr(owner, name, db.column_property(
+            db.func.coalesce(db.select(getattr(counts, name)).where(owner_fk == owner.id).scalar_subquery(), 0),
+            deferred=True
+        ))
+
+
+class ImportCheckpoint(db.Model):
+    # Records of an import source already committed by `flask import`; updated in
+    # the same transaction as each batch.
+    __tablename__ = 'ImportCheckpoint'
+
+    source = db.Column(db.String(600), primary_key=True)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+
+class ShowCountRoll(db.Model):
+    # The single row holding the time the show counters split upcoming from past
+    # at; see counters.py.
+    __tablename__ = 'ShowCountRoll'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_until = db.Column(db.DateTime, nullable=False)
+
+
+# search_vector is maintained by triggers; created here for db.create_all() and
+# by the search migration for migrated databases.
+SEARCH_FIELDS = {
+    Venue: [('NEW.name', 'A'), ("NEW.city || ' ' || NEW.state", 'B'), ("array_to_string(NEW.genres, ' ')", 'C')],
+    Artist: [('NEW.name', 'A'), ("NEW.city || ' ' || NEW.state", 'B'), ("array_to_string(NEW.genres, ' ')", 'C')],
+    Show: [('NEW.name', 'A')],
+}
+db.event.listen(
+    db.metadata, 'before_create',
+    db.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+for model, weighted_columns in SEARCH_FIELDS.items():
+    for statement in search.search_trigger_ddl(model.__tablename__, weighted_columns):
+        db.event.listen(model.__table__, 'after_create', db.DDL(statement).execute_if(dialect='postgresql'))
+# Show counts likewise, with row triggers of their own on SQLite.
+for statement in counters.show_counter_ddl():
+    db.event.listen(Show.__table__, 'after_create', db.DDL(statement).execute_if(dialect='postgresql'))
+for statement in counters.sqlite_show_counter_ddl():
+    db.event.listen(Show.__table__, 'after_create', db.DDL(statement).execute_if(dialect='sqlite'))
+# The show period index is an expression index over range types; see
+# schedule.py.
+db.event.listen(Show.__table__, 'after_create', db.DDL(schedule.period_index_ddl()).execute_if(dialect='postgresql'))
+
+
+@db.event.listens_for(ShowCountRoll.__table__, 'after_create')
+def insert_show_count_roll(target, connection, **kw):
+    connection.execute(target.insert().values(id=1, rolled_until=datetime.now()))
+
+
+# ----------------------------------------------------------------------------#
+# Commit hooks.
+# ----------------------------------------------------------------------------#
+
+# Functions registered with @after_commit are called with the set of ChangedRow
+# records for the Venue/Artist/Show rows inserted, updated or deleted by each
+# committed transaction. `parents` holds the (model, id) pairs a row's foreign
+# keys pointed at before and after the change, e.g. a Show's venue and artist.
+# Rows bulk-inserted by `flask import` are recorded by record_bulk_insert()
+# with an id of None; rows deleted by delete_rows() by record_bulk_delete().
+#
+# Hooks registered with @after_commit_task are queued instead, to run on one of
+# TASK_WORKERS background threads (see tasks.py) inside an app context, so that
+# work a write does not need before its response is sent stays off the request.
+# Queued tasks are drained when the process exits; /tasks/stats reports the
+# queue depth.
+ChangedRow = collections.namedtuple('ChangedRow', 'model id action parents')
+MODELS_BY_TABLE = {model.__tablename__: model for model in (Venue, Artist, Show)}
+commit_hooks = []
+commit_tasks = []
+task_queue = TaskQueue(
+    app.logger.getChild('tasks'), app.config['TASK_WORKERS'], app.config['TASK_QUEUE_SIZE'],
+    app.config['TASK_RETRIES'], app.config['TASK_RETRY_DELAY'], app.config['TASK_DRAIN_TIMEOUT']
+)
+atexit.register(task_queue.shutdown)
+
+
+def after_commit(hook):
+    commit_hooks.append(hook)
+    return hook
+
+
+def after_commit_task(hook):
+    commit_tasks.append(hook)
+    return hook
+
+
+def run_in_app_context(function, *args):
+    with app.app_context():
+        function(*args)
+
+
+def changed_row(item, action):
+    state = db.inspect(item)
+    parents = set()
+    for column in state.mapper.columns:
+        for foreign_key in column.foreign_keys:
+            history = state.attrs[state.mapper.get_property_by_column(column).key].history
+            parents.update(
+                (MODELS_BY_TABLE[foreign_key.column.table.name], value) for value in history.sum() if value is not None
+            )
+    return ChangedRow(type(item), item.id, action, frozenset(parents))
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def collect_changes(session, flush_context):
+    changed = session.info.setdefault('changed_rows', set())
+    for action, items in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        changed.update(changed_row(item, action) for item in items if type(item) in MODELS_BY_TABLE.values())
+
+
+def record_bulk_insert(model, values):
+    # Core inserts skip the ORM flush collect_changes() watches.
+    changed = db.session.info.setdefault('changed_rows', set())
+    for row in values:
+        parents = frozenset(
+            (parent, row[key]) for parent, key in ((Venue, 'venue_id'), (Artist, 'artist_id')) if key in row
+        )
+        changed.add(ChangedRow(model, None, 'insert', parents))
+
+
+def record_bulk_delete(model, ids, shows):
+    # `shows` are the (id, venue_id, artist_id) of the shows deleted with them.
+    changed = db.session.info.setdefault('changed_rows', set())
+    changed.update(ChangedRow(model, row_id, 'delete', frozenset()) for row_id in ids)
+    changed.update(
+        ChangedRow(Show, show_id, 'delete', frozenset({(Venue, venue_id), (Artist, artist_id)}))
+        for show_id, venue_id, artist_id in shows
+    )
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def run_commit_hooks(session):
+    changed = session.info.pop('changed_rows', None)
+    if changed:
+        for hook in commit_hooks:
+            hook(changed)
+        for hook in commit_tasks:
+            task_queue.submit(run_in_app_context, hook, changed)
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def discard_changes(session):
+    session.info.pop('changed_rows', None)
+
+
+# (id, name) lookups behind the ShowForm artist/venue selects and their typeahead.
+choice_lookups = app.extensions['choice_lookups'] = {
+    'artist': ChoiceLookup(db.session, Artist.id, Artist.name, app.config['CHOICE_CACHE_SIZE']),
+    'venue': ChoiceLookup(db.session, Venue.id, Venue.name, app.config['CHOICE_CACHE_SIZE']),
+}
+
+
+@after_commit
+def invalidate_choice_lookups(changed):
+    models = {row.model for row in changed}
+    if Artist in models:
+        choice_lookups['artist'].invalidate()
+    if Venue in models:
+        choice_lookups['venue'].invalidate()
+
+
+# Facet counts behind /venues/browse and /artists/browse, reloaded on the task
+# queue. The city facet counts (state, city) pairs.
+facet_counts = {
+    model: FacetCounts(
+        db.session, model, {'state': model.state, 'city': (model.state, model.city), 'seeking': seeking}, 'genres',
+        db.engine.dialect.name, functools.partial(task_queue.submit, run_in_app_context),
+        app.config['FACET_CACHE_SIZE'], app.config['FACET_OPTIONS'], app.config['FACET_MAX_STALENESS']
+    )
+    for model, seeking in ((Venue, Venue.seeking_talent), (Artist, Artist.seeking_venue))
+}
+
+
+@app.before_first_request
+def warm_facet_counts():
+    # The unfiltered counts aggregate the whole table; each worker loads them
+    # in the background on its first request, whatever page that is for.
+    for facets in facet_counts.values():
+        facets.warm()
+
+
+@after_commit
+def invalidate_facet_counts(changed):
+    for model in {row.model for row in changed} & set(facet_counts):
+        facet_counts[model].invalidate()
+
+
+def match_rows(model, seeking):
+    # MatchIndex loader for `model`, reading the primary (this also runs after
+    # commits, ahead of any replica).
+    def load(ids):
+        statement = db.select(model.id, model.genres, model.city, model.state, seeking)
+        if ids is not None:
+            statement = statement.where(model.id.in_(ids))
+        with db.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(statement)
+            for rows in result.partitions(app.config['EXPORT_BATCH_SIZE']):
+                yield from rows
+    return load
+
+
+# Matchmaking features of every venue and artist, behind the /api/v1 matches
+# endpoints.
+match_indexes = {
+    model: MatchIndex(match_rows(model, seeking), [genre for genre, _ in genres_choices],
+                      app.config['MATCH_MAX_STALENESS'])
+    for model, seeking in ((Venue, Venue.seeking_talent), (Artist, Artist.seeking_venue))
+}
+
+
+@after_commit_task
+def update_match_indexes(changed):
+    for model, index in match_indexes.items():
+        rows = [row for row in changed if row.model is model]
+        if any(row.id is None for row in rows):
+            index.invalidate()
+        elif rows:
+            index.update({row.id for row in rows})
+
+
+# Rendered detail pages, keyed 'venue:<id>', 'artist:<id>' and 'show:<id>', and
+# dropped by key when a commit touches what they display. The home page has a
+# feed snapshot of its own (see build_home_feed).
+page_cache = PageCache.from_config(app.config)
+PAGE_KEYS = {Venue: 'venue:{}', Artist: 'artist:{}', Show: 'show:{}'}
+
+
+@after_commit
+def invalidate_page_cache(changed):
+    # Pages of the changed rows and their parents go before the response, so
+    # that the page a form redirects to is current.
+    keys = set()
+    for row in changed:
+        keys.add(PAGE_KEYS[row.model].format(row.id))
+        keys.update(PAGE_KEYS[model].format(parent_id) for model, parent_id in row.parents)
+    page_cache.invalidate(keys)
+
+
+@after_commit_task
+def invalidate_show_pages(changed):
+    # Show pages repeat their venue's and artist's details, and venue and artist
+    # pages list the other side of each of their shows by name; finding them
+    # takes a query, so they go in the background.
+    keys = set()
+    with db.engine.connect() as connection:
+        for model, show_fk, other, other_fk in ((Venue, Show.venue_id, Artist, Show.artist_id),
+                                                (Artist, Show.artist_id, Venue, Show.venue_id)):
+            updated = [row.id for row in changed if row.model is model and row.action == 'update']
+            if updated:
+                for show_id, other_id in connection.execute(db.select(Show.id, other_fk).where(show_fk.in_(updated))):
+                    keys.add(PAGE_KEYS[Show].format(show_id))
+                    keys.add(PAGE_KEYS[other].format(other_id))
+    page_cache.invalidate(keys)
+
+
+# ----------------------------------------------------------------------------#
+# Read replicas.
+# ----------------------------------------------------------------------------#
+
+# Requests to these endpoints read from a replica picked at random, unless the
+# client committed a write in the last REPLICA_STICKY_SECONDS (recorded in its
+# session). Everything else, the *_submission handlers and edit forms included,
+# uses the primary.
+REPLICA_ENDPOINTS = {
+    'venues', 'artists', 'shows', 'search_venues', 'search_artists', 'search_shows',
+    'show_venue', 'show_artist', 'show_show', 'browse_venues', 'browse_artists',
+    'api_venue', 'api_artist', 'api_show', 'api_shows', 'api_search_venues', 'api_search_artists',
+    'api_search_shows', 'api_export', 'api_available_venues', 'api_artist_matches', 'api_venue_matches',
+}
+
+
+@app.before_request
+def choose_replica():
+    g.replica_bind = None
+    if REPLICA_BINDS and request.endpoint in REPLICA_ENDPOINTS and session.get('primary_until', 0) < time.time():
+        g.replica_bind = random.choice(REPLICA_BINDS)
+
+
+@after_commit
+def stick_to_primary(changed):
+    if has_request_context():
+        session['primary_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+
+
+# ----------------------------------------------------------------------------#
+# SQL instrumentation.
+# ----------------------------------------------------------------------------#
+
+# A SQL_STATS_SAMPLE_RATE fraction of requests time every statement they run.
+# The summary goes out as X-SQL-* response headers and a JSON line on the
+# 'app.sql' logger (a warning when a statement shape repeats like an N+1 lazy
+# load), and the latest ones are served by /debug/sql when SQL_STATS_ENDPOINT
+# is on. Streamed responses only count the statements run before streaming.
+sql_log = app.logger.getChild('sql')
+recent_sql = RecentRequests(app.config['SQL_STATS_HISTORY'])
+
+
+@app.before_request
+def start_sql_stats():
+    g.sql_stats = None
+    if random.random() < app.config['SQL_STATS_SAMPLE_RATE']:
+        g.sql_stats = RequestStats(app.config['SQL_STATS_SLOWEST'], app.config['SQL_STATS_REPEAT_THRESHOLD'])
+
+
+def start_statement(conn, cursor, statement, parameters, context, executemany):
+    context.started = time.perf_counter()
+
+
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = g.get('sql_stats') if has_request_context() else None
+    if stats is not None:
+        stats.record(statement, (time.perf_counter() - context.started) * 1000)
+
+
+for engine in [db.get_engine(app)] + [db.get_engine(app, bind=bind) for bind in REPLICA_BINDS]:
+    db.event.listen(engine, 'before_cursor_execute', start_statement)
+    db.event.listen(engine, 'after_cursor_execute', record_statement)
+
+
+@app.after_request
+def report_sql_stats(response):
+    stats = g.get('sql_stats')
+    if stats is None:
+        return response
+    summary = stats.summary()
+    response.headers['X-SQL-Statements'] = str(summary['statements'])
+    response.headers['X-SQL-Time-Ms'] = str(summary['db_ms'])
+    response.headers['X-SQL-N-Plus-One'] = str(len(summary['n_plus_one']))
+    entry = dict(method=request.method, path=request.full_path.rstrip('?'), status=response.status_code, **summary)
+    sql_log.log(logging.WARNING if summary['n_plus_one'] else logging.INFO, json.dumps(entry))
+    recent_sql.add(entry)
+    return response
 
 
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
+date_formatter = DateFormatter(
+    app.config['DATETIME_LOCALE'], app.config['DISPLAY_TIMEZONE'], app.config['STORED_TIMEZONE'],
+    app.config['DATETIME_CACHE_SIZE']
+)
+
+
 def format_datetime(value, format='medium'):
-    if isinstance(value, str):
-        date = dateutil.parser.parse(value)
-    else:
-        date = value
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
+    # A list of values is formatted in one call and comes back as a list.
+    if isinstance(value, (list, tuple)):
+        return date_formatter.format_many(value, format)
+    return date_formatter.format(value, format)
 
 
 app.jinja_env.filters['datetime'] = format_datetime
 
 
+# ----------------------------------------------------------------------------#
+# Static assets.
+# ----------------------------------------------------------------------------#
+
+# Once `flask assets` has built static/<ASSET_DIST>/ (see assets.py),
+# url_for('static', filename=...) gives the content-hashed name of the file and
+# the layout includes each bundle as one file. Hashed files are served with
+# their gzipped copy to clients accepting gzip and cached by browsers for
+# ASSET_MAX_AGE without revalidation; other static files are served as before.
+asset_manifest = assets.AssetManifest(app.static_folder, app.config['ASSET_DIST'])
+app.jinja_env.globals['asset_bundle'] = asset_manifest.bundle
+
+
+@app.url_defaults
+def hashed_static_url(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = asset_manifest.filename(values['filename'])
+
+
+def send_static_asset(filename):
+    if not filename.startswith(app.config['ASSET_DIST'] + '/'):
+        return app.send_static_file(filename)
+    max_age = app.config['ASSET_MAX_AGE']
+    gzipped = filename + '.gz'
+    # The type is the uncompressed file's, set explicitly for the .gz copy.
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if request.accept_encodings['gzip'] and os.path.isfile(os.path.join(app.static_folder, gzipped)):
+        response = send_from_directory(app.static_folder, gzipped, mimetype=mimetype, max_age=max_age)
+        response.content_encoding = 'gzip'
+    else:
+        response = send_from_directory(app.static_folder, filename, mimetype=mimetype, max_age=max_age)
+    # Werkzeug names the file sent in a Content-Disposition header, which for
+    # the .gz copy would name a .gz file; assets need none.
+    response.headers.pop('Content-Disposition', None)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+app.view_functions['static'] = send_static_asset
+
+
+# ----------------------------------------------------------------------------#
+# Image proxy.
+# ----------------------------------------------------------------------------#
+
+# Artist and venue image links are remote URLs of any size. The `thumbnail`
+# filter turns one into a signed /images/<size>/ URL, served from the image
+# proxy's disk cache (see images.py) with a strong ETag; the source is fetched
+# and resized in the background the first time. A request that has waited
+# IMAGE_PROXY_WAIT seconds for a slow host is redirected to the source image.
+# Without an IMAGE_PROXY_SECRET the proxy is off and pages link the source
+# images directly.
+image_proxy = None
+if app.config['IMAGE_PROXY_SECRET']:
+    image_proxy = ImageProxy(
+        app.config['IMAGE_CACHE_DIR'], app.config['IMAGE_SIZES'], app.config['IMAGE_PROXY_SECRET'],
+        app.config['IMAGE_CACHE_MAX_BYTES'], workers=app.config['IMAGE_PROXY_WORKERS'],
+        timeout=app.config['IMAGE_PROXY_TIMEOUT'], max_source_bytes=app.config['IMAGE_PROXY_MAX_SOURCE_BYTES'],
+        quality=app.config['IMAGE_QUALITY'], retry_after=app.config['IMAGE_PROXY_RETRY_AFTER'],
+        allow_private=app.config['IMAGE_PROXY_ALLOW_PRIVATE']
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def warn_image_proxy_disabled():
+    # Logged once per process, on the first image link rendered.
+    app.logger.warning('image proxy disabled: FYYUR_IMAGE_PROXY_SECRET is not set, serving source images')
+
+
+def thumbnail_url(image_link, size='small'):
+    # Links that are not http(s) URLs (empty, relative) are left as they are.
+    if not image_link or not image_link.startswith(('http://', 'https://')):
+        return image_link
+    if image_proxy is None:
+        warn_image_proxy_disabled()
+        return image_link
+    return url_for('image_thumbnail', size=size, signature=image_proxy.sign(image_link), url=image_link)
+
+
+app.jinja_env.filters['thumbnail'] = thumbnail_url
+
+
+@app.route('/images/<size>/<signature>')
+def image_thumbnail(size, signature):
+    url = request.args.get('url', '')
+    if image_proxy is None or size not in app.config['IMAGE_SIZES'] or not image_proxy.verify(url, signature):
+        abort(404)
+    try:
+        data = image_proxy.thumbnail(url, size, app.config['IMAGE_PROXY_WAIT'])
+    except concurrent.futures.TimeoutError:
+        return redirect(url)
+    except ImageError as e:
+        app.logger.info('image proxy: %s', e)
+        abort(404)
+    response = Response(data, mimetype='image/jpeg')
+    response.set_etag(hashlib.sha256(data).hexdigest()[:32])
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['IMAGE_MAX_AGE']
+    return response.make_conditional(request)
+
+
+# ----------------------------------------------------------------------------#
+# Helpers.
+# ----------------------------------------------------------------------------#
+
+def render_page(template_name, **context):
+    # With STREAM_TEMPLATES on, the page is sent as Jinja generates it instead of
+    # being joined into one string first.
+    if not app.config['STREAM_TEMPLATES']:
+        return render_template(template_name, **context)
+    app.update_template_context(context)
+    template = app.jinja_env.get_or_select_template(template_name)
+    return Response(stream_with_context(template.generate(context)))
+
+
+# Views written as plans (see plans.py). Called as views they run on
+# db.session; asgi.py finds the plan on the view and runs it on its event loop.
+def plan_view(plan):
+    @functools.wraps(plan)
+    def view(**kwargs):
+        return run_plan(plan(**kwargs))
+    view.plan = plan
+    return view
+
+
+def cached_page(key_format):
+    # Serves the view plan from page_cache under key_format.format(**view_args).
+    # Requests with a query string or pending flash messages bypass the cache.
+    def decorator(plan):
+        @functools.wraps(plan)
+        def wrapper(**kwargs):
+            if request.query_string or '_flashes' in session:
+                return (yield from plan(**kwargs))
+            key = key_format.format(**kwargs)
+            page = page_cache.get(key)
+            if page is not None:
+                return page, {'X-Cache': 'HIT'}
+            # A cached page outlives any replica lag, so misses render from the
+            # primary.
+            g.replica_bind = None
+            page = yield from plan(**kwargs)
+            # Only a plain rendered page is a 200 and cached; a (page, status)
+            # tuple such as the 404 for a missing row, or a redirect, is not.
+            if not isinstance(page, str):
+                return page
+            page_cache.set(key, page)
+            return page, {'X-Cache': 'MISS'}
+        return wrapper
+    return decorator
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, types):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+        if len(values) != len(types):
+            raise ValueError(token)
+        return tuple(datetime.fromisoformat(v) if t is datetime else t(v) for t, v in zip(types, values))
+    except (ValueError, TypeError):
+        abort(400)
+
+
+def keyset_page(query, columns, types, per_page):
+    # Keyset pagination over `columns` (ascending), driven by the ?after= / ?before=
+    # cursors in the request. Returns the page rows with next and previous cursors.
+    after = request.args.get('after')
+    before = request.args.get('before')
+    key = db.tuple_(*columns)
+
+    if before:
+        query = query.filter(key < db.tuple_(*decode_cursor(before, types)))
+        rows = query.order_by(*[c.desc() for c in columns]).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        prev_cursor = encode_cursor(rows[0][-len(columns):]) if has_more else None
+        next_cursor = encode_cursor(rows[-1][-len(columns):]) if rows else None
+    else:
+        if after:
+            query = query.filter(key > db.tuple_(*decode_cursor(after, types)))
+        rows = query.order_by(*columns).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        prev_cursor = encode_cursor(rows[0][-len(columns):]) if after and rows else None
+        next_cursor = encode_cursor(rows[-1][-len(columns):]) if has_more else None
+
+    return rows, next_cursor, prev_cursor
+
+
+# Output field name -> SQL expression for each resource, shared by the HTML
+# views and the /api/v1 endpoints. Views select only the labelled expressions
+# for the fields they need and turn each row into a dict with row_data().
+VENUE_FIELDS = {
+    'id': Venue.id,
+    'name': Venue.name,
+    'genres': Venue.genres,
+    'address': Venue.address,
+    'city': Venue.city,
+    'state': Venue.state,
+    'phone': Venue.phone,
+    'website': Venue.website_link,
+    'facebook_link': Venue.facebook_link,
+    'seeking_talent': Venue.seeking_talent,
+    'seeking_description': Venue.seeking_description,
+    'image_link': Venue.image_link,
+}
+ARTIST_FIELDS = {
+    'id': Artist.id,
+    'name': Artist.name,
+    'genres': Artist.genres,
+    'city': Artist.city,
+    'state': Artist.state,
+    'phone': Artist.phone,
+    'website': Artist.website_link,
+    'facebook_link': Artist.facebook_link,
+    'seeking_venue': Artist.seeking_venue,
+    'seeking_description': Artist.seeking_description,
+    'image_link': Artist.image_link,
+}
+# Selected from show_query(), which joins each show to its venue and artist.
+SHOW_FIELDS = {
+    'id': Show.id,
+    'show_name': Show.name,
+    'venue_id': Show.venue_id,
+    'venue_name': Venue.name,
+    'artist_id': Show.artist_id,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link,
+    'start_time': Show.start_time,
+    'end_time': Show.end_time,
+}
+SHOW_DETAIL_FIELDS = dict(
+    SHOW_FIELDS,
+    artist_city=Artist.city,
+    artist_state=Artist.state,
+    artist_phone=Artist.phone,
+    artist_genres=Artist.genres,
+    artist_website=Artist.website_link,
+    artist_facebook_link=Artist.facebook_link,
+    venue_city=Venue.city,
+    venue_state=Venue.state,
+    venue_phone=Venue.phone,
+    venue_genres=Venue.genres,
+    venue_website=Venue.website_link,
+    venue_facebook_link=Venue.facebook_link,
+    venue_image_link=Venue.image_link,
+)
+# The keys detail_shows() adds to a venue or artist.
+DETAIL_SHOW_FIELDS = [
+    'past_shows', 'upcoming_shows', 'past_shows_count', 'upcoming_shows_count', 'past_shows_page',
+    'past_shows_has_next',
+]
+
+
+def labelled(fields, names):
+    # The expressions of `fields` named in `names`, labelled with those names.
+    return [fields[name].label(name) for name in names if name in fields]
+
+
+def row_data(row, names):
+    return {name: getattr(row, name) for name in names}
+
+
+def show_query():
+    return Show.query.join(
+        Venue, (Venue.id == Show.venue_id)
+    ).join(
+        Artist, (Artist.id == Show.artist_id)
+    )
+
+
+# ----------------------------------------------------------------------------#
+# Home feed.
+# ----------------------------------------------------------------------------#
+
+# The home page renders the sections of HOME_FEED_SECTIONS from a snapshot
+# (see feed.py) rebuilt on the task queue after commits and once it is
+# HOME_FEED_MAX_STALENESS seconds old. Each builder takes a connection to the
+# primary, the number of items and the time now, and returns FeedItems.
+
+def feed_shows(connection, limit, now, upcoming=False):
+    statement = db.select(
+        Show.id, Show.name, Show.start_time, Artist.name.label('artist_name'), Artist.image_link,
+        Venue.name.label('venue_name')
+    ).join(Artist, Artist.id == Show.artist_id).join(Venue, Venue.id == Show.venue_id)
+    if upcoming:
+        statement = statement.where(Show.start_time >= now).order_by(Show.start_time, Show.id)
+    else:
+        statement = statement.order_by(Show.id.desc())
+    return [
+        FeedItem(row.id, row.name or row.artist_name, row.image_link, format_datetime(row.start_time, 'full'),
+                 '{} at {}'.format(row.artist_name, row.venue_name))
+        for row in connection.execute(statement.limit(limit))
+    ]
+
+
+def feed_recent(model):
+    def build(connection, limit, now):
+        statement = db.select(model.id, model.name, model.image_link, model.city, model.state)
+        return [
+            FeedItem(row.id, row.name, row.image_link, None, '{}, {}'.format(row.city, row.state))
+            for row in connection.execute(statement.order_by(model.id.desc()).limit(limit))
+        ]
+    return build
+
+
+def feed_trending_venues(connection, limit, now):
+    # Venues with the most shows starting in the next HOME_FEED_TRENDING_DAYS
+    # days, found from the start_time index.
+    days = app.config['HOME_FEED_TRENDING_DAYS']
+    booked = db.select(Show.venue_id, db.func.count().label('shows')).where(
+        Show.start_time >= now, Show.start_time < now + timedelta(days=days)
+    ).group_by(Show.venue_id).order_by(db.func.count().desc(), Show.venue_id).limit(limit).subquery()
+    statement = db.select(Venue.id, Venue.name, Venue.image_link, booked.c.shows).join(
+        booked, booked.c.venue_id == Venue.id
+    ).order_by(booked.c.shows.desc(), Venue.id)
+    return [
+        FeedItem(row.id, row.name, row.image_link, None,
+                 '{} {} in the next {} days'.format(row.shows, 'show' if row.shows == 1 else 'shows', days))
+        for row in connection.execute(statement)
+    ]
+
+
+# Section kind -> (title, entity, builder).
+FEED_SECTIONS = {
+    'recent_shows': ('Recent Shows', 'show', feed_shows),
+    'upcoming_shows': ('Upcoming Shows', 'show', functools.partial(feed_shows, upcoming=True)),
+    'recent_artists': ('Recent Artists', 'artist', feed_recent(Artist)),
+    'recent_venues': ('Recent Venues', 'venue', feed_recent(Venue)),
+    'trending_venues': ('Trending Venues', 'venue', feed_trending_venues),
+}
+
+
+def build_home_feed():
+    now = datetime.now()
+    with db.engine.connect() as connection:
+        return [
+            FeedSection(kind, FEED_SECTIONS[kind][0], FEED_SECTIONS[kind][1],
+                        tuple(FEED_SECTIONS[kind][2](connection, limit, now)))
+            for kind, limit in app.config['HOME_FEED_SECTIONS']
+        ]
+
+
+home_feed = HomeFeed(
+    build_home_feed, functools.partial(task_queue.submit, run_in_app_context), app.config['HOME_FEED_MAX_STALENESS']
+)
+
+
+@after_commit
+def expire_home_feed(changed):
+    home_feed.expire()
+
+
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 
 @app.route('/')
 def index():
-    recent_shows = Show.query.order_by(Show.id.desc()).limit(5)
-    artist_list = Artist.query.order_by(Artist.id.desc()).limit(10).all()
-    venues_list = Venue.query.order_by(Venue.id.desc()).limit(10).all()
-
-    return render_template('pages/home.html', artists=artist_list, venues=venues_list, shows=recent_shows)
+    return render_template('pages/home.html', sections=home_feed.get().sections)
 
 
 #  Venues
 #  ----------------------------------------------------------------
 
+def venue_areas(page=1, per_page=None):
+    # One statement: a page of (city, state) areas joined back to their venues,
+    # with each venue's stored upcoming show count.
+    per_page = per_page or app.config['VENUE_AREAS_PER_PAGE']
+    areas_page = db.session.query(
+        Venue.city, Venue.state
+    ).group_by(
+        Venue.state, Venue.city
+    ).order_by(
+        Venue.state, Venue.city
+    ).limit(per_page + 1).offset((page - 1) * per_page).subquery()
+
+    rows = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    ).join(
+        areas_page, db.and_(Venue.city == areas_page.c.city, Venue.state == areas_page.c.state)
+    ).order_by(
+        Venue.state, Venue.city, Venue.name
+    ).all()
+
+    areas = []
+    for row in rows:
+        if not areas or (areas[-1]['city'], areas[-1]['state']) != (row.city, row.state):
+            areas.append({
+                "city": row.city,
+                "state": row.state,
+                "venues": []
+            })
+        areas[-1]['venues'].append({
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.num_upcoming_shows
+        })
+
+    has_next = len(areas) > per_page
+    return areas[:per_page], has_next
+
+
 @app.route('/venues')
 def venues():
-    data = []
-    places = Venue.query.with_entities(Venue.city, Venue.state).distinct().all()
-    for place in places:
-        city = place[0]
-        state = place[1]
-        venues_list = Venue.query.filter_by(city=city, state=state).all()
-        shows_list = [show for show in venues_list[0].shows if show.start_time > datetime.now()]
-        data.append({
-            "city": city,
-            "state": state,
-            "venues": venues_list,
-            "num_upcoming_shows": len(shows_list)
-        })
+    page = max(request.args.get('page', 1, type=int), 1)
+    data, has_next = venue_areas(page)
+    return render_template('pages/venues.html', areas=data, page=page, has_next=has_next)
+
+
+def search_page():
+    page = max(request.values.get('page', 1, type=int), 1)
+    return page, app.config['SEARCH_RESULTS_PER_PAGE']
+
 
-    return render_template('pages/venues.html', areas=data);
+def search_response(total, data, page, per_page):
+    count_limit = app.config['SEARCH_COUNT_LIMIT']
+    return {
+        "count": min(total, count_limit),
+        "count_capped": total > count_limit,
+        "data": data,
+        "page": page,
+        "has_next": page * per_page < total
+    }
+
+
+# Databases without tsvector (SQLite test runs) search an in-process inverted
+# index instead, rebuilt after any commit touching the indexed rows. Its
+# documents hold the columns of each table's search_vector (SEARCH_FIELDS).
+search_fallback = search.FallbackSearch({
+    'venue': lambda: (
+        (row.id, row.name, [(row.name, 1.0), (row.city + ' ' + row.state, 0.4), (' '.join(row.genres or []), 0.2)])
+        for row in Venue.query.with_entities(Venue.id, Venue.name, Venue.city, Venue.state, Venue.genres)
+    ),
+    'artist': lambda: (
+        (row.id, row.name, [(row.name, 1.0), (row.city + ' ' + row.state, 0.4), (' '.join(row.genres or []), 0.2)])
+        for row in Artist.query.with_entities(Artist.id, Artist.name, Artist.city, Artist.state, Artist.genres)
+    ),
+    'show': lambda: ((row.id, row.name, [(row.name, 1.0)]) for row in Show.query.with_entities(Show.id, Show.name)),
+})
+SEARCH_KINDS = {Venue: ('venue',), Artist: ('artist',), Show: ('show',)}
+
+
+@after_commit
+def invalidate_search_fallback(changed):
+    for kind in {kind for row in changed for kind in SEARCH_KINDS[row.model]}:
+        search_fallback.invalidate(kind)
+
+
+def text_match(model, search_term):
+    # Prefix match on the weighted name/city/state/genres vector (GIN index), or a
+    # mid-word ILIKE on the name, which the gin_trgm_ops index serves. Other
+    # databases match the same way through search_fallback.
+    if db.engine.dialect.name != 'postgresql':
+        return model.id.in_(list(search_fallback.search(model.__tablename__.lower(), search_term)))
+    match = model.name.ilike('%' + search.escape_like(search_term) + '%', escape='\\')
+    tsquery = search.prefix_tsquery(search_term)
+    if tsquery is not None:
+        match = or_(model.search_vector.op('@@')(tsquery), match)
+    return match
+
+
+def text_rank(model, search_term):
+    if db.engine.dialect.name != 'postgresql':
+        scores = search_fallback.search(model.__tablename__.lower(), search_term)
+        return [db.case(scores, value=model.id, else_=0).desc()] if scores else []
+    tsquery = search.prefix_tsquery(search_term)
+    if tsquery is None:
+        return []
+    return [db.func.ts_rank_cd(model.search_vector, tsquery).desc()]
+
+
+def matching_ids(column, model, search_term):
+    # `column` is the id of a `model` row matching the search. On Postgres the ids
+    # are collected into an array first, so it can either BitmapOr the index of
+    # `column` with others (narrow terms) or walk another index and stop at a
+    # page of hits (broad terms).
+    ids = db.select(model.id).where(text_match(model, search_term))
+    if db.engine.dialect.name != 'postgresql':
+        return column.in_(ids)
+    return column == any_(db.func.array(ids.scalar_subquery()))
+
+
+def run_search(query, match, order, page, per_page):
+    # Plan returning one page of `query` rows matching the search and the match
+    # count, counted no further than SEARCH_COUNT_LIMIT + 1 rows.
+    offset = (page - 1) * per_page
+    query = query.filter(match)
+    rows, total = yield [
+        Fetch(query.order_by(*order).limit(per_page).offset(offset)),
+        Fetch(db.session.query(db.func.count()).select_from(
+            query.with_entities(db.literal_column('1')).limit(app.config['SEARCH_COUNT_LIMIT'] + 1).subquery()
+        ), 'scalar')
+    ]
+    return rows, total
+
+
+def search_owners(model, fields, search_term, page, per_page, names):
+    # Plan returning one page of venues or artists matching the search as `names`
+    # dicts (from `fields` or upcoming_shows_count), and the match count.
+    fields = dict(fields, upcoming_shows_count=model.upcoming_shows_count)
+    rows, total = yield from run_search(
+        model.query.with_entities(model.id, *labelled(fields, [name for name in names if name != 'id'])),
+        text_match(model, search_term),
+        text_rank(model, search_term) + [model.name, model.id],
+        page, per_page
+    )
+    return [row_data(row, names) for row in rows], total
 
 
 @app.route('/venues/search', methods=['POST'])
+@plan_view
 def search_venues():
     search_term = request.form.get('search_term', '')
-    venues_list = Venue.query.filter(Venue.name.ilike('%' + search_term + '%')).all()
-    data = []
-    for item in venues_list:
-        data.append({
-            "id": item.id,
-            "name": item.name,
-            "upcoming_shows_count": len([show for show in item.shows if show.start_time > datetime.now()])
-        })
+    page, per_page = search_page()
+    data, total = yield from search_owners(
+        Venue, VENUE_FIELDS, search_term, page, per_page, ['id', 'name', 'upcoming_shows_count']
+    )
 
-    response = {
-        "count": len(venues_list),
-        "data": data
-    }
+    response = search_response(total, data, page, per_page)
     return render_template('pages/search_venues.html', results=response,
                            search_term=request.form.get('search_term', ''))
 
 
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    venue_item = Venue.query.get(venue_id)
-    if not venue_item:
-        return render_template('errors/404.html')
-    else:
-        data = {
-            "id": venue_item.id,
-            "name": venue_item.name,
-            "genres": venue_item.genres,
-            "address": venue_item.address,
-            "city": venue_item.city,
-            "state": venue_item.state,
-            "phone": venue_item.phone,
-            "website": venue_item.website_link,
-            "facebook_link": venue_item.facebook_link,
-            "seeking_talent": venue_item.seeking_talent,
-            "seeking_description": venue_item.seeking_description,
-            "image_link": venue_item.image_link,
-            "past_shows": [],
-            "upcoming_shows": [],
-            "past_shows_count": 0,
-            "upcoming_shows_count": 0
+def detail_show_fetches(owner_fk, owner_id, other_fk, other, past_page=1, lists=True):
+    # Past/upcoming shows for a venue or artist page in three statements: the two
+    # counts, the upcoming shows and one page of past shows, each joined to the
+    # counterpart (`other`) table and ordered by start_time. With lists=False
+    # only the counts are fetched.
+    now = datetime.now()
+    per_page = app.config['PAST_SHOWS_PER_PAGE']
+    fetches = [Fetch(db.session.query(
+        db.func.count(Show.id).filter(Show.start_time < now),
+        db.func.count(Show.id).filter(Show.start_time >= now)
+    ).filter(owner_fk == owner_id), 'one')]
+
+    listing = db.session.query(
+        Show.id,
+        Show.name,
+        Show.start_time,
+        other.id.label('other_id'),
+        other.name.label('other_name'),
+        other.image_link.label('other_image_link')
+    ).join(
+        other, other.id == other_fk
+    ).filter(owner_fk == owner_id)
+
+    if lists:
+        fetches.append(Fetch(listing.filter(
+            Show.start_time >= now
+        ).order_by(Show.start_time, Show.id)))
+        fetches.append(Fetch(listing.filter(
+            Show.start_time < now
+        ).order_by(
+            Show.start_time.desc(), Show.id.desc()
+        ).limit(per_page).offset((past_page - 1) * per_page)))
+    return fetches
+
+
+def detail_shows(prefix, past_page, counts, upcoming_rows=(), past_rows=()):
+    # The DETAIL_SHOW_FIELDS of a venue or artist from the detail_show_fetches()
+    # results.
+    past_count, upcoming_count = counts
+    per_page = app.config['PAST_SHOWS_PER_PAGE']
+
+    def show_data(row):
+        return {
+            "show_id": row.id,
+            "show_name": row.name,
+            prefix + "_id": row.other_id,
+            prefix + "_name": row.other_name,
+            prefix + "_image_link": row.other_image_link,
+            "start_time": row.start_time
         }
-        for show in venue_item.shows:
-            if show.start_time < datetime.now():
-                data['past_shows'].append({
-                    "show_id": show.id,
-                    "show_name": show.name,
-                    "artist_id": show.artist_id,
-                    "artist_name": show.Artist.name,
-                    "artist_image_link": show.Artist.image_link,
-                    "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-                })
-                data['past_shows_count'] += 1
-            else:
-                data['upcoming_shows'].append({
-                    "show_id": show.id,
-                    "show_name": show.name,
-                    "artist_id": show.artist_id,
-                    "artist_name": show.Artist.name,
-                    "artist_image_link": show.Artist.image_link,
-                    "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-                })
-                data['upcoming_shows_count'] += 1
 
-        return render_template('pages/show_venue.html', venue=data)
+    return {
+        "past_shows": [show_data(row) for row in past_rows],
+        "upcoming_shows": [show_data(row) for row in upcoming_rows],
+        "past_shows_count": past_count,
+        "upcoming_shows_count": upcoming_count,
+        "past_shows_page": past_page,
+        "past_shows_has_next": past_page * per_page < past_count
+    }
+
+
+def detail_data(fields, item_id, names, shows, past_page=1):
+    # Plan returning the `names` fields (from `fields` and DETAIL_SHOW_FIELDS) of
+    # a venue or artist, or None if there is no such row. `shows` holds the
+    # (owner_fk, other_fk, other, prefix) of its shows; they are only queried
+    # when a DETAIL_SHOW_FIELDS name is asked for, the lists only when one of
+    # them is, and alongside the row itself.
+    owner_fk, other_fk, other, prefix = shows
+    show_fetches = []
+    if any(name in DETAIL_SHOW_FIELDS for name in names):
+        lists = 'past_shows' in names or 'upcoming_shows' in names
+        show_fetches = detail_show_fetches(owner_fk, item_id, other_fk, other, past_page, lists)
+    row, *show_results = yield [Fetch(db.session.query(
+        *labelled(fields, dict.fromkeys(['id'] + names))
+    ).filter(fields['id'] == item_id), 'first')] + show_fetches
+    if row is None:
+        return None
+    data = row_data(row, [name for name in names if name in fields])
+    if show_fetches:
+        show_data = detail_shows(prefix, past_page, *show_results)
+        data.update((name, show_data[name]) for name in names if name in show_data)
+    return data
+
+
+VENUE_SHOWS = (Show.venue_id, Show.artist_id, Artist, 'artist')
+ARTIST_SHOWS = (Show.artist_id, Show.venue_id, Venue, 'venue')
+
+
+@app.route('/venues/<int:venue_id>')
+@plan_view
+@cached_page('venue:{venue_id}')
+def show_venue(venue_id):
+    past_page = max(request.args.get('past_page', 1, type=int), 1)
+    data = yield from detail_data(VENUE_FIELDS, venue_id, list(VENUE_FIELDS) + DETAIL_SHOW_FIELDS, VENUE_SHOWS, past_page)
+    if data is None:
+        return render_template('errors/404.html'), 404
+    return render_template('pages/show_venue.html', venue=data)
 
 
 #  Create Venue
@@ -286,96 +1227,205 @@ def create_venue_submission():
     return redirect(url_for('venues'))
 
 
-@app.route('/venues/<venue_id>', methods=['POST'])
+# Venues and artists by the plural used in URLs and `flask delete`, with the
+# Show foreign key pointing at them.
+DELETABLE = {'venues': (Venue, Show.venue_id), 'artists': (Artist, Show.artist_id)}
+
+
+def delete_rows(kind, ids):
+    # Deletes the venues or artists with these ids and all of their shows in
+    # the session's transaction: one DELETE of the shows, then one of the rows,
+    # rather than ON DELETE CASCADE's one statement per venue or artist (each
+    # firing the show counter triggers). Returns the numbers of rows and shows
+    # deleted.
+    model, show_fk = DELETABLE[kind]
+    shows, rows = Show.__table__, model.__table__
+    show_delete = shows.delete().where(show_fk.in_(ids))
+    row_delete = rows.delete().where(rows.c.id.in_(ids))
+    if db.engine.dialect.full_returning:
+        deleted_shows = db.session.execute(show_delete.returning(shows.c.id, shows.c.venue_id, shows.c.artist_id)).all()
+        deleted = [row_id for row_id, in db.session.execute(row_delete.returning(rows.c.id))]
+    else:
+        deleted_shows = db.session.execute(
+            db.select(shows.c.id, shows.c.venue_id, shows.c.artist_id).where(show_fk.in_(ids))
+        ).all()
+        deleted = [row_id for row_id, in db.session.execute(db.select(rows.c.id).where(rows.c.id.in_(ids)))]
+        db.session.execute(show_delete)
+        db.session.execute(row_delete)
+    record_bulk_delete(model, deleted, deleted_shows)
+    return len(deleted), len(deleted_shows)
+
+
+@app.route('/venues/<int:venue_id>', methods=['POST'])
 def delete_venue(venue_id):
     try:
-        venue_item = Venue.query.get(venue_id)
-        db.session.delete(venue_item)
+        venue_name = db.session.query(Venue.name).filter(Venue.id == venue_id).scalar()
+        deleted, _ = delete_rows('venues', [venue_id])
+        if not deleted:
+            raise LookupError(venue_id)
         db.session.commit()
-        flash(f'{venue_item.name} is deleted successfully')
+        flash(f'{venue_name} is deleted successfully')
         return redirect(url_for('index'))
     except:
         db.session.rollback()
         flash('An error occurred. Venue could not be deleted.')
     finally:
         db.session.close()
-    return redirect(url_for('delete_venue', venue_id=venue_id))
+    return redirect(url_for('show_venue', venue_id=venue_id))
 
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
 def artists():
-    artist_list = Artist.query.with_entities(Artist.id, Artist.name).order_by('name').all()
-    return render_template('pages/artists.html', artists=artist_list)
+    artist_list, next_cursor, prev_cursor = keyset_page(
+        Artist.query.with_entities(Artist.name, Artist.id),
+        [Artist.name, Artist.id], [str, int], app.config['ARTISTS_PER_PAGE']
+    )
+    return render_page('pages/artists.html', artists=artist_list,
+                       next_cursor=next_cursor, prev_cursor=prev_cursor)
 
 
 @app.route('/artists/search', methods=['POST'])
+@plan_view
 def search_artists():
     search_term = request.form.get('search_term', '')
-    artist_list = Artist.query.filter(Artist.name.ilike('%' + search_term + '%')).all()
-    data = []
-    for item in artist_list:
-        data.append({
-            "id": item.id,
-            "name": item.name,
-            "upcoming_shows_count": len([show for show in item.shows if show.start_time > datetime.now()])
-        })
+    page, per_page = search_page()
+    data, total = yield from search_owners(
+        Artist, ARTIST_FIELDS, search_term, page, per_page, ['id', 'name', 'upcoming_shows_count']
+    )
 
-    response = {
-        "count": len(artist_list),
-        "data": data
-    }
+    response = search_response(total, data, page, per_page)
     return render_template('pages/search_artists.html', results=response,
                            search_term=request.form.get('search_term', ''))
 
 
 @app.route('/artists/<int:artist_id>')
+@plan_view
+@cached_page('artist:{artist_id}')
 def show_artist(artist_id):
-    artist_item = Artist.query.get(artist_id)
-    if not artist_item:
-        return render_template('errors/404.html')
-    else:
-        data = {
-            "id": artist_item.id,
-            "name": artist_item.name,
-            "genres": artist_item.genres,
-            "city": artist_item.city,
-            "state": artist_item.state,
-            "phone": artist_item.phone,
-            "website": artist_item.website_link,
-            "facebook_link": artist_item.facebook_link,
-            "seeking_venue": artist_item.seeking_venue,
-            "seeking_description": artist_item.seeking_description,
-            "image_link": artist_item.image_link,
-            "past_shows": [],
-            "upcoming_shows": [],
-            "past_shows_count": 0,
-            "upcoming_shows_count": 0
-        }
-        for show in artist_item.shows:
-            if show.start_time < datetime.now():
-                data['past_shows'].append({
-                    "show_id": show.id,
-                    "show_name": show.name,
-                    "venue_id": show.venue_id,
-                    "venue_name": show.Venue.name,
-                    "venue_image_link": show.Venue.image_link,
-                    "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-                })
-                data['past_shows_count'] += 1
-            else:
-                data['upcoming_shows'].append({
-                    "show_id": show.id,
-                    "show_name": show.name,
-                    "venue_id": show.venue_id,
-                    "venue_name": show.Venue.name,
-                    "venue_image_link": show.Venue.image_link,
-                    "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-                })
-                data['upcoming_shows_count'] += 1
+    past_page = max(request.args.get('past_page', 1, type=int), 1)
+    data = yield from detail_data(ARTIST_FIELDS, artist_id, list(ARTIST_FIELDS) + DETAIL_SHOW_FIELDS, ARTIST_SHOWS, past_page)
+    if data is None:
+        return render_template('errors/404.html'), 404
+    return render_template('pages/show_artist.html', artist=data)
+
+
+@app.route('/artists/<int:artist_id>', methods=['POST'])
+def delete_artist(artist_id):
+    try:
+        artist_name = db.session.query(Artist.name).filter(Artist.id == artist_id).scalar()
+        deleted, _ = delete_rows('artists', [artist_id])
+        if not deleted:
+            raise LookupError(artist_id)
+        db.session.commit()
+        flash(f'{artist_name} is deleted successfully')
+        return redirect(url_for('index'))
+    except:
+        db.session.rollback()
+        flash('An error occurred. Artist could not be deleted.')
+    finally:
+        db.session.close()
+    return redirect(url_for('show_artist', artist_id=artist_id))
 
-        return render_template('pages/show_artist.html', artist=data)
+
+@app.route('/api/v1/<any(venues, artists):kind>/delete', methods=['POST'])
+def api_delete(kind):
+    # {"ids": [...]}: deletes those venues or artists and all of their shows,
+    # at most DELETE_BATCH_SIZE per request, in one transaction.
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    if not isinstance(ids, list) or not all(type(row_id) is int for row_id in ids):
+        return api_response({"error": "ids must be a list of integers"}, 400)
+    if len(ids) > app.config['DELETE_BATCH_SIZE']:
+        return api_response({"error": "at most {} ids per request".format(app.config['DELETE_BATCH_SIZE'])}, 400)
+    try:
+        deleted, shows = delete_rows(kind, ids)
+        db.session.commit()
+    except:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.close()
+    return api_response({"deleted": {kind: deleted, "shows": shows}})
+
+
+#  Browse
+#  ----------------------------------------------------------------
+GENRES = {value for value, _ in genres_choices}
+BROWSE_PAGES = {
+    'browse_venues': (Venue, 'Venues', 'Seeking talent'),
+    'browse_artists': (Artist, 'Artists', 'Seeking venue'),
+}
+
+
+def browse_filters():
+    # (facet, value) pairs from ?genres=&state=&city=&seeking=, sorted so that the
+    # same filters always make the same facet cache key. A city is given as
+    # "City, ST", or as the city alone with ?state=.
+    filters = {('genres', genre) for genre in request.args.getlist('genres') if genre in GENRES}
+    state = request.args.get('state', '').strip()
+    if state:
+        filters.add(('state', state))
+    city = request.args.get('city', '').strip()
+    name, _, city_state = city.rpartition(', ')
+    if name and city_state:
+        filters.add(('city', (city_state, name)))
+    elif city and state:
+        filters.add(('city', (state, city)))
+    if request.args.get('seeking') in ('yes', 'no'):
+        filters.add(('seeking', request.args['seeking'] == 'yes'))
+    return tuple(sorted(filters, key=str))
+
+
+def browse_url(filters, **kwargs):
+    args = {}
+    for name, value in filters:
+        if name == 'seeking':
+            value = 'yes' if value else 'no'
+        elif name == 'city':
+            value = '{1}, {0}'.format(*value)
+        args.setdefault(name, []).append(value)
+    return url_for(request.endpoint, **args, **kwargs)
+
+
+def facet_links(filters, counts):
+    # Each facet option with the URL that toggles it: genres accumulate, the
+    # other facets replace their current value.
+    facets = {}
+    for name, options in counts.items():
+        facets[name] = []
+        for value, count in options:
+            selected = (name, value) in filters
+            if selected:
+                toggled = [f for f in filters if f != (name, value)]
+            else:
+                toggled = [f for f in filters if name == 'genres' or f[0] != name] + [(name, value)]
+            facets[name].append({
+                "value": value,
+                "count": count,
+                "selected": selected,
+                "url": browse_url(toggled)
+            })
+    return facets
+
+
+@app.route('/venues/browse', endpoint='browse_venues')
+@app.route('/artists/browse', endpoint='browse_artists')
+def browse():
+    model, title, seeking_label = BROWSE_PAGES[request.endpoint]
+    filters = browse_filters()
+    facets = facet_counts[model]
+    rows, next_cursor, prev_cursor = keyset_page(
+        model.query.with_entities(model.city, model.state, model.name, model.id).filter(*facets.criteria(filters)),
+        [model.name, model.id], [str, int], app.config['BROWSE_PER_PAGE']
+    )
+    return render_template(
+        'pages/browse.html', title=title, seeking_label=seeking_label, rows=rows,
+        facets=facet_links(filters, facets.counts(filters)),
+        clear_url=browse_url([]) if filters else None,
+        next_url=browse_url(filters, after=next_cursor) if next_cursor else None,
+        prev_url=browse_url(filters, before=prev_cursor) if prev_cursor else None
+    )
 
 
 #  Update
@@ -510,37 +1560,86 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
-def shows():
-    data = []
-    show_list = Show.query.join(
-        Venue, (Venue.id == Show.venue_id)
-    ).join(
-        Artist, (Artist.id == Show.artist_id)
-    ).with_entities(
-        Show.id,
-        Show.name,
-        Show.venue_id,
-        Venue.name.label('venue_name'),
-        Show.artist_id,
-        Artist.name.label('artist_name'),
-        Artist.image_link,
-        Show.start_time
+SHOW_WINDOW_FILTERS = ['from', 'to', 'state', 'city', 'venue_id']
+
+
+def show_window_filters(values, required=False):
+    # from/to (dates: shows running at any time from `from` up to `to`), state,
+    # city and venue_id from `values`; raises ValueError on a malformed one. A
+    # window needs both ends, so that it is a bounded search of the show period
+    # index.
+    filters = {}
+    for name in SHOW_WINDOW_FILTERS:
+        value = values.get(name)
+        if value in (None, ''):
+            continue
+        try:
+            if name in ('from', 'to'):
+                filters[name] = dateutil.parser.parse(value)
+            elif name == 'venue_id':
+                filters[name] = int(value)
+            else:
+                filters[name] = value
+        except (ValueError, OverflowError):
+            raise ValueError('invalid {}: {!r}'.format(name, value))
+    if ('from' in filters) != ('to' in filters) or (required and 'from' not in filters):
+        raise ValueError('give both from and to')
+    if 'from' in filters and filters['to'] <= filters['from']:
+        raise ValueError('to must be after from')
+    return filters
+
+
+def show_listing(names, filters=None):
+    # One keyset page of shows ordered by (start_time, id) as `names` dicts, with
+    # the next and previous cursors, narrowed by show_window_filters().
+    filters = filters or {}
+    query = show_query().with_entities(
+        *labelled(SHOW_FIELDS, [name for name in names if name not in ('start_time', 'id')]),
+        Show.start_time,
+        Show.id
     )
+    if 'from' in filters:
+        query = query.filter(schedule.overlapping(
+            Show, filters['from'], filters['to'], db.engine.dialect.name, filters.get('venue_id')
+        ))
+    elif 'venue_id' in filters:
+        query = query.filter(Show.venue_id == filters['venue_id'])
+    if 'state' in filters:
+        query = query.filter(Venue.state == filters['state'])
+    if 'city' in filters:
+        query = query.filter(Venue.city == filters['city'])
+    rows, next_cursor, prev_cursor = keyset_page(
+        query, [Show.start_time, Show.id], [datetime, int], app.config['SHOWS_PER_PAGE']
+    )
+    return [row_data(row, names) for row in rows], next_cursor, prev_cursor
 
-    for item in show_list:
-        data.append({
-            "id": item.id,
-            "show_name": item.name,
-            "venue_id": item.venue_id,
-            "start_time": item.start_time,
-            "venue_name": item.venue_name,
-            "artist_id": item.artist_id,
-            "artist_name": item.artist_name,
-            "artist_image_link": item.image_link
-        })
 
-    return render_template('pages/shows.html', shows=data)
+def booking_conflict(venue_id, start_time, end_time, show_id=None):
+    # The first show other than show_id booked at the venue during [start_time,
+    # end_time), or None. The venue row is locked first, so that concurrent
+    # bookings of one venue are checked and committed one after another; the
+    # lock lasts until the caller's commit or rollback.
+    db.session.query(Venue.id).filter(Venue.id == venue_id).with_for_update(key_share=True).first()
+    query = db.session.query(Show.name, Show.start_time, Show.end_time).filter(
+        schedule.overlapping(Show, start_time, end_time, db.engine.dialect.name, venue_id)
+    )
+    if show_id is not None:
+        query = query.filter(Show.id != show_id)
+    return query.order_by(Show.start_time).first()
+
+
+def booking_conflict_message(conflict):
+    return 'The venue is already booked from {} to {} for {}.'.format(
+        conflict.start_time.strftime('%Y-%m-%d %H:%M'), conflict.end_time.strftime('%Y-%m-%d %H:%M'),
+        conflict.name
+    )
+
+
+@app.route('/shows')
+def shows():
+    data, next_cursor, prev_cursor = show_listing(list(SHOW_FIELDS))
+    return render_page('pages/shows.html', shows=data,
+                       next_cursor=next_cursor, prev_cursor=prev_cursor)
 
 
 @app.route('/shows/create')
@@ -555,9 +1654,15 @@ def create_show_submission():
     form = ShowForm(request.form, meta={'csrf': False})
     if form.validate():
         try:
+            conflict = booking_conflict(form.venue_id.data, form.start_time.data, form.end_time.data)
+            if conflict is not None:
+                db.session.rollback()
+                flash(booking_conflict_message(conflict))
+                return redirect(url_for('create_show_submission'))
             show_item = Show(
                 name=form.name.data,
                 start_time=form.start_time.data,
+                end_time=form.end_time.data,
                 artist_id=form.artist_id.data,
                 venue_id=form.venue_id.data
             )
@@ -583,17 +1688,35 @@ def create_show_submission():
 def edit_show(show_id):
     model = Show.query.get(show_id)
     form = ShowForm(obj=model)
+    form.artist_id.choices = choice_lookups['artist'].choices(model.artist_id)
+    form.venue_id.choices = choice_lookups['venue'].choices(model.venue_id)
     return render_template('forms/edit_show.html', form=form, show=model)
 
 
+@app.route('/shows/choices/<kind>')
+def show_choices(kind):
+    # Typeahead for the ShowForm artist_id / venue_id selects.
+    if kind not in choice_lookups:
+        abort(404)
+    return jsonify([
+        {"id": item_id, "name": name} for item_id, name in choice_lookups[kind].search(request.args.get('q', ''))
+    ])
+
+
 @app.route('/shows/<int:show_id>/edit', methods=['POST'])
 def edit_show_submission(show_id):
     form = ShowForm(request.form, meta={'csrf': False})
     if form.validate():
         try:
+            conflict = booking_conflict(form.venue_id.data, form.start_time.data, form.end_time.data, show_id)
+            if conflict is not None:
+                db.session.rollback()
+                flash(booking_conflict_message(conflict))
+                return redirect(url_for('edit_show_submission', show_id=show_id))
             show_item = Show.query.get(show_id)
             show_item.name = form.name.data
             show_item.start_time = form.start_time.data
+            show_item.end_time = form.end_time.data
             show_item.artist_id = form.artist_id.data
             show_item.venue_id = form.venue_id.data
             db.session.commit()
@@ -613,84 +1736,339 @@ def edit_show_submission(show_id):
     return redirect(url_for('show_show', show_id=show_id))
 
 
-@app.route('/shows/search', methods=['POST'])
-def search_shows():
-    search_term = request.form.get('search_term', '')
-    search_result = Show.query.join(
-        Venue, (Venue.id == Show.venue_id)
-    ).join(
-        Artist, (Artist.id == Show.artist_id)
-    ).with_entities(
-        Show.id,
-        Show.name,
-        Show.venue_id,
-        Venue.name.label('venue_name'),
-        Show.artist_id,
-        Artist.name.label('artist_name'),
-        Artist.image_link,
-        Show.start_time
-    ).filter(
-        Show.start_time >= datetime.now()
-    ).filter(
+def search_show_rows(search_term, page, per_page, names):
+    # Plan returning one page of upcoming shows matching the search as `names`
+    # dicts, and the match count.
+    rows, total = yield from run_search(
+        show_query().with_entities(
+            Show.id, *labelled(SHOW_FIELDS, [name for name in names if name != 'id'])
+        ).filter(
+            Show.start_time >= datetime.now()
+        ),
         or_(
-            Show.name.ilike('%' + search_term + '%'),
-            Artist.name.ilike("%" + search_term + "%"),
-            Venue.name.ilike("%" + search_term + "%")
-        )
+            text_match(Show, search_term),
+            matching_ids(Show.artist_id, Artist, search_term),
+            matching_ids(Show.venue_id, Venue, search_term)
+        ),
+        [Show.start_time, Show.id],
+        page, per_page
     )
+    return [row_data(row, names) for row in rows], total
 
-    data = []
-    for item in search_result:
-        data.append({
-            "id": item.id,
-            "show_name": item.name,
-            "venue_id": item.venue_id,
-            "start_time": item.start_time,
-            "venue_name": item.venue_name,
-            "artist_id": item.artist_id,
-            "artist_name": item.artist_name,
-            "artist_image_link": item.image_link
-        })
 
-    response = {
-        "count": len(data),
-        "data": data
-    }
+@app.route('/shows/search', methods=['POST'])
+@plan_view
+def search_shows():
+    search_term = request.form.get('search_term', '')
+    page, per_page = search_page()
+    data, total = yield from search_show_rows(search_term, page, per_page, list(SHOW_FIELDS))
+
+    response = search_response(total, data, page, per_page)
     return render_template('pages/search_show.html', results=response, search_term=search_term)
 
 
+def show_detail(show_id, names):
+    row, = yield [Fetch(
+        show_query().with_entities(*labelled(SHOW_DETAIL_FIELDS, names)).filter(Show.id == show_id), 'first'
+    )]
+    return None if row is None else row_data(row, names)
+
+
 @app.route('/shows/<int:show_id>')
+@plan_view
+@cached_page('show:{show_id}')
 def show_show(show_id):
-    show_item = Show.query.get(show_id)
-
-    data = {
-        "id": show_item.id,
-        "show_name": show_item.name,
-        "start_time": show_item.start_time,
-        "artist_id": show_item.artist_id,
-        "artist_name": show_item.Artist.name,
-        "artist_city": show_item.Artist.city,
-        "artist_state": show_item.Artist.state,
-        "artist_phone": show_item.Artist.phone,
-        "artist_genres": show_item.Artist.genres,
-        "artist_website": show_item.Artist.website_link,
-        "artist_facebook_link": show_item.Artist.facebook_link,
-        "artist_image_link": show_item.Artist.image_link,
-
-        "venue_id": show_item.venue_id,
-        "venue_name": show_item.Venue.name,
-        "venue_city": show_item.Venue.city,
-        "venue_state": show_item.Venue.state,
-        "venue_phone": show_item.Venue.phone,
-        "venue_genres": show_item.Venue.genres,
-        "venue_website": show_item.Venue.website_link,
-        "venue_facebook_link": show_item.Venue.facebook_link,
-        "venue_image_link": show_item.Venue.image_link
-    }
-
+    data = yield from show_detail(show_id, list(SHOW_DETAIL_FIELDS))
+    if data is None:
+        return render_template('errors/404.html'), 404
     return render_template('pages/show_show.html', show=data)
 
 
+#  API
+#  ----------------------------------------------------------------
+# Read-only JSON versions of the detail, listing and search pages. ?fields=a,b
+# limits the response, and the columns selected, to those fields. Lists page
+# with the opaque cursors returned as "next" and "prev", passed back as ?after=
+# (search cursors hold a result offset, listing cursors a keyset position).
+
+def api_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(timespec='seconds')
+    raise TypeError(repr(value))
+
+
+def api_response(payload, status=200):
+    return Response(json.dumps(payload, separators=(',', ':'), default=api_value), status,
+                    mimetype='application/json')
+
+
+def requested_fields(available):
+    fields = request.args.get('fields')
+    if not fields:
+        return list(available)
+    names = list(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        abort(api_response({"error": "unknown fields: " + ', '.join(unknown)}, 400))
+    return names
+
+
+@app.route('/api/v1/venues/<int:venue_id>')
+@plan_view
+def api_venue(venue_id):
+    names = requested_fields(list(VENUE_FIELDS) + DETAIL_SHOW_FIELDS)
+    past_page = max(request.args.get('past_page', 1, type=int), 1)
+    data = yield from detail_data(VENUE_FIELDS, venue_id, names, VENUE_SHOWS, past_page)
+    if data is None:
+        return api_response({"error": "venue not found"}, 404)
+    return api_response({"data": data})
+
+
+@app.route('/api/v1/artists/<int:artist_id>')
+@plan_view
+def api_artist(artist_id):
+    names = requested_fields(list(ARTIST_FIELDS) + DETAIL_SHOW_FIELDS)
+    past_page = max(request.args.get('past_page', 1, type=int), 1)
+    data = yield from detail_data(ARTIST_FIELDS, artist_id, names, ARTIST_SHOWS, past_page)
+    if data is None:
+        return api_response({"error": "artist not found"}, 404)
+    return api_response({"data": data})
+
+
+@app.route('/api/v1/shows/<int:show_id>')
+@plan_view
+def api_show(show_id):
+    data = yield from show_detail(show_id, requested_fields(SHOW_DETAIL_FIELDS))
+    if data is None:
+        return api_response({"error": "show not found"}, 404)
+    return api_response({"data": data})
+
+
+# Matches: for an artist, the venues seeking talent; for a venue, the artists
+# seeking a venue. Ranked on shared genres, same city or state and past shows
+# together (see MatchIndex.rank), with search-style offset cursors.
+MATCH_FIELDS = ['score', 'shared_genres', 'shows_together']
+
+
+def api_matches(model, model_id, model_fk, other, other_fields, other_fk):
+    names = requested_fields(list(other_fields) + MATCH_FIELDS)
+    item = db.session.query(model.genres, model.city, model.state).filter(model.id == model_id).first()
+    if item is None:
+        return api_response({"error": "{} not found".format(model.__tablename__.lower())}, 404)
+    history = dict(
+        db.session.query(other_fk, db.func.count()).filter(
+            model_fk == model_id, Show.start_time < datetime.now()
+        ).group_by(other_fk)
+    )
+    per_page = app.config['MATCHES_PER_PAGE']
+    after = request.args.get('after')
+    offset = max(decode_cursor(after, [int])[0], 0) if after else 0
+    matches, total = match_indexes[other].rank(
+        item.genres, item.city, item.state, history, app.config['MATCH_WEIGHTS'], offset, per_page
+    )
+    field_names = [name for name in names if name in other_fields]
+    rows = {
+        row.id: row for row in db.session.query(
+            *labelled(other_fields, [name for name in field_names if name != 'id']), other.id
+        ).filter(other.id.in_([match_id for match_id, _, _, _ in matches]))
+    } if matches else {}
+    data = []
+    for match_id, score, shared_genres, shows_together in matches:
+        # A row deleted since the features were loaded is skipped.
+        if match_id in rows:
+            values = dict(row_data(rows[match_id], field_names),
+                          score=score, shared_genres=shared_genres, shows_together=shows_together)
+            data.append({name: values[name] for name in names})
+    return api_response({
+        "data": data,
+        "count": total,
+        "next": encode_cursor([offset + per_page]) if offset + per_page < total else None,
+        "prev": encode_cursor([max(offset - per_page, 0)]) if offset else None
+    })
+
+
+@app.route('/api/v1/artists/<int:artist_id>/matches')
+def api_artist_matches(artist_id):
+    return api_matches(Artist, artist_id, Show.artist_id, Venue, VENUE_FIELDS, Show.venue_id)
+
+
+@app.route('/api/v1/venues/<int:venue_id>/matches')
+def api_venue_matches(venue_id):
+    return api_matches(Venue, venue_id, Show.venue_id, Artist, ARTIST_FIELDS, Show.artist_id)
+
+
+@app.route('/api/v1/shows')
+def api_shows():
+    # ?from=&to= (shows running at any time in that window), ?state=, ?city=,
+    # ?venue_id=.
+    names = requested_fields(SHOW_FIELDS)
+    try:
+        filters = show_window_filters(request.args)
+    except ValueError as error:
+        return api_response({"error": str(error)}, 400)
+    data, next_cursor, prev_cursor = show_listing(names, filters)
+    return api_response({"data": data, "next": next_cursor, "prev": prev_cursor})
+
+
+@app.route('/api/v1/venues/available')
+def api_available_venues():
+    # Venues with no show booked at any time from ?from= up to ?to=, optionally
+    # in ?state= and ?city=, in id order.
+    names = requested_fields(VENUE_FIELDS)
+    try:
+        filters = show_window_filters(request.args, required=True)
+    except ValueError as error:
+        return api_response({"error": str(error)}, 400)
+    if 'venue_id' in filters:
+        return api_response({"error": "venue_id does not apply here"}, 400)
+    query = Venue.query.with_entities(
+        *labelled(VENUE_FIELDS, [name for name in names if name != 'id']), Venue.id
+    ).filter(
+        ~db.exists().where(schedule.overlapping(
+            Show, filters['from'], filters['to'], db.engine.dialect.name, Venue.id
+        ))
+    )
+    if 'state' in filters:
+        query = query.filter(Venue.state == filters['state'])
+    if 'city' in filters:
+        query = query.filter(Venue.city == filters['city'])
+    rows, next_cursor, prev_cursor = keyset_page(query, [Venue.id], [int], app.config['AVAILABLE_VENUES_PER_PAGE'])
+    return api_response({"data": [row_data(row, names) for row in rows], "next": next_cursor, "prev": prev_cursor})
+
+
+def api_search(search, available):
+    names = requested_fields(available)
+    per_page = app.config['SEARCH_RESULTS_PER_PAGE']
+    after = request.args.get('after')
+    offset = max(decode_cursor(after, [int])[0], 0) if after else 0
+    data, total = yield from search(request.args.get('q', ''), offset // per_page + 1, per_page, names)
+    count_limit = app.config['SEARCH_COUNT_LIMIT']
+    return api_response({
+        "data": data,
+        "count": min(total, count_limit),
+        "count_capped": total > count_limit,
+        "next": encode_cursor([offset + per_page]) if offset + per_page < total else None,
+        "prev": encode_cursor([max(offset - per_page, 0)]) if offset else None
+    })
+
+
+@app.route('/api/v1/venues/search')
+@plan_view
+def api_search_venues():
+    return (yield from api_search(
+        lambda term, page, per_page, names: search_owners(Venue, VENUE_FIELDS, term, page, per_page, names),
+        list(VENUE_FIELDS) + ['upcoming_shows_count']
+    ))
+
+
+@app.route('/api/v1/artists/search')
+@plan_view
+def api_search_artists():
+    return (yield from api_search(
+        lambda term, page, per_page, names: search_owners(Artist, ARTIST_FIELDS, term, page, per_page, names),
+        list(ARTIST_FIELDS) + ['upcoming_shows_count']
+    ))
+
+
+@app.route('/api/v1/shows/search')
+@plan_view
+def api_search_shows():
+    return (yield from api_search(search_show_rows, SHOW_FIELDS))
+
+
+#  Export
+#  ----------------------------------------------------------------
+# Full dumps of shows (the /shows projection), venues and artists as CSV or
+# NDJSON. Rows come from a server-side cursor EXPORT_BATCH_SIZE at a time and
+# are encoded, and optionally gzipped, as they are sent, so memory use does not
+# grow with the table.
+
+EXPORTS = {
+    'shows': (SHOW_FIELDS, show_query, [Show.start_time, Show.id]),
+    'venues': (VENUE_FIELDS, lambda: Venue.query, [Venue.id]),
+    'artists': (ARTIST_FIELDS, lambda: Artist.query, [Artist.id]),
+}
+EXPORT_FILTERS = ['since', 'until', 'venue_id', 'artist_id']
+
+
+def export_filters(values):
+    # since/until (dates, start_time >= since and < until), venue_id and
+    # artist_id from `values`; raises ValueError on a malformed one.
+    filters = {}
+    for name in EXPORT_FILTERS:
+        value = values.get(name)
+        if value in (None, ''):
+            continue
+        try:
+            filters[name] = dateutil.parser.parse(value) if name in ('since', 'until') else int(value)
+        except (ValueError, OverflowError):
+            raise ValueError('invalid {}: {!r}'.format(name, value))
+    return filters
+
+
+def export_rows(kind, names, filters):
+    fields, query, order = EXPORTS[kind]
+    if filters and kind != 'shows':
+        raise ValueError('filters only apply to the shows export: ' + ', '.join(filters))
+    query = query().with_entities(*labelled(fields, names))
+    if 'since' in filters:
+        query = query.filter(Show.start_time >= filters['since'])
+    if 'until' in filters:
+        query = query.filter(Show.start_time < filters['until'])
+    if 'venue_id' in filters:
+        query = query.filter(Show.venue_id == filters['venue_id'])
+    if 'artist_id' in filters:
+        query = query.filter(Show.artist_id == filters['artist_id'])
+    return query.order_by(*order).yield_per(app.config['EXPORT_BATCH_SIZE'])
+
+
+def export_stream(kind, names, filters, fmt, compress):
+    chunks = exporter.encode_rows(export_rows(kind, names, filters), names, fmt,
+                                  app.config['EXPORT_BATCH_SIZE'])
+    return exporter.gzip_chunks(chunks) if compress else chunks
+
+
+@app.route('/api/v1/export/<kind>')
+def api_export(kind):
+    # ?format=csv|ndjson (default csv), ?gzip=1, ?fields=, and for shows
+    # ?since=, ?until=, ?venue_id=, ?artist_id=.
+    if kind not in EXPORTS:
+        return api_response({"error": "unknown export"}, 404)
+    fmt = request.args.get('format', 'csv')
+    if fmt not in exporter.FORMATS:
+        return api_response({"error": "format must be one of: " + ', '.join(exporter.FORMATS)}, 400)
+    names = requested_fields(EXPORTS[kind][0])
+    compress = request.args.get('gzip', '') not in ('', '0', 'false')
+    try:
+        filters = export_filters(request.args)
+        chunks = export_stream(kind, names, filters, fmt, compress)
+    except ValueError as error:
+        return api_response({"error": str(error)}, 400)
+    filename = '{}.{}{}'.format(kind, fmt, '.gz' if compress else '')
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/gzip' if compress else exporter.FORMATS[fmt],
+        headers={'Content-Disposition': 'attachment; filename=' + filename}
+    )
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(page_cache.snapshot())
+
+
+@app.route('/tasks/stats')
+def task_stats():
+    return jsonify(task_queue.snapshot())
+
+
+@app.route('/debug/sql')
+def debug_sql():
+    if not app.config['SQL_STATS_ENDPOINT']:
+        abort(404)
+    return jsonify(recent_sql.snapshot())
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -711,6 +2089,259 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+# ----------------------------------------------------------------------------#
+# CLI.
+# ----------------------------------------------------------------------------#
+
+def reject_existing_artists(session, rows):
+    # Artist names are unique: reject names already taken, in the table or by an
+    # earlier row of the batch.
+    names = [str(row.get('name') or '').strip() for row in rows]
+    taken = {name for name, in session.query(Artist.name).filter(Artist.name.in_(set(names) - {''}))}
+    errors = {}
+    for i, name in enumerate(names):
+        if name in taken:
+            errors[i] = {"name": ["An artist named '{}' already exists.".format(name)]}
+        taken.add(name)
+    return errors
+
+
+def resolve_show_references(session, rows):
+    # Fills each row's artist_id/venue_id from an existing id or, failing that,
+    # from an `artist`/`venue` name; venue names must be unambiguous.
+    errors = {}
+    for model, key, name_key in ((Artist, 'artist_id', 'artist'), (Venue, 'venue_id', 'venue')):
+        ids = set()
+        names = set()
+        for row in rows:
+            if str(row.get(key) or '').strip().isdigit():
+                ids.add(int(row[key]))
+            elif row.get(name_key):
+                names.add(str(row[name_key]).strip())
+        existing = {item_id for item_id, in session.query(model.id).filter(model.id.in_(ids))} if ids else set()
+        ids_by_name = collections.defaultdict(list)
+        if names:
+            for item_id, name in session.query(model.id, model.name).filter(model.name.in_(names)):
+                ids_by_name[name].append(item_id)
+
+        for i, row in enumerate(rows):
+            if str(row.get(key) or '').strip().isdigit():
+                item_id = int(row[key])
+                message = None if item_id in existing else 'No {} with id {}.'.format(name_key, item_id)
+            elif row.get(name_key):
+                name = str(row[name_key]).strip()
+                matches = ids_by_name.get(name, [])
+                item_id = matches[0] if len(matches) == 1 else None
+                if not matches:
+                    message = 'No {} named {!r}.'.format(name_key, name)
+                elif item_id is None:
+                    message = 'Several {}s are named {!r}; give the {}.'.format(name_key, name, key)
+                else:
+                    message = None
+            else:
+                item_id, message = None, 'Give a {} or {}.'.format(key, name_key)
+            if message:
+                errors.setdefault(i, {})[key] = [message]
+            else:
+                row[key] = item_id
+    return errors
+
+
+IMPORT_SPECS = {
+    'venues': ImportSpec(
+        Venue, VenueForm,
+        ['name', 'city', 'state', 'address', 'phone', 'image_link', 'genres', 'facebook_link', 'website_link',
+         'seeking_talent', 'seeking_description'],
+        ['genres'], ['seeking_talent'], None,
+        functools.partial(record_bulk_insert, Venue)
+    ),
+    'artists': ImportSpec(
+        Artist, ArtistForm,
+        ['name', 'city', 'state', 'phone', 'image_link', 'genres', 'facebook_link', 'website_link',
+         'seeking_venue', 'seeking_description'],
+        ['genres'], ['seeking_venue'], reject_existing_artists,
+        functools.partial(record_bulk_insert, Artist)
+    ),
+    'shows': ImportSpec(
+        Show, ShowImportForm,
+        ['name', 'start_time', 'end_time', 'artist_id', 'venue_id'],
+        [], [], resolve_show_references,
+        functools.partial(record_bulk_insert, Show)
+    ),
+}
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORT_SPECS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Input format; defaults to the file extension.')
+@click.option('--batch-size', type=int, default=None, help='Rows per transaction; defaults to IMPORT_BATCH_SIZE.')
+@click.option('--rejects', type=click.Path(dir_okay=False), help='Rejected rows report; defaults to PATH.rejected.jsonl.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and start again from the first row.')
+def import_rows(kind, path, fmt, batch_size, rejects, restart):
+    """Bulk-load venues, artists or shows from a CSV or JSONL file.
+
+    Rows are validated like the create forms; shows name their artist and venue
+    by id (artist_id, venue_id) or name (artist, venue). An interrupted import
+    resumes after its last committed batch when run again.
+    """
+    path = os.path.abspath(path)
+    importer = Importer(
+        db.session, IMPORT_SPECS[kind], ImportCheckpoint, batch_size or app.config['IMPORT_BATCH_SIZE']
+    )
+    source = '{}:{}'.format(kind, path)
+
+    def progress(rows_done, accepted, rejected):
+        click.echo('{} rows read, {} imported, {} rejected'.format(rows_done, accepted, rejected))
+
+    try:
+        accepted, rejected, skipped = importer.run(
+            read_records(path, fmt), source, rejects or path + '.rejected.jsonl', restart, progress
+        )
+    except Exception:
+        db.session.rollback()
+        raise
+    if skipped:
+        click.echo('Resumed after {} rows already imported.'.format(skipped))
+    click.echo('Done: {} {} imported, {} rejected{}.'.format(
+        accepted, kind, rejected, ' (see {})'.format(rejects or path + '.rejected.jsonl') if rejected else ''
+    ))
+
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(EXPORTS)))
+@click.argument('output', default='-', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(sorted(exporter.FORMATS)),
+              help='Output format; defaults to the file extension, or csv.')
+@click.option('--gzip', 'compress', is_flag=True, default=None, help='Gzip the output; implied by a .gz OUTPUT.')
+@click.option('--fields', help='Comma-separated fields to export; defaults to all.')
+@click.option('--since', help='Only shows starting at or after this date.')
+@click.option('--until', help='Only shows starting before this date.')
+@click.option('--venue-id', type=int, help='Only shows at this venue.')
+@click.option('--artist-id', type=int, help='Only shows by this artist.')
+def export(kind, output, fmt, compress, fields, since, until, venue_id, artist_id):
+    """Write all shows, venues or artists to OUTPUT (stdout by default).
+
+    Rows are streamed from a server-side cursor, so the export runs in constant
+    memory whatever the table size.
+    """
+    name = output[:-3] if output.endswith('.gz') else output
+    fmt = fmt or ('ndjson' if name.endswith(('.ndjson', '.jsonl')) else 'csv')
+    compress = output.endswith('.gz') if compress is None else compress
+    available = EXPORTS[kind][0]
+    names = [field.strip() for field in fields.split(',') if field.strip()] if fields else list(available)
+    unknown = [field for field in names if field not in available]
+    if unknown or not names:
+        raise click.BadParameter('unknown fields: ' + ', '.join(unknown), param_hint='--fields')
+    try:
+        filters = export_filters({'since': since, 'until': until, 'venue_id': venue_id, 'artist_id': artist_id})
+        chunks = export_stream(kind, names, filters, fmt, compress)
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    with click.open_file(output, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+def roll_show_counts(now, recount=False):
+    # Moves rolled_until forward to `now`, shifting the shows that started in
+    # between from upcoming to past, or with recount=True rebuilds the counts
+    # tables at `now`. Returns the (venues, artists) counts rows written.
+    roll = db.session.query(ShowCountRoll).with_for_update().one()
+    if not recount and now <= roll.rolled_until:
+        db.session.rollback()
+        return 0, 0
+    written = []
+    for counts, owner_fk in SHOW_COUNTS.values():
+        show_fk = getattr(Show, owner_fk.name)
+        if recount:
+            db.session.execute(db.delete(counts))
+            statement = db.insert(counts).from_select(
+                [owner_fk.name, 'upcoming_shows_count', 'past_shows_count'],
+                db.select(
+                    show_fk,
+                    db.func.count(Show.id).filter(Show.start_time >= now),
+                    db.func.count(Show.id).filter(Show.start_time < now)
+                ).group_by(show_fk)
+            )
+        else:
+            passed = db.and_(Show.start_time >= roll.rolled_until, Show.start_time < now)
+            started = db.select(db.func.count(Show.id)).where(show_fk == owner_fk, passed).scalar_subquery()
+            statement = db.update(counts).where(
+                owner_fk.in_(db.select(show_fk).where(passed))
+            ).values(
+                upcoming_shows_count=counts.upcoming_shows_count - started,
+                past_shows_count=counts.past_shows_count + started
+            ).execution_options(synchronize_session=False)
+        written.append(db.session.execute(statement).rowcount)
+    roll.rolled_until = now
+    db.session.commit()
+    return tuple(written)
+
+
+@app.cli.command('delete')
+@click.argument('kind', type=click.Choice(sorted(DELETABLE)))
+@click.argument('ids', nargs=-1, type=int)
+@click.option('--ids-file', type=click.File(), help='File of ids to delete, one per line ("-" for stdin).')
+@click.option('--batch-size', type=int, default=None, help='Ids per transaction; defaults to DELETE_BATCH_SIZE.')
+def delete_rows_command(kind, ids, ids_file, batch_size):
+    """Delete venues or artists by id, with all of their shows.
+
+    Each batch of ids is deleted in its own transaction by two set-based
+    statements, so locks are held briefly however many ids are given.
+    """
+    ids = list(ids)
+    if ids_file:
+        ids.extend(int(line) for line in ids_file if line.strip())
+    ids = sorted(set(ids))
+    batch_size = batch_size or app.config['DELETE_BATCH_SIZE']
+    total_rows = total_shows = 0
+    for start in range(0, len(ids), batch_size):
+        try:
+            deleted, shows = delete_rows(kind, ids[start:start + batch_size])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        total_rows += deleted
+        total_shows += shows
+    click.echo('Deleted {} {} and {} shows.'.format(total_rows, kind, total_shows))
+
+
+@app.cli.command('roll-show-counts')
+@click.option('--recount', is_flag=True, help='Recompute all the counts from the Show table.')
+def roll_show_counts_command(recount):
+    """Move shows that have started from the upcoming to the past counts.
+
+    Run it periodically (e.g. every few minutes from cron); the counts lag real
+    time by at most the interval between runs.
+    """
+    now = datetime.now()
+    venues, artists = roll_show_counts(now, recount)
+    click.echo('Show counts {} at {}: {} venues and {} artists updated.'.format(
+        'recounted' if recount else 'rolled forward', now.isoformat(timespec='seconds'), venues, artists
+    ))
+
+
+@app.cli.command('assets')
+@click.option('--clean', is_flag=True, help='Delete the files of earlier builds.')
+def build_assets_command(clean):
+    """Build the hashed, bundled and gzipped static files.
+
+    Writes static/dist/ and its manifest.json; restart the app servers to serve
+    the new files. Files of earlier builds are kept for pages still cached
+    with their URLs, unless --clean.
+    """
+    manifest = assets.build(app.static_folder, app.config['ASSET_DIST'], clean)
+    asset_manifest.load()
+    for bundle in assets.BUNDLES:
+        path = os.path.join(app.static_folder, manifest[bundle])
+        click.echo('{} -> {} ({} bytes, {} gzipped)'.format(
+            bundle, manifest[bundle], os.path.getsize(path), os.path.getsize(path + '.gz')
+        ))
+    click.echo('{} static files built.'.format(len(manifest)))
+
+
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
@@ -0,0 +1,253 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import g, request
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.exceptions import HTTPException
+
+from app import app, db, start_statement, record_statement
+from plans import fetch_all
+from routing import async_uri, engine_options, replica_binds
+
+# ----------------------------------------------------------------------------#
+# Async mode.
+# ----------------------------------------------------------------------------#
+
+# Fyyur served by an ASGI server:
+#
+#     uvicorn asgi:application --workers 4
+#
+# The views written as plans (the venue, artist and show pages, the searches
+# and their /api/v1 versions) run as coroutines on the worker's event loop:
+# each list of independent queries a plan yields is sent to Postgres at once on
+# asyncpg engines, over at most ASGI_PLAN_CONNECTIONS connections per request,
+# and no thread is held while they run. Every other request runs the Flask app
+# unchanged on one of ASGI_SYNC_THREADS threads.
+
+
+def async_engines(config):
+    # An AsyncEngine per bind: None for the primary, then one per replica bind,
+    # timed by the same SQL instrumentation as the sync engines.
+    uris = {None: config['SQLALCHEMY_DATABASE_URI']}
+    uris.update(replica_binds(config['SQLALCHEMY_REPLICA_URIS']))
+    engines = {}
+    for bind, uri in uris.items():
+        uri = async_uri(uri)
+        engine = create_async_engine(uri, **engine_options(
+            uri, config['DB_POOL_SIZE'], config['DB_MAX_OVERFLOW'], config['DB_POOL_TIMEOUT'],
+            config['DB_POOL_RECYCLE'], config['DB_POOL_PRE_PING'], config['DB_STATEMENT_TIMEOUT_MS']
+        ))
+        db.event.listen(engine.sync_engine, 'before_cursor_execute', start_statement)
+        db.event.listen(engine.sync_engine, 'after_cursor_execute', record_statement)
+        engines[bind] = engine
+    return engines
+
+
+class AsyncApp:
+    # ASGI application serving `flask_app`. With `async_plans`, requests for
+    # plan views run on the event loop, their Fetches at most
+    # `plan_connections` at a time per request; the rest run on `threads`
+    # threads.
+
+    def __init__(self, flask_app, threads, plan_connections, async_plans=True):
+        self.app = flask_app
+        self.plan_connections = plan_connections
+        self.engines = async_engines(flask_app.config) if async_plans else {}
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError('unsupported ASGI scope type {!r}'.format(scope['type']))
+        environ = wsgi_environ(scope, await read_body(receive))
+        if self.engines and self.plan_endpoint(environ):
+            app_iter, status, headers = await self.call_plan_view(environ)
+            await send_response(app_iter, status, headers, send)
+        else:
+            await self.run_wsgi(environ, send)
+
+    def plan_endpoint(self, environ):
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return False
+        return hasattr(self.app.view_functions[endpoint], 'plan')
+
+    async def call_plan_view(self, environ):
+        # Flask.wsgi_app() and full_dispatch_request() for a plan view, with the
+        # plan driven on the loop. The request context is the task's own, as
+        # Flask's context locals are context variables. Returns the response as
+        # (app_iter, status, headers).
+        app = self.app
+        ctx = app.request_context(environ)
+        error = None
+        try:
+            try:
+                ctx.push()
+                app.try_trigger_before_first_request_functions()
+                try:
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await self.dispatch_plan()
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                response = app.finalize_request(rv)
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            except:  # noqa: E722
+                error = sys.exc_info()[1]
+                raise
+            return response.get_wsgi_response(environ)
+        finally:
+            if app.should_ignore_error(error):
+                error = None
+            ctx.auto_pop(error)
+
+    async def dispatch_plan(self):
+        if request.routing_exception is not None:
+            self.app.raise_routing_exception(request)
+        plan = self.app.view_functions[request.url_rule.endpoint].plan(**request.view_args)
+        results = None
+        while True:
+            try:
+                fetches = plan.send(results)
+            except StopIteration as stop:
+                return stop.value
+            # The bind is looked up per list, so a plan can change binds as it
+            # goes (cached_page() moves misses to the primary).
+            results = await fetch_all(self.engines[g.get('replica_bind')], fetches, self.plan_connections)
+
+    async def run_wsgi(self, environ, send):
+        loop = asyncio.get_running_loop()
+
+        def send_from_thread(message):
+            # Waits until the server has taken the message, so a streamed
+            # response (an export) is produced no faster than it is sent.
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        await loop.run_in_executor(self.executor, call_wsgi, self.app, environ, send_from_thread)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for engine in self.engines.values():
+                    await engine.dispose()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+# ----------------------------------------------------------------------------#
+# WSGI over ASGI.
+# ----------------------------------------------------------------------------#
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    return bytes(body)
+
+
+def wsgi_environ(scope, body):
+    # The WSGI environ of an ASGI HTTP request.
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin-1')
+        if name in environ:
+            value = environ[name] + ('; ' if name == 'HTTP_COOKIE' else ',') + value
+        environ[name] = value
+    return environ
+
+
+def asgi_headers(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+async def send_response(app_iter, status, headers, send):
+    # Sends a WSGI response (from the loop) as ASGI messages.
+    try:
+        await send({'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                    'headers': asgi_headers(headers)})
+        for chunk in app_iter:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body'})
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+
+def call_wsgi(wsgi_app, environ, send):
+    # Runs a WSGI app (in a worker thread) and sends its response as ASGI
+    # messages, a body message per chunk of a streamed response. The start
+    # message goes with the first chunk, so until then an error handler may
+    # replace it (start_response with exc_info); after, the error is re-raised.
+    start = {}
+    started = False
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info is not None and started:
+            raise exc_info[1].with_traceback(exc_info[2])
+        if start and exc_info is None:
+            raise AssertionError('start_response called twice without exc_info')
+        start.update(type='http.response.start', status=int(status.split(' ', 1)[0]), headers=asgi_headers(headers))
+
+    body = wsgi_app(environ, start_response)
+    try:
+        for chunk in body:
+            if not started:
+                send(start)
+                started = True
+            if chunk:
+                send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not started:
+            send(start)
+            started = True
+        send({'type': 'http.response.body'})
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+# No async driver is set up for SQLite, so there plans run on db.session.
+application = AsyncApp(
+    app, app.config['ASGI_SYNC_THREADS'], app.config['ASGI_PLAN_CONNECTIONS'],
+    async_plans=app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres')
+)
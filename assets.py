@@ -0,0 +1,169 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+
+# ----------------------------------------------------------------------------#
+# Static assets.
+# ----------------------------------------------------------------------------#
+
+# `flask assets` builds the static files for production into static/<dist>/:
+# each bundle of BUNDLES concatenated into one file, and a copy of every other
+# static file, all named after a hash of their content (css/site.css ->
+# dist/css/site.3f9c2a1b7d4e.css), with a gzipped copy of each compressible one
+# alongside (site.3f9c2a1b7d4e.css.gz). manifest.json maps the
+# original names to the built ones. A hashed name changes whenever the content
+# does, so the built files can be cached by browsers forever.
+
+# Bundle name -> its static files, in load order. The layout includes a
+# bundle's files one by one until the bundle is built.
+BUNDLES = {
+    'css/site.css': [
+        'css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css', 'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    # Loaded synchronously in <head>.
+    'js/head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    # Deferred, after jQuery.
+    'js/site.js': ['js/script.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'],
+}
+
+# Extensions worth gzipping; images and woff fonts are compressed already.
+COMPRESSIBLE = {'.css', '.js', '.map', '.json', '.svg', '.txt', '.eot', '.ttf', '.otf'}
+
+MANIFEST = 'manifest.json'
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def strip_source_maps(text):
+    # Source map references would not resolve inside a bundle. Nothing else
+    # is changed: the bundles are gzipped, which takes most of what a
+    # minifier would, and parsing CSS or JavaScript with regular expressions
+    # breaks on strings and regexes containing comment markers.
+    return '\n'.join(
+        line for line in text.splitlines() if not line.startswith(('//# sourceMappingURL', '/*# sourceMappingURL'))
+    )
+
+
+def hashed_name(filename, content):
+    root, ext = os.path.splitext(filename)
+    return '{}.{}{}'.format(root, hashlib.sha256(content).hexdigest()[:12], ext)
+
+
+def rewrite_css_urls(css, source, target, built):
+    # Rewrites the relative url()s of `source`'s CSS for its built copy at
+    # `target` (both static-relative paths), pointing at built files where
+    # there are some.
+    def rewrite(match):
+        url = match.group(2)
+        if re.match(r'^([a-z]+:|/|#)', url):
+            return match.group(0)
+        path, _, suffix = url.partition('?')
+        path, _, fragment = path.partition('#')
+        resolved = os.path.normpath(os.path.join(os.path.dirname(source), path)).replace(os.sep, '/')
+        resolved = built.get(resolved, resolved)
+        url = os.path.relpath(resolved, os.path.dirname(target)).replace(os.sep, '/')
+        return 'url("{}{}{}")'.format(url, '?' + suffix if suffix else '', '#' + fragment if fragment else '')
+    return CSS_URL.sub(rewrite, css)
+
+
+def static_files(static_folder, dist):
+    # Paths of the files under `static_folder`, skipping the `dist` directory.
+    for directory, subdirectories, filenames in os.walk(static_folder):
+        relative = os.path.relpath(directory, static_folder)
+        if dist and (relative == dist or relative.startswith(dist + os.sep)):
+            subdirectories[:] = []
+            continue
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if not filename.startswith('.'):
+                yield os.path.normpath(os.path.join(relative, filename)).replace(os.sep, '/')
+
+
+def write_built(static_folder, name, content):
+    path = os.path.join(static_folder, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if os.path.splitext(name)[1] in COMPRESSIBLE:
+        # mtime=0 keeps rebuilds of unchanged files byte-identical.
+        with open(path + '.gz', 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9, mtime=0) as f:
+            f.write(content)
+
+
+def build(static_folder, dist='dist', clean=False):
+    # Builds static/<dist>/ and returns the manifest. Plain files are built
+    # first, so that the url()s of the stylesheets can point at their hashed
+    # names. Files of earlier builds are kept for pages rendered before this
+    # one, unless `clean`.
+    manifest = {}
+    stylesheets = []
+    for filename in static_files(static_folder, dist):
+        if filename.endswith('.css'):
+            stylesheets.append(filename)
+            continue
+        with open(os.path.join(static_folder, filename), 'rb') as f:
+            content = f.read()
+        manifest[filename] = dist + '/' + hashed_name(filename, content)
+        write_built(static_folder, manifest[filename], content)
+
+    def css_for(filename, target):
+        with open(os.path.join(static_folder, filename), encoding='utf-8') as f:
+            return rewrite_css_urls(f.read(), filename, target, manifest)
+
+    # A stylesheet's urls depend on where it ends up, but not on its hash.
+    for filename in stylesheets:
+        target = dist + '/' + filename
+        content = css_for(filename, target).encode('utf-8')
+        manifest[filename] = dist + '/' + hashed_name(filename, content)
+        write_built(static_folder, manifest[filename], content)
+
+    for bundle, filenames in BUNDLES.items():
+        target = dist + '/' + bundle
+        parts = []
+        for filename in filenames:
+            if filename.endswith('.css'):
+                text = css_for(filename, target)
+            else:
+                with open(os.path.join(static_folder, filename), encoding='utf-8') as f:
+                    text = f.read()
+            parts.append(strip_source_maps(text))
+        # Scripts are separated by ';' in case one lacks its final semicolon.
+        content = ('\n' if bundle.endswith('.css') else ';\n').join(parts).encode('utf-8')
+        manifest[bundle] = dist + '/' + hashed_name(bundle, content)
+        write_built(static_folder, manifest[bundle], content)
+
+    with open(os.path.join(static_folder, dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    if clean:
+        keep = {MANIFEST} | {name[len(dist) + 1:] for name in manifest.values()}
+        keep |= {name + '.gz' for name in keep}
+        for filename in static_files(os.path.join(static_folder, dist), None):
+            if filename not in keep:
+                os.remove(os.path.join(static_folder, dist, filename))
+    return manifest
+
+
+class AssetManifest:
+    # The built names of static files, read from static/<dist>/manifest.json;
+    # empty (every file served as is) until `flask assets` has run.
+
+    def __init__(self, static_folder, dist='dist'):
+        self.path = os.path.join(static_folder, dist, MANIFEST)
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                self.built = json.load(f)
+        except FileNotFoundError:
+            self.built = {}
+
+    def filename(self, filename):
+        return self.built.get(filename, filename)
+
+    def bundle(self, name):
+        # The static files to include for bundle `name`.
+        return [self.built[name]] if name in self.built else list(BUNDLES[name])
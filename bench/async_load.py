@@ -0,0 +1,127 @@
+"""Sync vs async serving at a fixed worker size.
+
+    python -m bench.seed --venues 20000 --artists 100000 --shows 1000000
+    python -m bench.async_load --threads 1 --clients 16 --requests 200
+
+Serves the app through asgi.AsyncApp from one worker process, twice with the
+same number of threads: once with the plan views' queries run one after
+another on db.session (a sync worker; --threads 1 serves one request at a
+time), then with the plan views run as coroutines on the event loop and their
+queries sent at once over asyncpg. --clients concurrent HTTP clients drive the plan view routes of bench.load against each worker in turn. Results
+are printed as JSON with the async/sync throughput ratio per route.
+"""
+import argparse
+import json
+import logging
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import uvicorn
+
+from app import app, db, page_cache
+from asgi import AsyncApp
+from bench.load import git_commit, http_request, measure, routes
+
+PLAN_ROUTES = [
+    'GET /', 'POST /venues/search', 'POST /artists/search', 'POST /shows/search',
+    'GET /venues/<id>', 'GET /artists/<id>', 'GET /shows/<id>',
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(mode, port, threads):
+    # The worker process: `python -m bench.async_load --serve MODE`.
+    logging.getLogger('app').setLevel(logging.WARNING)
+    uvicorn.run(AsyncApp(app, threads, app.config['ASGI_PLAN_CONNECTIONS'], async_plans=mode == 'async'),
+                host='127.0.0.1', port=port, log_level='warning')
+
+
+def start_worker(mode, threads):
+    # Starts a worker process and waits for it to accept connections.
+    port = free_port()
+    worker = subprocess.Popen([
+        sys.executable, '-m', 'bench.async_load', '--serve', mode, '--port', str(port), '--threads', str(threads)
+    ])
+    while True:
+        if worker.poll() is not None:
+            raise RuntimeError('{} worker exited with status {}'.format(mode, worker.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return worker, 'http://127.0.0.1:{}'.format(port)
+        except OSError:
+            time.sleep(0.1)
+
+
+def run(requests, threads, clients, warmup, only=None, seed_value=0):
+    plan = {name: make_request for name, make_request in routes().items() if name in PLAN_ROUTES}
+    results = {}
+    for mode in ('sync', 'async'):
+        page_cache.backend.clear()
+        rng = random.Random(seed_value)
+        worker, base_url = start_worker(mode, threads)
+        try:
+            results[mode] = {}
+            for name, make_request in plan.items():
+                if only and not any(part in name for part in only):
+                    continue
+                # Warm-up requests fill the connection pools and the page cache.
+                measure(lambda *request: http_request(base_url, *request), make_request, warmup, clients, rng)
+                results[mode][name] = measure(
+                    lambda *request: http_request(base_url, *request), make_request, requests, clients, rng
+                )
+        finally:
+            worker.send_signal(signal.SIGINT)
+            worker.wait()
+    results['throughput_ratio'] = {
+        name: round(result['throughput_rps'] / results['sync'][name]['throughput_rps'], 2)
+        for name, result in results['async'].items()
+        if results['sync'][name]['throughput_rps']
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--threads', type=int, default=1, help='threads per worker in both modes')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent HTTP clients')
+    parser.add_argument('--warmup', type=int, default=50, help='unmeasured requests per route first')
+    parser.add_argument('--route', action='append', help='only routes whose name contains this (repeatable)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    parser.add_argument('--serve', choices=['sync', 'async'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.threads)
+        return
+    with app.app_context():
+        results = run(args.requests, args.threads, args.clients, args.warmup, args.route, args.seed)
+    report = {
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'threads': args.threads,
+        'clients': args.clients,
+        'database': db.engine.dialect.name,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""`datetime` filter micro-benchmark.
+
+    python -m bench.datetime_format --values 1000 --repeat 20
+
+Formats a page of show start times with the filter as it was before
+dates.DateFormatter (dateutil and babel.dates.format_datetime on every call)
+and with DateFormatter: cold (empty result cache), warm (the same page again),
+through format_many(), and with a display timezone. Imports the app (which
+makes the installed dateutil work on current Pythons) but does not connect to
+the database.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import app
+from dates import DateFormatter
+
+
+def legacy_format_datetime(value, format='medium'):
+    if isinstance(value, str):
+        date = dateutil.parser.parse(value)
+    else:
+        date = value
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def page_values(count, rng, as_strings=False):
+    # Start times on the hour, like a /shows page; some repeat.
+    start = datetime(2026, 1, 1, 20)
+    values = [start + timedelta(hours=rng.randint(0, count * 2)) for _ in range(count)]
+    return [value.isoformat() for value in values] if as_strings else values
+
+
+def timed(function, repeat):
+    # Best of `repeat` runs, in milliseconds per page.
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3)
+
+
+def run(count, repeat, seed_value=0):
+    rng = random.Random(seed_value)
+    locale = app.config['DATETIME_LOCALE']
+    results = {}
+    for kind, values in (('datetime', page_values(count, rng)), ('string', page_values(count, rng, True))):
+        def cold():
+            formatter = DateFormatter(locale)
+            for value in values:
+                formatter.format(value, 'full')
+
+        warm_formatter = DateFormatter(locale)
+        many_formatter = DateFormatter(locale)
+        zoned_formatter = DateFormatter(locale, 'America/New_York', 'UTC')
+        results[kind] = {
+            'legacy_ms': timed(lambda: [legacy_format_datetime(value, 'full') for value in values], repeat),
+            'cold_ms': timed(cold, repeat),
+            'warm_ms': timed(lambda: [warm_formatter.format(value, 'full') for value in values], repeat),
+            'format_many_ms': timed(lambda: many_formatter.format_many(values, 'full'), repeat),
+            'zoned_warm_ms': timed(lambda: [zoned_formatter.format(value, 'full') for value in values], repeat),
+        }
+        assert [legacy_format_datetime(value, 'full') for value in values] == DateFormatter(locale).format_many(values, 'full')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--values', type=int, default=1000, help='values per page')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps({'values': args.values, 'results': run(args.values, args.repeat, args.seed)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Image proxy thumbnails against a local stand-in for the image hosts.
+
+    python -m bench.image_proxy --tiles 30 --delay 0.2
+
+Serves --tiles distinct generated photos (--width x --height JPEGs) from a
+local HTTP server that answers each request after --delay seconds, like a
+remote image host, and compares fetching them directly with fetching their
+'small' thumbnails through /images/ (cold, while the proxy fetches and resizes
+them; warm, from its disk cache; and revalidated with If-None-Match), six
+requests at a time as a browser would. Then checks that a source slower than
+IMAGE_PROXY_WAIT is redirected to and served from the cache once fetched.
+Thumbnails go to a temporary directory, not IMAGE_CACHE_DIR.
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+import app as fyyur
+from app import app
+from bench.load import percentile
+from images import ImageProxy
+
+CONNECTIONS = 6
+
+
+def photo(width, height, seed_value):
+    # Noise over colour gradients: compresses about like a photo does.
+    noise = Image.effect_noise((width, height), 10 + seed_value % 10)
+    gradient = Image.linear_gradient('L').resize((width, height))
+    channels = (noise, gradient, gradient.rotate(90 + seed_value % 180).resize((width, height)))
+    out = io.BytesIO()
+    Image.merge('RGB', channels).save(out, 'JPEG', quality=90)
+    return out.getvalue()
+
+
+class ImageHost(BaseHTTPRequestHandler):
+    # GET /<n>.jpg?delay=<seconds> -> photos[n % len(photos)].
+    photos = []
+    delay = 0
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        delay = float(query.split('=', 1)[1]) if query.startswith('delay=') else self.delay
+        time.sleep(delay)
+        data = self.photos[int(path.strip('/').split('.')[0]) % len(self.photos)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def fetch_all(fetch, urls):
+    # Wall time of fetching `urls` CONNECTIONS at a time, and each result.
+    started = time.perf_counter()
+    with ThreadPoolExecutor(CONNECTIONS) as pool:
+        results = list(pool.map(fetch, urls))
+    return (time.perf_counter() - started) * 1000, results
+
+
+def proxied(headers=None):
+    def fetch(url):
+        started = time.perf_counter()
+        response = app.test_client().get(url, headers=headers or {})
+        return response.status_code, len(response.get_data()), response.headers.get('ETag'), (time.perf_counter() - started) * 1000
+    return fetch
+
+
+def direct(url):
+    with urllib.request.urlopen(url) as response:
+        return len(response.read())
+
+
+def summary(wall_ms, results):
+    return {
+        'wall_ms': round(wall_ms, 1),
+        'statuses': sorted({status for status, _, _, _ in results}),
+        'bytes': sum(size for _, size, _, _ in results),
+        'request_p50_ms': round(percentile([ms for _, _, _, ms in results], 50), 2),
+    }
+
+
+def run(tiles, width, height, delay):
+    ImageHost.photos = [photo(width, height, i) for i in range(min(tiles, 5))]
+    ImageHost.delay = delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHost)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = 'http://127.0.0.1:{}'.format(server.server_port)
+    sources = ['{}/{}.jpg'.format(host, i) for i in range(tiles)]
+    saved = fyyur.image_proxy, app.config['IMAGE_PROXY_WAIT']
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            fyyur.image_proxy = ImageProxy(
+                directory, app.config['IMAGE_SIZES'], app.config['IMAGE_PROXY_SECRET'],
+                app.config['IMAGE_CACHE_MAX_BYTES'], workers=app.config['IMAGE_PROXY_WORKERS'],
+                quality=app.config['IMAGE_QUALITY'], allow_private=True
+            )
+            with app.test_request_context():
+                thumbnails = [fyyur.thumbnail_url(url, 'small') for url in sources]
+
+            wall_ms, sizes = fetch_all(direct, sources)
+            results = {'direct': {'wall_ms': round(wall_ms, 1), 'bytes': sum(sizes)}}
+            results['proxied_cold'] = summary(*fetch_all(proxied(), thumbnails))
+            wall_ms, warm = fetch_all(proxied(), thumbnails)
+            results['proxied_warm'] = summary(wall_ms, warm)
+            etags = dict(zip(thumbnails, (etag for _, _, etag, _ in warm)))
+            wall_ms, revalidated = fetch_all(
+                lambda url: proxied({'If-None-Match': etags[url]})(url), thumbnails
+            )
+            results['proxied_revalidated'] = summary(wall_ms, revalidated)
+            results['cache_bytes'] = sum(entry.stat().st_size for entry in os.scandir(directory))
+
+            app.config['IMAGE_PROXY_WAIT'] = 0.5
+            slow = '{}/{}.jpg?delay=1.5'.format(host, tiles)
+            with app.test_request_context():
+                slow_thumbnail = fyyur.thumbnail_url(slow, 'small')
+            first = app.test_client().get(slow_thumbnail)
+            fyyur.image_proxy.fetch(slow).result()
+            again = app.test_client().get(slow_thumbnail)
+            results['slow_host'] = {
+                'first': [first.status_code, first.headers.get('Location') == slow],
+                'after_fetch': again.status_code,
+            }
+            fyyur.image_proxy.executor.shutdown()
+    finally:
+        fyyur.image_proxy, app.config['IMAGE_PROXY_WAIT'] = saved
+        server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tiles', type=int, default=30)
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--height', type=int, default=2000)
+    parser.add_argument('--delay', type=float, default=0.2, help='seconds the image host takes per request')
+    args = parser.parse_args()
+    print(json.dumps(run(args.tiles, args.width, args.height, args.delay), indent=2))
+
+
+if __name__ == '__main__':
+    main()
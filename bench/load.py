@@ -0,0 +1,233 @@
+"""Route throughput, latency and SQL statement counts.
+
+    python -m bench.seed --venues 20000 --artists 100000 --shows 1000000
+    python -m bench.load --requests 200 --output before.json
+    python -m bench.load --http --threads 8 --requests 200 --output after.json
+    python -m bench.load --compare before.json after.json
+
+Drives every page route against the configured database, through the Flask
+test client (one request at a time) or, with --http, over HTTP from --threads
+concurrent clients. --http serves the app from a local threaded server unless
+--url points at a running one. Statement counts come from the app's
+X-SQL-Statements header (every request is sampled in-process; a --url server
+reports them at its own SQL_STATS_SAMPLE_RATE). Detail pages pick a random
+seeded row per request. Results are printed as JSON, tagged with the current
+git commit.
+"""
+import argparse
+import json
+import logging
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from werkzeug.serving import make_server
+
+from app import app, db, page_cache, Venue, Artist, Show
+
+SEARCH_TERMS = ['jazz', 'san fran', 'blue', 'velvet hop', 'echo lounge', 'ny', 'rock', 'petals', 'oom', 'electric owl']
+BROWSE_FILTERS = ['genres=Jazz', 'genres=Rock+n+Roll&state=CA', 'state=NY&seeking=yes', 'genres=Pop&genres=Soul']
+SQL_HEADER = 'X-SQL-Statements'
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def routes():
+    # route name -> callable(rng) returning (method, path, form data).
+    ids = {
+        model: db.session.query(db.func.min(model.id), db.func.max(model.id)).one()
+        for model in (Venue, Artist, Show)
+    }
+
+    def detail(path, model):
+        low, high = ids[model]
+        return lambda rng: ('GET', path.format(rng.randint(low, high)), None)
+
+    def get(path):
+        return lambda rng: ('GET', path, None)
+
+    def search(path):
+        return lambda rng: ('POST', path, {'search_term': rng.choice(SEARCH_TERMS)})
+
+    def browse(path):
+        return lambda rng: ('GET', path + '?' + rng.choice(BROWSE_FILTERS), None)
+
+    return {
+        'GET /': get('/'),
+        'GET /venues': get('/venues'),
+        'GET /artists': get('/artists'),
+        'GET /shows': get('/shows'),
+        'POST /venues/search': search('/venues/search'),
+        'POST /artists/search': search('/artists/search'),
+        'POST /shows/search': search('/shows/search'),
+        'GET /venues/<id>': detail('/venues/{}', Venue),
+        'GET /artists/<id>': detail('/artists/{}', Artist),
+        'GET /shows/<id>': detail('/shows/{}', Show),
+        'GET /venues/browse': browse('/venues/browse'),
+        'GET /artists/browse': browse('/artists/browse'),
+    }
+
+
+def client_request(client, method, path, data):
+    response = client.open(path, method=method, data=data)
+    response.close()
+    return response.status_code, response.headers.get(SQL_HEADER)
+
+
+def http_request(base_url, method, path, data):
+    body = urllib.parse.urlencode(data).encode() if data else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(base_url + path, data=body, method=method)) as response:
+            response.read()
+            return response.status, response.headers.get(SQL_HEADER)
+    except urllib.error.HTTPError as error:
+        return error.code, error.headers.get(SQL_HEADER)
+
+
+def measure(send, make_request, requests, threads, rng):
+    plan = [make_request(rng) for _ in range(requests)]
+    timings = []
+    statements = []
+    errors = []
+
+    def one(request):
+        started = time.perf_counter()
+        status, count = send(*request)
+        elapsed = (time.perf_counter() - started) * 1000
+        return elapsed, status, count, request
+
+    started = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(one, plan))
+    else:
+        results = [one(request) for request in plan]
+    wall = time.perf_counter() - started
+
+    for elapsed, status, count, request in results:
+        timings.append(elapsed)
+        if status >= 400:
+            errors.append('{} {} -> {}'.format(request[0], request[1], status))
+        if count is not None:
+            statements.append(int(count))
+    return {
+        'requests': requests,
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        'throughput_rps': round(requests / wall, 2),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+        'sql_statements_p50': percentile(statements, 50) if statements else None,
+        'sql_statements_max': max(statements) if statements else None,
+    }
+
+
+def run(requests, http=False, url=None, threads=1, only=None, seed_value=0):
+    rng = random.Random(seed_value)
+    sample_rate = app.config['SQL_STATS_SAMPLE_RATE']
+    app.config['SQL_STATS_SAMPLE_RATE'] = 1.0
+    server = None
+    try:
+        page_cache.backend.clear()
+        plan = routes()
+        if http:
+            if url is None:
+                logging.getLogger('werkzeug').setLevel(logging.ERROR)
+                server = make_server('127.0.0.1', 0, app, threaded=True)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                url = 'http://127.0.0.1:{}'.format(server.server_port)
+            base_url = url.rstrip('/')
+
+            def send(method, path, data):
+                return http_request(base_url, method, path, data)
+        else:
+            client = app.test_client()
+            threads = 1
+
+            def send(method, path, data):
+                return client_request(client, method, path, data)
+
+        results = {}
+        for name, make_request in plan.items():
+            if only and not any(part in name for part in only):
+                continue
+            results[name] = measure(send, make_request, requests, threads, rng)
+    finally:
+        if server is not None:
+            server.shutdown()
+        app.config['SQL_STATS_SAMPLE_RATE'] = sample_rate
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before, after):
+    # Percentage change per route and metric; positive means larger in `after`.
+    print('{:<24} {:>18} {:>18} {:>18} {:>12}'.format('route', 'p50 ms', 'p95 ms', 'req/s', 'statements'))
+    for name, new in after['routes'].items():
+        old = before['routes'].get(name)
+        if old is None:
+            continue
+        cells = []
+        for metric in ('p50_ms', 'p95_ms', 'throughput_rps'):
+            change = (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0
+            cells.append('{:>8} {:>+8.1f}%'.format(new[metric], change))
+        cells.append('{:>5} -> {:<4}'.format(str(old['sql_statements_p50']), str(new['sql_statements_p50'])))
+        print('{:<24} {}'.format(name, ' '.join(cells)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--http', action='store_true', help='send requests over HTTP')
+    parser.add_argument('--url', help='base URL of a running server (with --http)')
+    parser.add_argument('--threads', type=int, default=4, help='concurrent HTTP clients')
+    parser.add_argument('--route', action='append', help='only routes whose name contains this (repeatable)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    parser.add_argument('--check', action='store_true', help='exit 1 if any request failed')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as before, open(args.compare[1]) as after:
+            compare(json.load(before), json.load(after))
+        return
+
+    with app.app_context():
+        results = run(args.requests, args.http or bool(args.url), args.url, args.threads, args.route, args.seed)
+    report = {
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'mode': 'http' if args.http or args.url else 'test_client',
+        'threads': args.threads if args.http or args.url else 1,
+        'database': db.engine.dialect.name,
+        'routes': results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    if args.check and any(result['errors'] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
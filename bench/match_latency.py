@@ -0,0 +1,81 @@
+"""Matchmaking ranking latency.
+
+    python -m bench.match_latency --candidates 500000 --queries 200
+
+Fills a MatchIndex with --candidates synthetic venues (genres, places and
+seeking flags drawn like bench.seed's) and times the full load, rank() for
+random artists with some past-show history, and update() of a few rows as
+after a commit. Does not connect to the database.
+"""
+import argparse
+import json
+import random
+import time
+
+from app import app
+from bench import seed
+from bench.load import percentile
+from forms import genres_choices
+from matching import MatchIndex
+
+GENRES = [genre for genre, _ in genres_choices]
+
+
+def candidate_rows(count, rng, first_id=1):
+    rows = []
+    for i in range(count):
+        if rng.random() < 0.2:
+            city, state = rng.choices(seed.CITIES, seed.CITY_WEIGHTS)[0]
+        else:
+            city, state = rng.choice(seed.WORDS) + rng.choice(seed.TOWN_SUFFIXES), rng.choice(seed.STATES)
+        rows.append((first_id + i, rng.sample(GENRES, rng.randint(1, 3)), city, state, rng.random() < 0.3))
+    return rows
+
+
+def run(candidates, queries, seed_value=0):
+    rng = random.Random(seed_value)
+    rows = candidate_rows(candidates, rng)
+    by_id = {row[0]: row for row in rows}
+    index = MatchIndex(lambda ids: rows if ids is None else [by_id[i] for i in ids if i in by_id], GENRES)
+    weights = app.config['MATCH_WEIGHTS']
+
+    started = time.perf_counter()
+    index.rank([], '', '', {}, weights, 0, 1)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    timings = []
+    for _ in range(queries):
+        _, genres, city, state, _ = rng.choice(rows)
+        history = {rng.randint(1, candidates): rng.randint(1, 5) for _ in range(rng.randint(0, 50))}
+        started = time.perf_counter()
+        index.rank(genres, city, state, history, weights, 0, app.config['MATCHES_PER_PAGE'])
+        timings.append((time.perf_counter() - started) * 1000)
+
+    updates = []
+    for _ in range(queries):
+        changed = candidate_rows(3, rng, rng.randint(1, candidates))
+        by_id.update((row[0], row) for row in changed)
+        started = time.perf_counter()
+        index.update([row[0] for row in changed])
+        updates.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'candidates': candidates,
+        'load_ms': round(load_ms, 1),
+        'rank_p50_ms': round(percentile(timings, 50), 2),
+        'rank_p95_ms': round(percentile(timings, 95), 2),
+        'update_p50_ms': round(percentile(updates, 50), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--candidates', type=int, default=500000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.candidates, args.queries, args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Sequential-scan check for the route queries.
+
+    python -m bench.plan_check --shows 1000000 --venues 20000 --artists 100000
+
+Seeds the configured Postgres database up to the requested row counts, requests
+each route through the Flask test client, and runs EXPLAIN on every SELECT it
+issued. Exits 1 if any plan sequentially scans a table with more than
+--threshold rows.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import app, db, page_cache, Venue, Artist, Show
+from bench import seed
+
+SEARCHES = [('/venues/search', 'blue'), ('/artists/search', 'velvet'), ('/shows/search', 'echo lounge')]
+
+
+def routes():
+    # GET paths; detail pages use the lowest ids, which the seeder always creates.
+    venue_id = db.session.query(db.func.min(Venue.id)).scalar()
+    artist_id = db.session.query(db.func.min(Artist.id)).scalar()
+    show_id = db.session.query(db.func.min(Show.id)).scalar()
+    # An evening a week from now for the time-window queries.
+    start = (datetime.now() + timedelta(days=7)).replace(hour=20, minute=0, second=0, microsecond=0)
+    window = 'from={}&to={}'.format(start.isoformat(), (start + timedelta(hours=3)).isoformat())
+    return [
+        '/', '/venues', '/venues?page=2', '/artists', '/shows',
+        '/venues/{}'.format(venue_id), '/venues/{}?past_page=2'.format(venue_id),
+        '/artists/{}'.format(artist_id), '/shows/{}'.format(show_id),
+        '/shows/{}/edit'.format(show_id), '/shows/choices/artist?q=blue',
+        '/venues/browse?genres=Jazz&state=CA', '/artists/browse?genres=Jazz&genres=Blues&seeking=yes',
+        '/api/v1/shows?' + window, '/api/v1/shows?state=CA&' + window,
+        '/api/v1/shows?venue_id={}&{}'.format(venue_id, window), '/api/v1/venues/available?state=CA&' + window,
+    ]
+
+
+def capture_statements(client):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        for path in routes():
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+            # Follow the first keyset link so the cursor predicate is planned too.
+            if path in ('/shows', '/artists'):
+                after = response.get_data(as_text=True).partition('?after=')[2].partition('"')[0]
+                if after:
+                    client.get('{}?after={}'.format(path, after))
+        for path, term in SEARCHES:
+            response = client.post(path, data={'search_term': term})
+            assert response.status_code == 200, (path, term, response.status_code)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def seq_scans(connection, statement, parameters, sizes):
+    # (table, estimated rows) for each Seq Scan over a table in `sizes`.
+    plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+    return [
+        (node['Relation Name'], sizes[node['Relation Name']])
+        for node in plan_nodes(plan[0]['Plan'])
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in sizes
+    ]
+
+
+def check(threshold):
+    page_cache.backend.clear()
+    statements = capture_statements(app.test_client())
+    failures = []
+    with db.engine.connect() as connection:
+        sizes = dict(connection.exec_driver_sql(
+            "SELECT relname, reltuples::bigint FROM pg_class WHERE relname IN ('Venue', 'Artist', 'Show')"
+        ).all())
+        sizes = {table: rows for table, rows in sizes.items() if rows > threshold}
+        seen = set()
+        for statement, parameters in statements:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            for table, rows in seq_scans(connection, statement, parameters, sizes):
+                failures.append((table, rows, statement))
+    return len(seen), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--venues', type=int, default=20000)
+    parser.add_argument('--artists', type=int, default=100000)
+    parser.add_argument('--shows', type=int, default=1000000)
+    parser.add_argument('--threshold', type=int, default=10000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        seed.seed(
+            max(args.venues - Venue.query.count(), 0),
+            max(args.artists - Artist.query.count(), 0),
+            max(args.shows - Show.query.count(), 0)
+        )
+        db.session.execute('ANALYZE')
+        db.session.commit()
+        checked, failures = check(args.threshold)
+
+    for table, rows, statement in failures:
+        print('Seq Scan on "{}" (~{} rows):\n{}\n'.format(table, rows, statement))
+    print('{} statements checked, {} sequential scans over {} rows'.format(checked, len(failures), args.threshold))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
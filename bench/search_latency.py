@@ -0,0 +1,62 @@
+"""Search latency at scale.
+
+    python -m bench.search_latency --shows 1000000 --venues 20000 --artists 100000
+
+Seeds the configured database up to the requested row counts, then POSTs a
+fixed mix of terms to the three search routes through the Flask test client.
+"""
+import argparse
+import json
+import random
+import time
+
+from app import app, db, Venue, Artist, Show
+from bench import seed
+from bench.load import percentile
+
+TERMS = ['jazz', 'san fran', 'blue', 'velvet hop', 'echo lounge', 'ny', 'rock', 'petals', 'oom', 'electric owl']
+ROUTES = ['/venues/search', '/artists/search', '/shows/search']
+
+
+def run(queries, seed_value=0):
+    rng = random.Random(seed_value)
+    client = app.test_client()
+    results = {}
+    for route in ROUTES:
+        timings = []
+        for _ in range(queries):
+            term = rng.choice(TERMS)
+            started = time.perf_counter()
+            response = client.post(route, data={'search_term': term})
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, (route, term, response.status_code)
+        results[route] = {
+            'queries': queries,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--venues', type=int, default=20000)
+    parser.add_argument('--artists', type=int, default=100000)
+    parser.add_argument('--shows', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        seed.seed(
+            max(args.venues - Venue.query.count(), 0),
+            max(args.artists - Artist.query.count(), 0),
+            max(args.shows - Show.query.count(), 0)
+        )
+        db.session.execute('ANALYZE')
+        db.session.commit()
+        print(json.dumps(run(args.queries), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Synthetic venues, artists and shows.
+
+    python -m bench.seed --venues 20000 --artists 100000 --shows 1000000
+
+Appends the requested number of rows to the configured database with bulk
+inserts. The same --seed always generates the same rows.
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from app import app, db, Venue, Artist, Show
+from forms import genres_choices
+
+# Named cities, weighted roughly by the size of their music scenes.
+CITIES = [
+    ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('Oakland', 'CA'), ('New York', 'NY'),
+    ('Brooklyn', 'NY'), ('Austin', 'TX'), ('Houston', 'TX'), ('Chicago', 'IL'), ('Seattle', 'WA'),
+    ('Nashville', 'TN'), ('New Orleans', 'LA'), ('Atlanta', 'GA'), ('Denver', 'CO'), ('Boston', 'MA'),
+]
+CITY_WEIGHTS = [6, 10, 3, 12, 5, 5, 4, 7, 4, 6, 4, 4, 3, 4]
+# Synthetic towns spread venues and artists over ~4000 (city, state) areas, as
+# in a real listing; the named cities above get a fifth of the rows.
+STATES = sorted({state for _, state in CITIES} | {'AZ', 'FL', 'MI', 'MN', 'NC', 'OH', 'OR', 'PA', 'UT', 'VA'})
+TOWN_SUFFIXES = ['ville', 'ton', 'port', ' Falls', ' Springs', ' Heights']
+WORDS = [
+    'Blue', 'Velvet', 'Hop', 'Park', 'Square', 'Live', 'Coffee', 'Dueling', 'Pianos', 'Echo', 'Lounge',
+    'Rose', 'Garden', 'Hall', 'Neon', 'Moon', 'River', 'Stone', 'Electric', 'Owl', 'Fox', 'Petals',
+    'Guns', 'Quartet', 'Collective', 'Sound', 'Club', 'Room', 'Basement', 'Attic', 'Jubilee', 'Wild',
+]
+# Two-syllable filler words keep any one word down to ~0.1% of names, so search
+# terms have realistic selectivity.
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'te', 'su', 'no', 'vi', 'da', 'ze', 'po', 'le', 'fu', 'ri', 'sa', 'ho',
+             'ne', 'bi', 'go', 'tu', 'ma', 'ce', 'jo', 'xa', 'ye', 'wi', 'qu', 'pe', 'ki', 'do', 'fa', 'lu']
+VOCABULARY = WORDS + [a + b + c for a in SYLLABLES for b in SYLLABLES for c in ('n', 'r')]
+GENRES = [choice for choice, _ in genres_choices]
+# A few genres dominate listings and the rest form a long tail.
+GENRE_WEIGHTS = {
+    'Rock n Roll': 18, 'Pop': 16, 'Hip-Hop': 14, 'Alternative': 10, 'Electronic': 9, 'R&B': 7, 'Jazz': 6,
+    'Country': 6, 'Folk': 5, 'Punk': 4, 'Heavy Metal': 4, 'Soul': 3, 'Blues': 3, 'Funk': 2, 'Reggae': 2,
+    'Classical': 2, 'Instrumental': 1, 'Musical Theatre': 1, 'Other': 1,
+}
+BATCH_SIZE = 10000
+
+
+def name(rng, n, suffix):
+    return '{} {}'.format(' '.join(rng.sample(VOCABULARY, rng.randint(1, 3))).title(), suffix + n)
+
+
+def pick_genres(rng, count):
+    genres = set()
+    while len(genres) < count:
+        genres.add(rng.choices(GENRES, [GENRE_WEIGHTS[genre] for genre in GENRES])[0])
+    return sorted(genres)
+
+
+def popular_id(rng, last_id):
+    # Ids 1..last_id with low ids most popular, so a few venues and artists
+    # carry many shows and most carry a handful.
+    return 1 + int(last_id * rng.random() ** 2)
+
+
+def insert_batches(table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+    db.session.commit()
+
+
+def seed(venues, artists, shows, seed_value=0):
+    # Appends `venues`, `artists` and `shows` rows with bulk (executemany) inserts.
+    rng = random.Random(seed_value)
+    first_venue = (db.session.query(db.func.max(Venue.id)).scalar() or 0) + 1
+    first_artist = (db.session.query(db.func.max(Artist.id)).scalar() or 0) + 1
+
+    def place():
+        if rng.random() < 0.2:
+            return rng.choices(CITIES, CITY_WEIGHTS)[0]
+        return rng.choice(WORDS) + rng.choice(TOWN_SUFFIXES), rng.choice(STATES)
+
+    insert_batches(Venue.__table__, (
+        dict(zip(('city', 'state'), place()), name=name(rng, str(first_venue + i), 'Venue '),
+             address='{} Main St'.format(i), phone='555-555-5555', genres=pick_genres(rng, rng.randint(1, 3)),
+             seeking_talent=rng.random() < 0.3)
+        for i in range(venues)
+    ))
+    insert_batches(Artist.__table__, (
+        dict(zip(('city', 'state'), place()), name=name(rng, str(first_artist + i), 'Artist '),
+             phone='555-555-5555', genres=pick_genres(rng, rng.randint(1, 3)),
+             seeking_venue=rng.random() < 0.3)
+        for i in range(artists)
+    ))
+
+    last_venue = first_venue + venues - 1
+    last_artist = first_artist + artists - 1
+    now = datetime.now()
+    insert_batches(Show.__table__, (
+        dict(name=name(rng, str(i), 'Show '),
+             start_time=now + timedelta(minutes=rng.randint(-2 * 365 * 24 * 60, 365 * 24 * 60)),
+             artist_id=popular_id(rng, last_artist), venue_id=popular_id(rng, last_venue))
+        for i in range(shows)
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--venues', type=int, default=2000)
+    parser.add_argument('--artists', type=int, default=10000)
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with app.app_context():
+        seed(args.venues, args.artists, args.shows, args.seed)
+        db.session.execute('ANALYZE')
+        db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Page weight and request count of the static assets.
+
+    python -m bench.static_assets --path /
+
+Builds the static files (as `flask assets`), then requests a page through the
+Flask test client twice: with the source files, as before the build, and with
+the built ones. For each it fetches the stylesheets, scripts and images the
+page loads from /static (skipping IE-only and fallback scripts), as a browser
+accepting gzip would, and reports the requests and bytes of a first view and
+the requests a repeat view still makes to revalidate its cached copies.
+"""
+import argparse
+import json
+from html.parser import HTMLParser
+
+import assets
+from app import app, asset_manifest, page_cache
+
+
+class AssetLinks(HTMLParser):
+    # /static URLs of the stylesheets, scripts and images of a page; comments
+    # (the IE-only block) and script bodies are not parsed for tags.
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        url = attrs.get('href') if tag == 'link' and attrs.get('rel') == 'stylesheet' else attrs.get('src')
+        if tag in ('link', 'script', 'img') and url and url.startswith(app.static_url_path + '/'):
+            self.urls.append(url)
+
+
+def cached_without_revalidation(response):
+    cache_control = response.cache_control
+    return bool(cache_control.max_age) and not cache_control.no_cache
+
+
+def page_assets(client, path):
+    page_cache.backend.clear()
+    parser = AssetLinks()
+    parser.feed(client.get(path).get_data(as_text=True))
+    results = []
+    for url in parser.urls:
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate, br'})
+        assert response.status_code == 200, (url, response.status_code)
+        results.append({
+            'url': url,
+            'bytes': len(response.get_data()),
+            'encoding': response.content_encoding or 'identity',
+            'cache_control': response.headers.get('Cache-Control'),
+            'revalidated': not cached_without_revalidation(response),
+        })
+        response.close()
+    return results
+
+
+def run(path):
+    client = app.test_client()
+    assets.build(app.static_folder, app.config['ASSET_DIST'])
+    asset_manifest.load()
+    built = asset_manifest.built
+    results = {}
+    for mode, manifest in (('sources', {}), ('built', built)):
+        asset_manifest.built = manifest
+        files = page_assets(client, path)
+        results[mode] = {
+            'first_view_requests': len(files),
+            'first_view_bytes': sum(item['bytes'] for item in files),
+            'repeat_view_requests': sum(item['revalidated'] for item in files),
+            'assets': files,
+        }
+    asset_manifest.built = built
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', default='/', help='page to load')
+    args = parser.parse_args()
+    with app.app_context():
+        print(json.dumps({'path': args.path, 'results': run(args.path)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+
+from search import escape_like
+
+
+class ChoiceLookup:
+    # (id, name) lookups for a select field backed by a large table. Only the two
+    # columns are ever queried; names by id and typeahead results by term are
+    # kept in LRU caches of at most `max_entries` entries each, and the whole
+    # lookup is cleared with invalidate() when the table changes.
+
+    def __init__(self, session, id_column, name_column, max_entries=10000, max_results=20):
+        self.session = session
+        self.id_column = id_column
+        self.name_column = name_column
+        self.max_entries = max_entries
+        self.max_results = max_results
+        self.names = OrderedDict()
+        self.matches = OrderedDict()
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def cached(self, cache, key):
+        # (hit, value, generation); the generation is handed back to store() so a
+        # result loaded across an invalidate() is not cached.
+        with self.lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return True, cache[key], self.generation
+            return False, None, self.generation
+
+    def store(self, cache, key, value, generation):
+        with self.lock:
+            if generation != self.generation:
+                return
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.max_entries:
+                cache.popitem(last=False)
+
+    def name(self, item_id):
+        # Name for `item_id`, or None when no such row exists.
+        hit, name, generation = self.cached(self.names, item_id)
+        if not hit:
+            name = self.session.query(self.name_column).filter(self.id_column == item_id).scalar()
+            self.store(self.names, item_id, name, generation)
+        return name
+
+    def choices(self, *item_ids):
+        names = [(item_id, self.name(item_id)) for item_id in item_ids]
+        return [(item_id, name) for item_id, name in names if name is not None]
+
+    def search(self, term):
+        # Up to `max_results` (id, name) pairs whose name starts with `term`, a
+        # match the name trigram index serves.
+        key = term.strip().lower()
+        hit, results, generation = self.cached(self.matches, key)
+        if not hit:
+            results = [
+                tuple(row) for row in self.session.query(self.id_column, self.name_column).filter(
+                    self.name_column.ilike(escape_like(key) + '%', escape='\\')
+                ).order_by(self.name_column, self.id_column).limit(self.max_results)
+            ]
+            self.store(self.matches, key, results, generation)
+        return results
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.names.clear()
+            self.matches.clear()
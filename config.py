@@ -10,7 +10,168 @@ DEBUG = True
 
 
 # TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://{user}:{pw}@{url}/{db}'.format(user="postgres", pw="lookatGodup1&BeSaved", url="localhost:5432", db="fyyur_db")
+# FYYUR_DATABASE_URI overrides it (the tests point it at a disposable database).
+SQLALCHEMY_DATABASE_URI = os.environ.get('FYYUR_DATABASE_URI') or 'postgresql://{user}:{pw}@{url}/{db}'.format(user="postgres", pw="lookatGodup1&BeSaved", url="localhost:5432", db="fyyur_db")
 
 
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Read replicas (space-separated URIs in FYYUR_REPLICA_URIS). Listing, search,
+# browse, detail and read-only API requests run on one of them; a client that
+# has just written reads from the primary for REPLICA_STICKY_SECONDS.
+SQLALCHEMY_REPLICA_URIS = os.environ.get('FYYUR_REPLICA_URIS', '').split()
+REPLICA_STICKY_SECONDS = 10
+
+# Connection pool of each engine (primary and every replica): connections kept
+# open, extra connections allowed under load, seconds to wait for a free one,
+# seconds before a connection is replaced, and whether connections are checked
+# with a ping on checkout
+DB_POOL_SIZE = 10
+DB_MAX_OVERFLOW = 20
+DB_POOL_TIMEOUT = 30
+DB_POOL_RECYCLE = 1800
+DB_POOL_PRE_PING = True
+
+# Postgres statement_timeout for every connection, in milliseconds (0 disables;
+# leave it off for connections that run migrations or `flask import`)
+DB_STATEMENT_TIMEOUT_MS = 0
+
+# Async mode (`uvicorn asgi:application`): views written as plans run on the
+# event loop, their queries on asyncpg engines with the pool settings above over
+# at most ASGI_PLAN_CONNECTIONS connections per request; every other request
+# runs on one of ASGI_SYNC_THREADS threads per worker process
+ASGI_SYNC_THREADS = 8
+ASGI_PLAN_CONNECTIONS = 2
+
+# Number of (city, state) groups rendered per page of /venues
+VENUE_AREAS_PER_PAGE = 20
+
+# Page size for the venue, artist and show search results
+SEARCH_RESULTS_PER_PAGE = 25
+
+# Past shows listed per page on the venue and artist detail pages
+PAST_SHOWS_PER_PAGE = 12
+
+# Rows per page for the keyset-paginated /shows and /artists listings
+SHOWS_PER_PAGE = 30
+ARTISTS_PER_PAGE = 50
+
+# Venues per page of /api/v1/venues/available
+AVAILABLE_VENUES_PER_PAGE = 50
+
+# Length of shows created or imported without an end time
+SHOW_DEFAULT_MINUTES = 180
+
+# Home page feed: its sections in order, as (kind, number of items), from
+# recent_shows, upcoming_shows, recent_artists, recent_venues and
+# trending_venues (most shows in the next HOME_FEED_TRENDING_DAYS days). Each
+# worker rebuilds it in the background after its own writes and once it is
+# HOME_FEED_MAX_STALENESS seconds old
+HOME_FEED_SECTIONS = [
+    ('recent_artists', 10), ('recent_venues', 10), ('recent_shows', 5), ('upcoming_shows', 5), ('trending_venues', 5),
+]
+HOME_FEED_TRENDING_DAYS = 7
+HOME_FEED_MAX_STALENESS = 30
+
+# Stream listing pages to the client as the template renders
+STREAM_TEMPLATES = False
+
+# Search result counts stop at this many matches and display as "1000+"
+SEARCH_COUNT_LIMIT = 1000
+
+# Locale and zones the `datetime` template filter formats with: naive start_time
+# values are in STORED_TIMEZONE (None: the server's local zone) and are shown in
+# DISPLAY_TIMEZONE (e.g. 'America/New_York'; None: as stored). The last
+# DATETIME_CACHE_SIZE formatted values are cached.
+DATETIME_LOCALE = 'en'
+DISPLAY_TIMEZONE = None
+STORED_TIMEZONE = None
+DATETIME_CACHE_SIZE = 10000
+
+# Entries kept per artist/venue choice cache (names by id, typeahead results by term)
+CHOICE_CACHE_SIZE = 10000
+
+# Facet counts cached per filter combination on the browse pages, the options
+# listed per facet and the results per page. After a write, cached counts are
+# reloaded in the background once they are FACET_MAX_STALENESS seconds old.
+FACET_CACHE_SIZE = 1000
+FACET_OPTIONS = 20
+FACET_MAX_STALENESS = 60
+BROWSE_PER_PAGE = 50
+
+# Artist/venue matchmaking: score weights (see matching.MatchIndex.rank), matches
+# per page, and how many seconds the in-process match features are used before
+# a full reload picks up writes made by other worker processes
+MATCH_WEIGHTS = {'genres': 3.0, 'city': 2.0, 'state': 1.0, 'history': 1.0}
+MATCHES_PER_PAGE = 20
+MATCH_MAX_STALENESS = 300
+
+# Background tasks run after commits (see app.after_commit_task): threads per
+# worker process (0 runs them in the committing request), tasks queued before
+# the committing request runs them itself, retries of a failing task and the
+# delay before the first one (doubled each time), and how long a stopping
+# worker waits for the queued tasks
+TASK_WORKERS = 2
+TASK_QUEUE_SIZE = 1000
+TASK_RETRIES = 3
+TASK_RETRY_DELAY = 0.5
+TASK_DRAIN_TIMEOUT = 30
+
+# Per-request SQL statistics: the fraction of requests sampled
+# (FYYUR_SQL_STATS_SAMPLE_RATE; 1 while profiling), slowest statements kept per
+# request, repeats of one statement shape reported as N+1, and the /debug/sql
+# endpoint with its history size. The endpoint shows recent SQL text to anyone
+# who can reach it, so it stays off unless FYYUR_SQL_STATS_ENDPOINT=1, whatever
+# DEBUG is.
+SQL_STATS_SAMPLE_RATE = float(os.environ.get('FYYUR_SQL_STATS_SAMPLE_RATE', '0.01'))
+SQL_STATS_SLOWEST = 5
+SQL_STATS_REPEAT_THRESHOLD = 5
+SQL_STATS_ENDPOINT = os.environ.get('FYYUR_SQL_STATS_ENDPOINT') == '1'
+SQL_STATS_HISTORY = 200
+
+# Rows validated, inserted and committed together by `flask import`
+IMPORT_BATCH_SIZE = 5000
+
+# Rows fetched per round trip from the server-side cursor behind `flask export`
+# and /api/v1/export
+EXPORT_BATCH_SIZE = 2000
+
+# Venues or artists deleted per transaction by `flask delete`, and the most ids
+# one POST /api/v1/<venues|artists>/delete may name
+DELETE_BATCH_SIZE = 1000
+
+# Directory under static/ that `flask assets` builds the hashed static files
+# into, and how long browsers may cache them without revalidating
+ASSET_DIST = 'dist'
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Image proxy serving thumbnails of the artist and venue image links: sizes by
+# name (longest side in pixels), the on-disk cache and its size limit, fetch
+# threads per worker, how long a request waits for a fetch before redirecting
+# to the source image, fetch timeout and size limit, JPEG quality, seconds
+# before a failed source is retried, and how long browsers cache thumbnails.
+# Proxy URLs are signed with IMAGE_PROXY_SECRET, read from
+# FYYUR_IMAGE_PROXY_SECRET. It must be the same in every worker and across
+# restarts, so that each accepts the URLs the others rendered and pages already
+# in caches; without it the proxy is off and pages link the source images.
+# IMAGE_PROXY_ALLOW_PRIVATE lets it fetch from internal addresses (local
+# testing only).
+IMAGE_SIZES = {'small': 200, 'medium': 500, 'large': 1000}
+IMAGE_CACHE_DIR = os.path.join(basedir, '.image_cache')
+IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+IMAGE_PROXY_WORKERS = 4
+IMAGE_PROXY_WAIT = 5
+IMAGE_PROXY_TIMEOUT = 10
+IMAGE_PROXY_MAX_SOURCE_BYTES = 20 * 1024 * 1024
+IMAGE_QUALITY = 82
+IMAGE_PROXY_RETRY_AFTER = 300
+IMAGE_MAX_AGE = 7 * 24 * 3600
+IMAGE_PROXY_SECRET = os.environ.get('FYYUR_IMAGE_PROXY_SECRET', '').encode()
+IMAGE_PROXY_ALLOW_PRIVATE = False
+
+# Page cache for the home and detail pages: 'memory' (per worker) or
+# 'filesystem' (shared by every worker on the host, under PAGE_CACHE_DIR)
+PAGE_CACHE_BACKEND = 'memory'
+PAGE_CACHE_DIR = os.path.join(basedir, '.page_cache')
+PAGE_CACHE_TTL = 300
+PAGE_CACHE_SIZE = 1000
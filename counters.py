@@ -0,0 +1,113 @@
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+
+# "VenueShowCounts" and "ArtistShowCounts" hold each venue's and artist's
+# upcoming and past show counts, split at the single "ShowCountRoll".rolled_until
+# time rather than at now(): a show counts as upcoming while its start_time is
+# at or after rolled_until, as the pages list a show as upcoming while its
+# start_time is at or after now. Statement-level triggers on "Show" apply each
+# INSERT/UPDATE/DELETE to the counts in the same transaction, one upsert per
+# counts table however many rows the statement touched, and `flask
+# roll-show-counts` moves rolled_until forward, shifting the shows it passes
+# from upcoming to past. Triggers read rolled_until FOR SHARE and the roll takes
+# it FOR UPDATE, so a show write never interleaves with a roll. SQLite has row
+# triggers doing the same (sqlite_show_counter_ddl()).
+#
+# The counts live in narrow tables of their own rather than on "Venue" and
+# "Artist", whose wide, GIN-indexed rows would be rewritten by every show write.
+
+# (counts table, owner table, Show foreign key) for each kind of owner.
+COUNTED_TABLES = [('VenueShowCounts', 'Venue', 'venue_id'), ('ArtistShowCounts', 'Artist', 'artist_id')]
+
+# Transition tables and the rows they contribute for each trigger event.
+TRIGGER_EVENTS = {
+    'INSERT': ('NEW TABLE AS new_rows', 'SELECT venue_id, artist_id, start_time, 1 AS delta FROM new_rows'),
+    'DELETE': ('OLD TABLE AS old_rows', 'SELECT venue_id, artist_id, start_time, -1 AS delta FROM old_rows'),
+    'UPDATE': (
+        'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+        'SELECT venue_id, artist_id, start_time, 1 AS delta FROM new_rows'
+        ' UNION ALL SELECT venue_id, artist_id, start_time, -1 AS delta FROM old_rows'
+    ),
+}
+
+# Owners deleted in the same statement are skipped; rows are upserted in id
+# order so concurrent writers lock them in the same order.
+COUNTER_UPSERT = '''
+    INSERT INTO "{counts}" AS counts ({fk}, upcoming_shows_count, past_shows_count)
+    SELECT changed.id, changed.upcoming, changed.past
+    FROM (
+        SELECT {fk} AS id,
+               coalesce(sum(delta) FILTER (WHERE start_time >= rolled), 0) AS upcoming,
+               coalesce(sum(delta) FILTER (WHERE start_time < rolled), 0) AS past
+        FROM ({rows}) AS rows
+        GROUP BY {fk}
+    ) AS changed
+    JOIN "{owner}" ON "{owner}".id = changed.id
+    WHERE changed.upcoming <> 0 OR changed.past <> 0
+    ORDER BY changed.id
+    ON CONFLICT ({fk}) DO UPDATE SET
+        upcoming_shows_count = counts.upcoming_shows_count + excluded.upcoming_shows_count,
+        past_shows_count = counts.past_shows_count + excluded.past_shows_count;'''
+
+
+def show_counter_ddl():
+    # Functions and triggers keeping the counts current, created by
+    # db.create_all(). The show counters migration carries its own copy of this
+    # SQL: a change to it needs a migration of its own that runs it again.
+    statements = []
+    for event, (referencing, rows) in TRIGGER_EVENTS.items():
+        function = 'show_counts_{}'.format(event.lower())
+        statements.append('''CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+DECLARE
+    rolled timestamp;
+BEGIN
+    SELECT rolled_until INTO rolled FROM "ShowCountRoll" FOR SHARE;{upserts}
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql'''.format(
+            function=function,
+            upserts=''.join(
+                COUNTER_UPSERT.format(counts=counts, owner=owner, fk=fk, rows=rows)
+                for counts, owner, fk in COUNTED_TABLES
+            )
+        ))
+        statements.append('''CREATE TRIGGER {function}
+AFTER {event} ON "Show" REFERENCING {referencing}
+FOR EACH STATEMENT EXECUTE FUNCTION {function}()'''.format(
+            function=function, event=event, referencing=referencing
+        ))
+    return statements
+
+
+# The rows each SQLite row trigger applies: (NEW or OLD, delta).
+SQLITE_TRIGGER_ROWS = {'INSERT': [('NEW', 1)], 'DELETE': [('OLD', -1)], 'UPDATE': [('OLD', -1), ('NEW', 1)]}
+
+SQLITE_COUNTER_UPSERT = '''
+    INSERT INTO "{counts}" ({fk}, upcoming_shows_count, past_shows_count)
+    SELECT {row}.{fk}, {delta} * ({row}.start_time >= rolled_until), {delta} * ({row}.start_time < rolled_until)
+    FROM "ShowCountRoll"
+    WHERE EXISTS (SELECT 1 FROM "{owner}" WHERE id = {row}.{fk})
+    ON CONFLICT ({fk}) DO UPDATE SET
+        upcoming_shows_count = upcoming_shows_count + excluded.upcoming_shows_count,
+        past_shows_count = past_shows_count + excluded.past_shows_count;'''
+
+
+def sqlite_show_counter_ddl():
+    # SQLite's equivalent of show_counter_ddl(): it has no statement triggers,
+    # so each row applies its own change. Start times are compared as the ISO
+    # strings SQLAlchemy stores, which sort as the times do.
+    statements = []
+    for event, rows in SQLITE_TRIGGER_ROWS.items():
+        statements.append('''CREATE TRIGGER show_counts_{name}
+AFTER {event} ON "Show"
+BEGIN{upserts}
+END'''.format(
+            name=event.lower(), event=event,
+            upserts=''.join(
+                SQLITE_COUNTER_UPSERT.format(counts=counts, owner=owner, fk=fk, row=row, delta=delta)
+                for row, delta in rows
+                for counts, owner, fk in COUNTED_TABLES
+            )
+        ))
+    return statements
@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+
+import babel.dates
+import dateutil.parser
+import pytz
+from babel import Locale
+
+# Formats the `datetime` filter knows by name; any other format is a CLDR pattern,
+# except Babel's own 'long' and 'short'.
+NAMED_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+BABEL_FORMATS = {'long', 'short'}
+
+
+class DateFormatter:
+    # Formats datetimes, or date strings, for display in `locale`. Each format's
+    # pattern is parsed once and the Locale loaded once, and the last
+    # `max_entries` results are kept in an LRU keyed by (value, format), so a
+    # page listing the same show times again costs a dict lookup per value.
+    # Naive values are taken to be in `stored_timezone` (the server's zone when
+    # None) and shown in `display_timezone`; with no display zone they are
+    # shown as stored.
+
+    def __init__(self, locale='en', display_timezone=None, stored_timezone=None, max_entries=10000):
+        self.locale = Locale.parse(locale)
+        self.display_timezone = pytz.timezone(display_timezone) if display_timezone else None
+        self.stored_timezone = pytz.timezone(stored_timezone) if stored_timezone else None
+        self.max_entries = max_entries
+        self.patterns = {}
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+    def pattern(self, format):
+        pattern = self.patterns.get(format)
+        if pattern is None:
+            pattern = self.patterns[format] = babel.dates.parse_pattern(NAMED_FORMATS.get(format, format))
+        return pattern
+
+    def localize(self, value):
+        if isinstance(value, str):
+            value = dateutil.parser.parse(value)
+        if self.display_timezone is None:
+            return value
+        if value.tzinfo is None:
+            value = self.stored_timezone.localize(value) if self.stored_timezone else value.astimezone()
+        return self.display_timezone.normalize(value.astimezone(self.display_timezone))
+
+    def render(self, value, format):
+        if format in BABEL_FORMATS:
+            return babel.dates.format_datetime(self.localize(value), format, locale=self.locale)
+        return self.pattern(format).apply(self.localize(value), self.locale)
+
+    def format(self, value, format='medium'):
+        key = (value, format)
+        with self.lock:
+            text = self.results.get(key)
+            if text is not None:
+                self.results.move_to_end(key)
+                return text
+        text = self.render(value, format)
+        with self.lock:
+            self.results[key] = text
+            if len(self.results) > self.max_entries:
+                self.results.popitem(last=False)
+        return text
+
+    def format_many(self, values, format='medium'):
+        # One call for a page of values; repeated values are formatted once.
+        texts = {}
+        for value in values:
+            if value not in texts:
+                texts[value] = self.format(value, format)
+        return [texts[value] for value in values]
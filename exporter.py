@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from itertools import islice
+
+# Formats written by `flask export` and the /api/v1/export endpoints.
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(timespec='seconds')
+    raise TypeError(repr(value))
+
+
+def csv_value(value):
+    # Lists are joined with commas and booleans spelled out, as `flask import`
+    # reads them back.
+    if isinstance(value, (list, tuple)):
+        return ','.join(str(item) for item in value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime):
+        return export_value(value)
+    return value
+
+
+def encode_rows(rows, names, fmt, chunk_rows=1000):
+    # UTF-8 chunks of `chunk_rows` rows each (a CSV header first), so only one
+    # chunk of the export is in memory at a time.
+    rows = iter(rows)
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        for row in chunk:
+            if fmt == 'csv':
+                writer.writerow([csv_value(getattr(row, name)) for name in names])
+            else:
+                buffer.write(json.dumps(
+                    {name: getattr(row, name) for name in names}, separators=(',', ':'), default=export_value
+                ))
+                buffer.write('\n')
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    # The chunks compressed into one gzip stream as they arrive.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
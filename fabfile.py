@@ -5,9 +5,10 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    # every route must answer without errors against the configured database
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m bench.load --requests 5 --check", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -40,7 +41,7 @@ def heroku():
 
 def heroku_test():
     local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
+        "heroku run python -m bench.load --requests 5 --check"
     )
 
 
@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import exists, func, literal, select, true, tuple_
+
+
+class FacetCounts:
+    # Faceted browsing over `model`. `columns` maps facet names to a column, or
+    # a tuple of columns, matched by equality (state, seeking flag; the city
+    # facet is (state, city), so that cities of one name in different states
+    # are counted apart, and its values are tuples); `array_facet` names the
+    # genres column, matched by containment. On Postgres the genres are an
+    # ARRAY filtered with @>, which its GIN index serves, and the other facets
+    # are counted in one GROUPING SETS statement; other databases (SQLite test
+    # runs) store them as a JSON array read with json_each() and count each
+    # facet with a GROUP BY of its own.
+    #
+    # Counts for a filter combination are kept in an LRU cache of
+    # `max_entries` combinations. After invalidate(), cached counts are served
+    # while a reload runs through `submit(function, *args)`, at most one per
+    # combination per `max_staleness` seconds, so neither a stream of writes
+    # nor the reload itself holds up page views. warm() loads a combination
+    # the same way ahead of its first request; the app warms the unfiltered
+    # counts, the one full-table aggregate.
+
+    def __init__(self, session, model, columns, array_facet, dialect, submit, max_entries=1000, max_options=20,
+                 max_staleness=60):
+        self.session = session
+        self.model = model
+        self.columns = {name: column if isinstance(column, tuple) else (column,) for name, column in columns.items()}
+        self.composite = {name for name, column in columns.items() if isinstance(column, tuple)}
+        self.array_facet = array_facet
+        self.array_column = getattr(model, array_facet)
+        self.dialect = dialect
+        self.submit = submit
+        self.max_entries = max_entries
+        self.max_options = max_options
+        self.max_staleness = max_staleness
+        self.counts_by_filters = OrderedDict()
+        # Events of the reloads queued by warm(), by filter combination.
+        self.queued = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def criteria(self, filters):
+        # `filters` is a tuple of (facet, value) pairs as built by the caller;
+        # several values of the array facet must all be present.
+        criteria = []
+        values = [value for name, value in filters if name == self.array_facet]
+        if values and self.dialect == 'postgresql':
+            criteria.append(self.array_column.op('@>')(literal(values, self.array_column.type)))
+        elif values:
+            for value in values:
+                elements = func.json_each(self.array_column).table_valued('value')
+                criteria.append(exists(select(literal(1)).select_from(elements).where(elements.c.value == value)))
+        for name, value in filters:
+            if name in self.columns:
+                value = value if name in self.composite else (value,)
+                criteria.extend(column == part for column, part in zip(self.columns[name], value))
+        return criteria
+
+    def counts(self, filters):
+        # {facet: [(value, count), ...]} over the rows matching `filters`, most
+        # frequent first, at most `max_options` values per facet.
+        with self.lock:
+            entry = self.counts_by_filters.get(filters)
+            if entry is not None:
+                self.counts_by_filters.move_to_end(filters)
+                stale = entry[1] != self.generation and time.time() - entry[0] >= self.max_staleness
+            queued = self.queued.get(filters)
+        if entry is None and queued is not None:
+            # Loading already (the warm-up): wait for it rather than run the
+            # same aggregate twice.
+            queued.wait()
+            with self.lock:
+                entry = self.counts_by_filters.get(filters)
+            stale = False
+        if entry is None:
+            return self.refresh(filters)
+        if stale:
+            self.warm(filters)
+        return entry[2]
+
+    def warm(self, filters=()):
+        with self.lock:
+            if filters in self.queued:
+                return
+            self.queued[filters] = threading.Event()
+        self.submit(self.refresh, filters)
+
+    def refresh(self, filters):
+        with self.lock:
+            generation = self.generation
+        loaded_at = time.time()
+        try:
+            counts = self.load(self.criteria(filters))
+            with self.lock:
+                self.counts_by_filters[filters] = (loaded_at, generation, counts)
+                self.counts_by_filters.move_to_end(filters)
+                while len(self.counts_by_filters) > self.max_entries:
+                    self.counts_by_filters.popitem(last=False)
+        finally:
+            with self.lock:
+                queued = self.queued.pop(filters, None)
+            if queued is not None:
+                queued.set()
+        return counts
+
+    def load(self, criteria):
+        counts = {name: [] for name in [self.array_facet] + list(self.columns)}
+        if self.dialect == 'postgresql':
+            self.load_grouping_sets(criteria, counts)
+            values = select(func.unnest(self.array_column).label('value')).select_from(self.model).where(
+                *criteria
+            ).subquery()
+            genres = select(values.c.value, func.count()).group_by(values.c.value)
+        else:
+            for name, columns in self.columns.items():
+                rows = self.session.execute(
+                    select(*columns, func.count()).select_from(self.model).where(*criteria).group_by(*columns)
+                )
+                counts[name] = [(self.facet_value(name, row[:-1]), row[-1]) for row in rows]
+            elements = func.json_each(self.array_column).table_valued('value')
+            genres = select(elements.c.value, func.count()).select_from(self.model).join(elements, true()).where(
+                *criteria
+            ).group_by(elements.c.value)
+        counts[self.array_facet] = [tuple(row) for row in self.session.execute(genres)]
+
+        for name in counts:
+            counts[name] = sorted(counts[name], key=lambda item: (-item[1], str(item[0])))[:self.max_options]
+        return counts
+
+    def load_grouping_sets(self, criteria, counts):
+        # The scalar facets in one pass, GROUPING SETS ((state), (state, city),
+        # ...); grouping() is 0 for each column a row was grouped on, which
+        # tells the sets apart.
+        columns = list({column.key: column for group in self.columns.values() for column in group}.values())
+        position = {column.key: i for i, column in enumerate(columns)}
+        facets_by_grouping = {
+            frozenset(position[column.key] for column in group): name for name, group in self.columns.items()
+        }
+        rows = self.session.execute(
+            select(
+                *columns,
+                *[func.grouping(column) for column in columns],
+                func.count()
+            ).select_from(self.model).where(*criteria).group_by(
+                func.grouping_sets(*[tuple_(*group) if len(group) > 1 else group[0] for group in self.columns.values()])
+            )
+        )
+        for row in rows:
+            grouped = frozenset(i for i in range(len(columns)) if row[len(columns) + i] == 0)
+            name = facets_by_grouping[grouped]
+            counts[name].append((self.facet_value(name, [row[position[c.key]] for c in self.columns[name]]), row[-1]))
+
+    def facet_value(self, name, values):
+        return tuple(values) if name in self.composite else values[0]
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import namedtuple
+
+# One entry of a feed section: `when` is a preformatted time (a show's start)
+# and `detail` a preformatted line, either of them None.
+FeedItem = namedtuple('FeedItem', 'id name image_link when detail')
+# `kind` is the section's key in the app's section builders, `entity` the kind
+# of row its items link to ('show', 'artist' or 'venue').
+FeedSection = namedtuple('FeedSection', 'kind title entity items')
+FeedSnapshot = namedtuple('FeedSnapshot', 'sections built_at')
+
+
+class HomeFeed:
+    # The home page's sections as one immutable snapshot, built by `build()`
+    # (a tuple of FeedSections) and replaced whole, so a request reads either
+    # the old snapshot or the new one and never queries the database itself.
+    #
+    # expire() queues one rebuild through `submit(function)` however many
+    # writes call it before that rebuild starts; a write committed while a
+    # rebuild runs queues the next one. get() also queues a rebuild once the
+    # snapshot is `max_staleness` seconds old, which is how writes made by
+    # other worker processes and the passing of time are picked up. Only the
+    # first get() of a process builds the snapshot in the request.
+
+    def __init__(self, build, submit, max_staleness=30):
+        self.build = build
+        self.submit = submit
+        self.max_staleness = max_staleness
+        self.snapshot = None
+        self.queued = False
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+
+    def get(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            return self.refresh(missing_only=True)
+        if time.time() - snapshot.built_at >= self.max_staleness:
+            self.expire()
+        return snapshot
+
+    def expire(self):
+        with self.lock:
+            if self.queued:
+                return
+            self.queued = True
+        self.submit(self.rebuild)
+
+    def rebuild(self):
+        with self.lock:
+            self.queued = False
+        self.refresh()
+
+    def refresh(self, missing_only=False):
+        with self.build_lock:
+            if self.snapshot is None or not missing_only:
+                built_at = time.time()
+                self.snapshot = FeedSnapshot(tuple(self.build()), built_at)
+            return self.snapshot
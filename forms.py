@@ -1,8 +1,8 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from flask import current_app
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, InputRequired, Regexp, ValidationError
-from app import Venue, Artist
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, InputRequired, Optional, Regexp, ValidationError
 
 
 state_choices = [
@@ -83,16 +83,18 @@ genres_choices = [
         ]
 
 
-venue_choices = []
-venue_list = Venue.query.order_by('name').all()
-for venue in venue_list:
-    venue_choices.append((venue.id, venue.name))
+class ExistingChoice:
+    # Artist/venue selects are filled by the typeahead endpoint rather than from a
+    # fixed choice list, so the submitted id is checked against the app's
+    # cached lookup instead (app.extensions['choice_lookups']).
+    def __init__(self, kind, message=None):
+        self.kind = kind
+        self.message = message or 'Please choose an existing {}.'.format(kind)
 
-
-artist_choices = []
-artists_list = Artist.query.order_by('name').all()
-for artist in artists_list:
-    artist_choices.append((artist.id, artist.name))
+    def __call__(self, form, field):
+        lookup = current_app.extensions['choice_lookups'][self.kind]
+        if field.data is None or lookup.name(field.data) is None:
+            raise ValidationError(self.message)
 
 
 class ShowForm(FlaskForm):
@@ -100,12 +102,12 @@ class ShowForm(FlaskForm):
         'name', validators=[DataRequired()]
     )
     artist_id = SelectField(
-        'artist_id',
-        choices=artist_choices
+        'artist_id', validators=[InputRequired(), ExistingChoice('artist')],
+        coerce=int, choices=[], validate_choice=False
     )
     venue_id = SelectField(
-        'venue_id',
-        choices=venue_choices
+        'venue_id', validators=[InputRequired(), ExistingChoice('venue')],
+        coerce=int, choices=[], validate_choice=False
     )
     start_time = DateTimeField(
         'start_time',
@@ -113,6 +115,30 @@ class ShowForm(FlaskForm):
         default=datetime.today(),
         format='%Y-%m-%d %H:%M:%S'
     )
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()],
+        format='%Y-%m-%d %H:%M:%S'
+    )
+
+    def validate_end_time(self, field):
+        if self.start_time.data is not None and field.data <= self.start_time.data:
+            raise ValidationError('The show must end after it starts.')
+
+    def validate(self, extra_validators=None):
+        # A show given no end time lasts SHOW_DEFAULT_MINUTES.
+        if not super().validate(extra_validators):
+            return False
+        if self.end_time.data is None:
+            self.end_time.data = self.start_time.data + timedelta(minutes=current_app.config['SHOW_DEFAULT_MINUTES'])
+        return True
+
+
+class ShowImportForm(ShowForm):
+    # `flask import` resolves and checks artist/venue references for a whole
+    # batch before validating rows, so these only need to be present.
+    artist_id = IntegerField('artist_id', validators=[InputRequired()])
+    venue_id = IntegerField('venue_id', validators=[InputRequired()])
 
 
 class VenueForm(FlaskForm):
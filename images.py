@@ -0,0 +1,252 @@
+import hashlib
+import hmac
+import http.client
+import io
+import ipaddress
+import os
+import socket
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from cache import MemoryBackend
+
+
+class ImageError(Exception):
+    # A source image that could not be fetched or decoded.
+    pass
+
+
+# Pillow formats a source image may be in.
+SOURCE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+
+def public_address(host, port):
+    # The address to connect to for host:port: the first one the host resolves
+    # to, provided that none of them is a loopback, private, link-local or
+    # otherwise internal address, so the proxy cannot be pointed at services
+    # behind it.
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except OSError as e:
+        raise ImageError('cannot resolve {}: {}'.format(host, e))
+    for info in infos:
+        if not ipaddress.ip_address(info[4][0].split('%')[0]).is_global:
+            raise ImageError('{} resolves to a non-public address'.format(host))
+    return infos[0][4][:2]
+
+
+class PublicHTTPConnection(http.client.HTTPConnection):
+    # Connects to the address public_address() has just checked rather than
+    # resolving the host again, so that a host answering DNS with a public
+    # address for the check and an internal one for the connection (DNS
+    # rebinding) is still only reached at the public one.
+
+    def connect(self):
+        self.sock = socket.create_connection(public_address(self.host, self.port), self.timeout, self.source_address)
+
+
+class PublicHTTPSConnection(http.client.HTTPSConnection, PublicHTTPConnection):
+    # HTTPSConnection.connect() wraps the socket PublicHTTPConnection opened,
+    # verifying the certificate against the host name.
+    pass
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+
+    def http_open(self, req):
+        return self.do_open(PublicHTTPConnection, req)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req)
+
+
+class HTTPRedirectHandler(urllib.request.HTTPRedirectHandler):
+    # Follows redirects to http(s) URLs only; urllib would also follow ftp.
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if urllib.parse.urlsplit(newurl).scheme not in ('http', 'https'):
+            raise ImageError('redirected to {!r}'.format(newurl))
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+class ImageProxy:
+    # Thumbnails of remote images, cached on disk under `directory`. The first
+    # request for a source URL fetches it once on a pool of `workers` threads
+    # and writes a JPEG of it in each of `sizes` ({name: longest side in
+    # pixels}), as <sha256 of the URL>.<size>.jpg. Reads touch the file, so
+    # mtime order is LRU order, and the oldest files are removed once the
+    # directory holds more than `max_bytes`. The cache is shared by every
+    # worker process on the host; a source that failed is retried after
+    # `retry_after` seconds.
+    #
+    # Proxy URLs carry an HMAC of the source URL under `secret`, so only URLs
+    # the app rendered itself are fetched.
+
+    def __init__(self, directory, sizes, secret, max_bytes, workers=4, timeout=10, max_source_bytes=20 * 1024 * 1024,
+                 quality=82, retry_after=300, allow_private=False):
+        self.directory = directory
+        self.sizes = dict(sizes)
+        self.secret = secret
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_source_bytes = max_source_bytes
+        self.quality = quality
+        self.retry_after = retry_after
+        self.allow_private = allow_private
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='images')
+        self.pending = {}
+        self.failures = MemoryBackend(10000)
+        self.lock = threading.Lock()
+        # Bytes this process believes the directory holds; None until scanned.
+        self.estimated_bytes = None
+        # Environment proxies are ignored: the address checked must be the one
+        # connected to.
+        handlers = [urllib.request.ProxyHandler({}), HTTPRedirectHandler]
+        if not allow_private:
+            handlers += [PublicHTTPHandler, PublicHTTPSHandler]
+        self.opener = urllib.request.build_opener(*handlers)
+        os.makedirs(directory, exist_ok=True)
+
+    def sign(self, url):
+        return hmac.new(self.secret, url.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def verify(self, url, signature):
+        return hmac.compare_digest(self.sign(url), signature)
+
+    def key(self, url):
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def path(self, url, size):
+        return os.path.join(self.directory, '{}.{}.jpg'.format(self.key(url), size))
+
+    def thumbnail(self, url, size, wait):
+        # Returns the JPEG bytes of `url` at `size`, waiting up to `wait`
+        # seconds for a fetch; raises ImageError for a source that cannot be
+        # used and concurrent.futures.TimeoutError if the fetch takes longer
+        # (it carries on in the background).
+        path = self.path(url, size)
+        data = self.read(path)
+        if data is None:
+            self.fetch(url).result(timeout=wait)
+            data = self.read(path)
+            if data is None:
+                raise ImageError('{} was evicted before it could be served'.format(path))
+        return data
+
+    def read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def fetch(self, url):
+        # The future of the pending fetch of `url`, started if there is none.
+        with self.lock:
+            future = self.pending.get(url)
+            if future is not None:
+                return future
+            future = self.pending[url] = self.executor.submit(self.load, url)
+        # Outside the lock: a fetch that has already finished runs the callback
+        # here, and forget() takes the lock.
+        future.add_done_callback(lambda _: self.forget(url))
+        return future
+
+    def forget(self, url):
+        with self.lock:
+            self.pending.pop(url, None)
+
+    def load(self, url):
+        error = self.failures.get(url)
+        if error is not None:
+            raise ImageError(error)
+        try:
+            image = self.decode(self.download(url))
+            written = sum(self.write(self.path(url, size), data) for size, data in self.resize(image))
+        except (ImageError, OSError, ValueError, http.client.HTTPException, Image.DecompressionBombError) as e:
+            self.failures.set(url, '{}: {}'.format(url, e), self.retry_after)
+            raise ImageError('{}: {}'.format(url, e))
+        self.evict(written)
+
+    def download(self, url):
+        if urllib.parse.urlsplit(url).scheme not in ('http', 'https'):
+            raise ImageError('not an http(s) URL')
+        request = urllib.request.Request(url, headers={'User-Agent': 'Fyyur image proxy'})
+        with self.opener.open(request, timeout=self.timeout) as response:
+            content_type = response.headers.get_content_type()
+            if not content_type.startswith('image/'):
+                raise ImageError('served as {}, not an image'.format(content_type))
+            data = response.read(self.max_source_bytes + 1)
+        if len(data) > self.max_source_bytes:
+            raise ImageError('larger than {} bytes'.format(self.max_source_bytes))
+        return data
+
+    def decode(self, data):
+        image = Image.open(io.BytesIO(data), formats=SOURCE_FORMATS)
+        # JPEGs decode straight at a fraction of their size when that is still
+        # at least the largest thumbnail.
+        largest = max(self.sizes.values())
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB')
+
+    def resize(self, image):
+        # Largest size first, each smaller one scaled down from the previous
+        # rather than from the source. Images are never enlarged.
+        for size, side in sorted(self.sizes.items(), key=lambda item: -item[1]):
+            image = image.copy()
+            image.thumbnail((side, side), Image.LANCZOS)
+            out = io.BytesIO()
+            image.save(out, 'JPEG', quality=self.quality, optimize=True, progressive=True)
+            yield size, out.getvalue()
+
+    def write(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return len(data)
+
+    def evict(self, written):
+        # Scans the directory only when this process's estimate of its size
+        # goes over max_bytes, then removes the least recently read files down
+        # to 90% of it, so that the next scan is some writes away.
+        with self.lock:
+            if self.estimated_bytes is not None:
+                self.estimated_bytes += written
+                if self.estimated_bytes <= self.max_bytes:
+                    return
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.jpg'):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.stat().st_size, entry.path))
+                    except OSError:
+                        pass
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= self.max_bytes * 0.9:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    total -= size
+            self.estimated_bytes = total
@@ -0,0 +1,143 @@
+import csv
+import json
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+
+from werkzeug.datastructures import MultiDict
+
+# Values a CSV/JSON boolean column may hold for False; anything else is True.
+FALSE_VALUES = {'', '0', 'false', 'f', 'no', 'n', 'off'}
+
+# What `flask import` needs to load one kind of row:
+#   model       mapped class whose table receives the rows
+#   form        WTForms class validating one row (fields named like the columns)
+#   columns     form fields written to the table
+#   list_fields fields holding several values ("Jazz,Blues" in CSV, a JSON list)
+#   bool_fields checkbox fields
+#   prepare     callable(session, rows) -> {index: errors}, run on each batch of
+#               row dicts before validation; may fill in fields (e.g. ids)
+#   changed     callable(values) recording the batch's inserted column values
+#               for the commit hooks, called before each commit
+ImportSpec = namedtuple('ImportSpec', 'model form columns list_fields bool_fields prepare changed')
+
+
+def read_records(path, fmt=None):
+    # (line number, row dict or None, error or None) for each record, streamed.
+    # CSV files need a header row; JSONL files hold one JSON object per line.
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row, None
+        else:
+            for line_num, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as error:
+                    yield line_num, None, 'invalid JSON: {}'.format(error)
+                    continue
+                if isinstance(row, dict):
+                    yield line_num, row, None
+                else:
+                    yield line_num, None, 'expected a JSON object'
+
+
+def form_data(row, list_fields=(), bool_fields=()):
+    # The row as the MultiDict a form POST of it would produce.
+    data = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key in list_fields:
+            values = value if isinstance(value, list) else str(value).split(',')
+            for item in values:
+                if str(item).strip():
+                    data.add(key, str(item).strip())
+        elif key in bool_fields:
+            if str(value).strip().lower() not in FALSE_VALUES:
+                data.add(key, 'y')
+        else:
+            data.add(key, str(value))
+    return data
+
+
+class Importer:
+    # Streams records into `spec.model`'s table in batches of `batch_size`. Each
+    # batch is validated row by row with `spec.form`, inserted with one
+    # executemany and committed together with its checkpoint row (a
+    # `checkpoint_model` instance keyed by `source`), so a rerun resumes right
+    # after the last committed batch. Rejected rows are appended to `rejects`
+    # as JSON lines once their batch is committed.
+
+    def __init__(self, session, spec, checkpoint_model, batch_size=5000):
+        self.session = session
+        self.spec = spec
+        self.checkpoint_model = checkpoint_model
+        self.batch_size = batch_size
+
+    def checkpoint(self, source, restart):
+        checkpoint = self.session.get(self.checkpoint_model, source)
+        if checkpoint is None:
+            checkpoint = self.checkpoint_model(source=source, rows_done=0)
+            self.session.add(checkpoint)
+        elif restart:
+            checkpoint.rows_done = 0
+        return checkpoint
+
+    def validate(self, row):
+        form = self.spec.form(
+            formdata=form_data(row, self.spec.list_fields, self.spec.bool_fields), meta={'csrf': False}
+        )
+        if not form.validate():
+            return None, form.errors
+        return {name: form[name].data for name in self.spec.columns}, None
+
+    def run(self, records, source, rejects, restart=False, progress=None):
+        # Returns (rows accepted, rows rejected, rows skipped by the checkpoint).
+        checkpoint = self.checkpoint(source, restart)
+        skipped = checkpoint.rows_done
+        records = islice(records, skipped, None)
+        accepted = rejected = 0
+        with open(rejects, 'a' if skipped else 'w', encoding='utf-8') as report:
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                rows = [row for _, row, _ in batch if row is not None]
+                prepare_errors = self.spec.prepare(self.session, rows) if self.spec.prepare else {}
+
+                values = []
+                failures = []
+                row_index = 0
+                for line_num, row, error in batch:
+                    if row is None:
+                        failures.append({"line": line_num, "errors": {"__all__": [error]}})
+                        continue
+                    errors = prepare_errors.get(row_index)
+                    row_index += 1
+                    if not errors:
+                        row_values, errors = self.validate(row)
+                    if errors:
+                        failures.append({"line": line_num, "errors": errors, "row": row})
+                    else:
+                        values.append(row_values)
+
+                if values:
+                    self.session.execute(self.spec.model.__table__.insert(), values)
+                    self.spec.changed(values)
+                checkpoint.rows_done += len(batch)
+                checkpoint.updated_at = datetime.now()
+                self.session.commit()
+
+                for failure in failures:
+                    report.write(json.dumps(failure, default=str) + '\n')
+                report.flush()
+                accepted += len(values)
+                rejected += len(failures)
+                if progress:
+                    progress(checkpoint.rows_done, accepted, rejected)
+        return accepted, rejected, skipped
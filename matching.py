@@ -0,0 +1,164 @@
+import threading
+import time
+
+import numpy as np
+
+
+# Number of set bits of every byte value.
+BYTE_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+# Genres a bitset holds: the bitsets are uint64.
+MAX_GENRES = 64
+
+
+def popcount(values, nbytes=8):
+    # Number of set bits of each of the uint64 `values`, all of whose bits are
+    # in their low `nbytes` bytes: a table lookup per byte, or NumPy's own
+    # bitwise_count where there is one (NumPy 2).
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    columns = values.astype('<u8', copy=False).view(np.uint8).reshape(-1, 8)
+    counts = BYTE_POPCOUNT[columns[:, 0]]
+    for byte in range(1, nbytes):
+        counts = counts + BYTE_POPCOUNT[columns[:, byte]]
+    return counts
+
+
+class MatchIndex:
+    # The match features of every row of one table (venues or artists) as NumPy
+    # arrays, so that ranking all of them against an artist or venue is a few
+    # vectorised passes: genres as uint64 bitsets over `genres` (at most 64, in
+    # forms.genres_choices order; other values are ignored), (city, state) and
+    # state as integer codes, and the seeking flag. `loader(ids)` returns (id, genres, city,
+    # state, seeking) rows, all of them when ids is None.
+    #
+    # The arrays are loaded on first use. update() reloads just the given rows
+    # after a commit, appending new rows into spare capacity and marking
+    # deleted ones dead; rows a commit could not name (bulk imports) call for
+    # invalidate() and a full reload. A full reload also happens once the
+    # arrays are `max_staleness` seconds old, which is how commits made by
+    # other worker processes are picked up.
+
+    def __init__(self, loader, genres, max_staleness=300):
+        if len(genres) > MAX_GENRES:
+            raise ValueError('at most {} genres fit a bitset, not {}'.format(MAX_GENRES, len(genres)))
+        self.loader = loader
+        self.genre_bits = {genre: 1 << i for i, genre in enumerate(genres)}
+        self.genres = list(genres)
+        self.bitset_bytes = max((len(genres) + 7) // 8, 1)
+        self.max_staleness = max_staleness
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+
+    def ensure_loaded(self):
+        # Called with the lock held.
+        if self.loaded_at is not None and time.time() - self.loaded_at < self.max_staleness:
+            return
+        loaded_at = time.time()
+        self.size = 0
+        self.positions = {}
+        self.place_codes = {}
+        self.state_codes = {}
+        self.allocate(1024)
+        self.store(self.loader(None))
+        self.loaded_at = loaded_at
+
+    def allocate(self, capacity):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.bits = np.zeros(capacity, dtype=np.uint64)
+        self.places = np.zeros(capacity, dtype=np.int32)
+        self.states = np.zeros(capacity, dtype=np.int32)
+        self.seeking = np.zeros(capacity, dtype=bool)
+
+    def grow(self, capacity):
+        arrays = self.ids, self.bits, self.places, self.states, self.seeking
+        self.allocate(capacity)
+        for new, old in zip((self.ids, self.bits, self.places, self.states, self.seeking), arrays):
+            new[:self.size] = old[:self.size]
+
+    def encode(self, genres, city, state):
+        bits = 0
+        for genre in genres or ():
+            bits |= self.genre_bits.get(genre, 0)
+        place = self.place_codes.setdefault((city, state), len(self.place_codes) + 1)
+        state = self.state_codes.setdefault(state, len(self.state_codes) + 1)
+        return bits, place, state
+
+    def store(self, rows):
+        # Writes `rows` over their existing positions or appends them; returns
+        # the ids stored.
+        stored = set()
+        for row_id, genres, city, state, seeking in rows:
+            position = self.positions.get(row_id)
+            if position is None:
+                if self.size == len(self.ids):
+                    self.grow(len(self.ids) * 2)
+                position = self.positions[row_id] = self.size
+                self.size += 1
+            self.ids[position] = row_id
+            self.bits[position], self.places[position], self.states[position] = self.encode(genres, city, state)
+            self.seeking[position] = bool(seeking)
+            stored.add(row_id)
+        return stored
+
+    def update(self, ids):
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            stored = self.store(self.loader(ids))
+            for row_id in set(ids) - stored:
+                # Deleted: its slot stays, out of every ranking.
+                position = self.positions.pop(row_id, None)
+                if position is not None:
+                    self.seeking[position] = False
+
+    def rank(self, genres, city, state, history, weights, offset, limit):
+        # One page of the seeking rows ranked by
+        #   weights['genres'] * (share of `genres` they also list)
+        #   + weights['city'] * (same city and state) + weights['state'] * (same state)
+        #   + weights['history'] * log(1 + shows together),
+        # `history` being {id: shows together}, best first and by id on a tie.
+        # Returns [(id, score, shared genres, shows together)] and the number of
+        # seeking rows.
+        with self.lock:
+            self.ensure_loaded()
+            size = self.size
+            bits, place, state = self.encode(genres, city, state)
+            shared = popcount(self.bits[:size] & np.uint64(bits), self.bitset_bytes)
+            scores = shared * (weights['genres'] / max(bin(bits).count('1'), 1))
+            scores += (self.places[:size] == place) * weights['city']
+            scores += (self.states[:size] == state) * weights['state']
+            together = np.zeros(size, dtype=np.int64)
+            known = [(self.positions[row_id], count) for row_id, count in history.items() if row_id in self.positions]
+            if known:
+                positions, counts = zip(*known)
+                together[list(positions)] = counts
+                scores += np.log1p(together) * weights['history']
+            candidates = np.flatnonzero(self.seeking[:size])
+            total = len(candidates)
+            end = min(offset + limit, total)
+            if offset >= end:
+                return [], total
+            # Partition out the top `end` candidates, then sort only those.
+            candidate_scores = scores[candidates]
+            if end < total:
+                top = np.argpartition(-candidate_scores, end - 1)[:end]
+                # Rows tied with the last one kept may sort before it by id.
+                cutoff = candidate_scores[top].min()
+                top = np.flatnonzero(candidate_scores >= cutoff)
+            else:
+                top = np.arange(total)
+            top = candidates[top]
+            order = np.lexsort((self.ids[top], -scores[top]))[offset:end]
+            page = top[order]
+            return [
+                (int(self.ids[position]), round(float(scores[position]), 4),
+                 [genre for genre in self.genres if int(self.bits[position]) & bits & self.genre_bits[genre]],
+                 int(together[position]))
+                for position in page
+            ], total
@@ -0,0 +1,66 @@
+"""search vectors and trigram indexes
+
+Revision ID: 3c1f9a7d2b64
+Revises: ae0a80f18b50
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f9a7d2b64'
+down_revision = 'ae0a80f18b50'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_VECTORS = {
+    'Venue': "setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A')"
+             " || setweight(to_tsvector('simple', coalesce(NEW.city || ' ' || NEW.state, '')), 'B')"
+             " || setweight(to_tsvector('simple', coalesce(array_to_string(NEW.genres, ' '), '')), 'C')",
+    'Artist': "setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A')"
+              " || setweight(to_tsvector('simple', coalesce(NEW.city || ' ' || NEW.state, '')), 'B')"
+              " || setweight(to_tsvector('simple', coalesce(array_to_string(NEW.genres, ' '), '')), 'C')",
+    'Show': "setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A')",
+}
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    for table, vector in SEARCH_VECTORS.items():
+        function = '{}_search_vector_update'.format(table.lower())
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute(
+            '''CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {vector};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql'''.format(function=function, vector=vector)
+        )
+        op.execute(
+            '''CREATE TRIGGER {function}
+BEFORE INSERT OR UPDATE ON "{table}"
+FOR EACH ROW EXECUTE FUNCTION {function}()'''.format(function=function, table=table)
+        )
+        # Fire the trigger once for existing rows.
+        op.execute('UPDATE "{}" SET name = name'.format(table))
+
+        op.create_index('ix_{}_search_vector'.format(table), table, ['search_vector'], unique=False,
+                        postgresql_using='gin')
+        op.create_index('ix_{}_name_trgm'.format(table), table, ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table in reversed(list(SEARCH_VECTORS)):
+        function = '{}_search_vector_update'.format(table.lower())
+        op.drop_index('ix_{}_name_trgm'.format(table), table_name=table)
+        op.drop_index('ix_{}_search_vector'.format(table), table_name=table)
+        op.execute('DROP TRIGGER IF EXISTS {} ON "{}"'.format(function, table))
+        op.execute('DROP FUNCTION IF EXISTS {}()'.format(function))
+        op.drop_column(table, 'search_vector')
@@ -0,0 +1,37 @@
+"""browse indexes
+
+Revision ID: 5b9e3f60c2d7
+Revises: 8d52e4b07a1c
+Create Date: 2026-10-18 14:05:27.118304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b9e3f60c2d7'
+down_revision = '8d52e4b07a1c'
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns)
+INDEXES = [
+    # /venues/browse pages, ordered by name
+    ('ix_Venue_name_id', 'Venue', ['name', 'id']),
+    # /artists/browse state and city filters
+    ('ix_Artist_state_city', 'Artist', ['state', 'city']),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
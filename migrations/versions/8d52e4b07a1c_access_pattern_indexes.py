@@ -0,0 +1,48 @@
+"""access pattern indexes
+
+Revision ID: 8d52e4b07a1c
+Revises: 3c1f9a7d2b64
+Create Date: 2026-10-18 11:40:03.552917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d52e4b07a1c'
+down_revision = '3c1f9a7d2b64'
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns, postgresql_using)
+INDEXES = [
+    # /shows keyset pages, upcoming/past splits and the show search walk
+    ('ix_Show_start_time_id', 'Show', ['start_time', 'id'], None),
+    # venue/artist detail pages, upcoming counts and the show search id arrays
+    ('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], None),
+    ('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], None),
+    # /venues area grouping
+    ('ix_Venue_state_city', 'Venue', ['state', 'city'], None),
+    # /artists keyset pages
+    ('ix_Artist_name_id', 'Artist', ['name', 'id'], None),
+    # genre containment (@>, &&)
+    ('ix_Venue_genres', 'Venue', ['genres'], 'gin'),
+    ('ix_Artist_genres', 'Artist', ['genres'], 'gin'),
+]
+
+
+def upgrade():
+    # CONCURRENTLY keeps the tables writable while the indexes build; it cannot
+    # run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        for name, table, columns, using in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_using=using,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, using in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
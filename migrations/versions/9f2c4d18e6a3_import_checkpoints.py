@@ -0,0 +1,29 @@
+"""import checkpoints
+
+Revision ID: 9f2c4d18e6a3
+Revises: 5b9e3f60c2d7
+Create Date: 2026-10-18 16:42:09.530117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f2c4d18e6a3'
+down_revision = '5b9e3f60c2d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ImportCheckpoint',
+    sa.Column('source', sa.String(length=600), nullable=False),
+    sa.Column('rows_done', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade():
+    op.drop_table('ImportCheckpoint')
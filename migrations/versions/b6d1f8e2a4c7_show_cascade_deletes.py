@@ -0,0 +1,39 @@
+"""show cascade deletes
+
+Revision ID: b6d1f8e2a4c7
+Revises: e7b2d5a91c48
+Create Date: 2026-10-18 23:12:09.448301
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d1f8e2a4c7'
+down_revision = 'e7b2d5a91c48'
+branch_labels = None
+depends_on = None
+
+
+FOREIGN_KEYS = [('Show_venue_id_fkey', 'Venue', 'venue_id'), ('Show_artist_id_fkey', 'Artist', 'artist_id')]
+
+
+def replace_foreign_keys(ondelete):
+    # The new constraints are added NOT VALID, which is instant, and validated
+    # after the swap has committed: validating only takes a SHARE UPDATE
+    # EXCLUSIVE lock, so "Show" stays writable while every row is checked.
+    for name, table, column in FOREIGN_KEYS:
+        op.drop_constraint(name, 'Show', type_='foreignkey')
+        op.create_foreign_key(name, 'Show', table, [column], ['id'], ondelete=ondelete, postgresql_not_valid=True)
+    with op.get_context().autocommit_block():
+        for name, _, _ in FOREIGN_KEYS:
+            op.execute('ALTER TABLE "Show" VALIDATE CONSTRAINT "{}"'.format(name))
+
+
+def upgrade():
+    replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    replace_foreign_keys(None)
@@ -0,0 +1,106 @@
+"""show counters
+
+Revision ID: c41e7a9b3f05
+Revises: 9f2c4d18e6a3
+Create Date: 2026-10-18 18:20:51.402187
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e7a9b3f05'
+down_revision = '9f2c4d18e6a3'
+branch_labels = None
+depends_on = None
+
+
+# (counts table, owner table, Show foreign key)
+COUNTED_TABLES = [('VenueShowCounts', 'Venue', 'venue_id'), ('ArtistShowCounts', 'Artist', 'artist_id')]
+
+# Transition tables and the rows they contribute for each trigger event.
+TRIGGER_EVENTS = {
+    'INSERT': ('NEW TABLE AS new_rows', 'SELECT venue_id, artist_id, start_time, 1 AS delta FROM new_rows'),
+    'DELETE': ('OLD TABLE AS old_rows', 'SELECT venue_id, artist_id, start_time, -1 AS delta FROM old_rows'),
+    'UPDATE': (
+        'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+        'SELECT venue_id, artist_id, start_time, 1 AS delta FROM new_rows'
+        ' UNION ALL SELECT venue_id, artist_id, start_time, -1 AS delta FROM old_rows'
+    ),
+}
+
+COUNTER_UPSERT = '''
+    INSERT INTO "{counts}" AS counts ({fk}, upcoming_shows_count, past_shows_count)
+    SELECT changed.id, changed.upcoming, changed.past
+    FROM (
+        SELECT {fk} AS id,
+               coalesce(sum(delta) FILTER (WHERE start_time >= rolled), 0) AS upcoming,
+               coalesce(sum(delta) FILTER (WHERE start_time < rolled), 0) AS past
+        FROM ({rows}) AS rows
+        GROUP BY {fk}
+    ) AS changed
+    JOIN "{owner}" ON "{owner}".id = changed.id
+    WHERE changed.upcoming <> 0 OR changed.past <> 0
+    ORDER BY changed.id
+    ON CONFLICT ({fk}) DO UPDATE SET
+        upcoming_shows_count = counts.upcoming_shows_count + excluded.upcoming_shows_count,
+        past_shows_count = counts.past_shows_count + excluded.past_shows_count;'''
+
+
+def upgrade():
+    now = datetime.now()
+    for counts, owner, fk in COUNTED_TABLES:
+        op.create_table(counts,
+        sa.Column(fk, sa.Integer(), nullable=False),
+        sa.Column('upcoming_shows_count', sa.Integer(), nullable=False),
+        sa.Column('past_shows_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([fk], ['{}.id'.format(owner)], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(fk)
+        )
+        # Count the existing shows.
+        op.execute(sa.text('''INSERT INTO "{counts}" ({fk}, upcoming_shows_count, past_shows_count)
+SELECT {fk}, count(*) FILTER (WHERE start_time >= :now), count(*) FILTER (WHERE start_time < :now)
+FROM "Show"
+GROUP BY {fk}'''.format(counts=counts, fk=fk)).bindparams(now=now))
+
+    op.create_table('ShowCountRoll',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_until', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(sa.text('INSERT INTO "ShowCountRoll" (id, rolled_until) VALUES (1, :now)').bindparams(now=now))
+
+    for event, (referencing, rows) in TRIGGER_EVENTS.items():
+        function = 'show_counts_{}'.format(event.lower())
+        op.execute('''CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+DECLARE
+    rolled timestamp;
+BEGIN
+    SELECT rolled_until INTO rolled FROM "ShowCountRoll" FOR SHARE;{upserts}
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql'''.format(
+            function=function,
+            upserts=''.join(
+                COUNTER_UPSERT.format(counts=counts, owner=owner, fk=fk, rows=rows)
+                for counts, owner, fk in COUNTED_TABLES
+            )
+        ))
+        op.execute('''CREATE TRIGGER {function}
+AFTER {event} ON "Show" REFERENCING {referencing}
+FOR EACH STATEMENT EXECUTE FUNCTION {function}()'''.format(
+            function=function, event=event, referencing=referencing
+        ))
+
+
+def downgrade():
+    for event in reversed(list(TRIGGER_EVENTS)):
+        function = 'show_counts_{}'.format(event.lower())
+        op.execute('DROP TRIGGER IF EXISTS {} ON "Show"'.format(function))
+        op.execute('DROP FUNCTION IF EXISTS {}()'.format(function))
+    op.drop_table('ShowCountRoll')
+    for counts, owner, fk in reversed(COUNTED_TABLES):
+        op.drop_table(counts)
@@ -0,0 +1,48 @@
+"""show end times
+
+Revision ID: e7b2d5a91c48
+Revises: c41e7a9b3f05
+Create Date: 2026-10-18 21:05:37.618204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2d5a91c48'
+down_revision = 'c41e7a9b3f05'
+branch_labels = None
+depends_on = None
+
+
+# Existing shows get the default length (SHOW_DEFAULT_MINUTES).
+DEFAULT_MINUTES = 180
+
+PERIOD_INDEX = (
+    'CREATE INDEX CONCURRENTLY "ix_Show_venue_period" ON "Show" USING gist '
+    "(tsrange(start_time, end_time), int4range(venue_id, venue_id, '[]'))"
+)
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # Filled by rewriting the column rather than by an UPDATE, which would fire
+    # the search vector and show counter triggers for every show.
+    op.execute(
+        'ALTER TABLE "Show" ALTER COLUMN end_time TYPE timestamp without time zone '
+        "USING start_time + interval '{} minutes'".format(DEFAULT_MINUTES)
+    )
+    op.alter_column('Show', 'end_time', nullable=False)
+    op.create_check_constraint('ck_Show_end_time', 'Show', 'end_time > start_time')
+    # CONCURRENTLY keeps the table writable while the index builds; it cannot
+    # run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        op.execute(PERIOD_INDEX)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_Show_venue_period"')
+    op.drop_constraint('ck_Show_end_time', 'Show', type_='check')
+    op.drop_column('Show', 'end_time')
@@ -0,0 +1,43 @@
+import asyncio
+from collections import namedtuple
+
+# Read views that can also run on an async engine are written as plans:
+# generators that yield lists of Fetches and are sent back, in the same order,
+# what each Fetch took from its query's result. The Fetches of one list do not
+# depend on each other. run_plan() runs them one after another through the
+# Flask-SQLAlchemy session; under ASGI, asgi.py drives the plan as a coroutine
+# on the event loop and runs each list concurrently with fetch_all(), so a page
+# waits for its slowest query rather than for all of them in turn, without
+# holding a thread. A plan's return value is the view's.
+#
+# Queries are built on the session but run as Core statements by fetch_all(),
+# so they must select columns rather than ORM entities.
+
+# `method` is the Query/Result method taking the rows: 'all', 'one', 'first' or
+# 'scalar'.
+Fetch = namedtuple('Fetch', ['query', 'method'], defaults=['all'])
+
+
+def run_plan(plan):
+    results = None
+    while True:
+        try:
+            fetches = plan.send(results)
+        except StopIteration as stop:
+            return stop.value
+        results = [getattr(fetch.query, fetch.method)() for fetch in fetches]
+
+
+async def fetch_all(engine, fetches, max_connections):
+    # The results of `fetches`, run over at most `max_connections` connections
+    # of the engine's pool at a time, each Fetch on a connection of its own, so
+    # the statements of one page may see slightly different snapshots.
+    semaphore = asyncio.Semaphore(max_connections)
+
+    async def run(fetch):
+        async with semaphore:
+            async with engine.connect() as connection:
+                result = await connection.execute(fetch.query.statement)
+                return getattr(result, fetch.method)()
+
+    return await asyncio.gather(*[run(fetch) for fetch in fetches])
@@ -0,0 +1,55 @@
+from flask import g, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+
+# Bind keys of the SQLALCHEMY_REPLICA_URIS engines in SQLALCHEMY_BINDS.
+REPLICA_BIND = 'replica{}'
+
+
+def replica_binds(uris):
+    return {REPLICA_BIND.format(i): uri for i, uri in enumerate(uris)}
+
+
+def async_uri(uri):
+    # The asyncpg URI of a Postgres database URI, for create_async_engine().
+    scheme, _, rest = uri.partition('://')
+    if scheme.split('+')[0] not in ('postgresql', 'postgres'):
+        raise ValueError('async mode needs a PostgreSQL database, not {}'.format(scheme))
+    return 'postgresql+asyncpg://' + rest
+
+
+def engine_options(uri, pool_size, max_overflow, pool_timeout, pool_recycle, pre_ping, statement_timeout_ms):
+    # create_engine() options for the primary and every replica, and for their
+    # async engines. SQLite gets no queue pool sizes (it runs on a NullPool) and
+    # no statement timeout.
+    options = {'pool_pre_ping': pre_ping, 'pool_recycle': pool_recycle}
+    if uri.startswith('sqlite'):
+        return options
+    options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+    if statement_timeout_ms and uri.startswith('postgresql+asyncpg'):
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(int(statement_timeout_ms))}}
+    elif statement_timeout_ms and uri.startswith('postgresql'):
+        options['connect_args'] = {'options': '-c statement_timeout={:d}'.format(statement_timeout_ms)}
+    return options
+
+
+class RoutingSession(SignallingSession):
+    # Runs the queries of a request on the replica bind named by g.replica_bind,
+    # when one is set. Flushes and INSERT/UPDATE/DELETE statements always go to
+    # the primary.
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        bind_key = g.get('replica_bind') if has_request_context() else None
+        if bind_key is None or self._flushing or getattr(clause, 'is_dml', False):
+            return super().get_bind(mapper, clause)
+        return self.db.get_engine(self.app, bind=bind_key)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -0,0 +1,47 @@
+from sqlalchemy import and_, func, literal_column
+
+# ----------------------------------------------------------------------------#
+# Show periods.
+# ----------------------------------------------------------------------------#
+
+# A show occupies its venue from start_time up to end_time. On Postgres the
+# "ix_Show_venue_period" GiST index holds each show's period as a tsrange
+# together with its venue id as a one-value int4range (plain integers have no
+# GiST operator class without the btree_gist extension), so both "shows
+# overlapping this window" and "shows at this venue overlapping this window"
+# are index searches, whatever the size of the schedule. Elsewhere the same
+# filters are spelled as plain comparisons.
+
+# The migrations carry their own copy of this SQL.
+PERIOD_INDEX = (
+    'CREATE INDEX {concurrently}"ix_Show_venue_period" ON "Show" USING gist '
+    "(tsrange(start_time, end_time), int4range(venue_id, venue_id, '[]'))"
+)
+
+
+def period_index_ddl(concurrently=False):
+    return PERIOD_INDEX.format(concurrently='CONCURRENTLY ' if concurrently else '')
+
+
+def show_period(show):
+    return func.tsrange(show.start_time, show.end_time)
+
+
+def show_venue_range(show):
+    # Spelled exactly as in the index (the bounds inlined rather than bound), so
+    # Postgres matches the expression.
+    return func.int4range(show.venue_id, show.venue_id, literal_column("'[]'"))
+
+
+def overlapping(show, start, end, dialect, venue_id=None):
+    # Filter for the shows (at venue_id, a value or column, if given) whose
+    # period overlaps [start, end).
+    if dialect == 'postgresql':
+        clause = show_period(show).op('&&')(func.tsrange(start, end))
+        if venue_id is not None:
+            clause = and_(clause, show_venue_range(show).op('@>')(venue_id))
+        return clause
+    clause = and_(show.start_time < end, show.end_time > start)
+    if venue_id is not None:
+        clause = and_(clause, show.venue_id == venue_id)
+    return clause
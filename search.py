@@ -0,0 +1,156 @@
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+from sqlalchemy import func, literal_column
+
+# ----------------------------------------------------------------------------#
+# Postgres full-text search.
+# ----------------------------------------------------------------------------#
+
+# Names are not stemmed, so every search_vector is built with the 'simple' config.
+TEXT_SEARCH_CONFIG = 'simple'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def escape_like(text):
+    # `text` matched literally by LIKE/ILIKE with escape='\\'.
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def prefix_tsquery(search_term):
+    # "san fran, ca" -> to_tsquery('simple', 'san:* & fran:* & ca:*'). Only \w+
+    # tokens reach the query string, so user input cannot inject tsquery syntax.
+    # The config is inlined rather than bound: asyncpg binds strings as varchar,
+    # which Postgres will not take as a regconfig.
+    tokens = tokenize(search_term)
+    if not tokens:
+        return None
+    return func.to_tsquery(
+        literal_column("'{}'".format(TEXT_SEARCH_CONFIG)), ' & '.join(token + ':*' for token in tokens)
+    )
+
+
+def search_vector_sql(weighted_columns):
+    # SQL for a weighted tsvector over NEW.<column>; `weighted_columns` is a list
+    # of (sql expression, weight) pairs.
+    parts = [
+        "setweight(to_tsvector('{config}', coalesce({expr}, '')), '{weight}')".format(
+            config=TEXT_SEARCH_CONFIG, expr=expr, weight=weight
+        )
+        for expr, weight in weighted_columns
+    ]
+    return ' || '.join(parts)
+
+
+def search_trigger_ddl(table, weighted_columns):
+    # Trigger keeping "<table>".search_vector current on INSERT/UPDATE. The
+    # migrations carry their own copy of this SQL.
+    function = '{}_search_vector_update'.format(table.lower())
+    return [
+        '''CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {vector};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql'''.format(function=function, vector=search_vector_sql(weighted_columns)),
+        '''CREATE TRIGGER {function}
+BEFORE INSERT OR UPDATE ON "{table}"
+FOR EACH ROW EXECUTE FUNCTION {function}()'''.format(function=function, table=table),
+    ]
+
+
+# ----------------------------------------------------------------------------#
+# In-process fallback.
+# ----------------------------------------------------------------------------#
+
+class InvertedIndex:
+    # Word -> documents postings over a sorted vocabulary, plus each document's
+    # lowercased name, matching as Postgres does: a document matches when every
+    # query token is a prefix of one of its words (the prefix tsquery) or when
+    # the whole term appears anywhere in its name (the trigram-indexed ILIKE).
+
+    def __init__(self):
+        self.names = {}
+        self.postings = defaultdict(dict)
+        self.vocabulary = None
+
+    def add(self, doc_id, name, fields):
+        # `fields` is a list of (text, weight) pairs; a word keeps its best weight.
+        self.names[doc_id] = (name or '').lower()
+        for text, weight in fields:
+            for word in tokenize(text):
+                if weight > self.postings[word].get(doc_id, 0):
+                    self.postings[word][doc_id] = weight
+        self.vocabulary = None
+
+    def matching_words(self, token):
+        if self.vocabulary is None:
+            self.vocabulary = sorted(self.postings)
+        vocabulary = self.vocabulary
+        i = bisect.bisect_left(vocabulary, token)
+        words = []
+        while i < len(vocabulary) and vocabulary[i].startswith(token):
+            words.append(vocabulary[i])
+            i += 1
+        return words
+
+    def search(self, search_term):
+        # {id: score} of the matching documents. Token matches score their summed
+        # field weights, with a bonus for whole-word hits; name-only matches
+        # score 0, as ts_rank_cd ranks them on Postgres.
+        scores = {}
+        tokens = tokenize(search_term)
+        for i, token in enumerate(tokens):
+            token_scores = {}
+            for word in self.matching_words(token):
+                bonus = 0.5 if word == token else 0
+                for doc_id, weight in self.postings[word].items():
+                    token_scores[doc_id] = max(token_scores.get(doc_id, 0), weight + bonus)
+            if i == 0:
+                scores = token_scores
+            else:
+                scores = {doc_id: score + token_scores[doc_id] for doc_id, score in scores.items()
+                          if doc_id in token_scores}
+            if not scores:
+                break
+        term = search_term.lower()
+        for doc_id, name in self.names.items():
+            if term in name:
+                scores.setdefault(doc_id, 0)
+        return scores
+
+
+class FallbackSearch:
+    # Lazily (re)built inverted indexes for databases without tsvector support.
+    # `loaders` maps a kind ('venue', 'artist', 'show') to a callable yielding
+    # (id, name, fields) documents; invalidate() marks a kind for rebuild on next
+    # search.
+
+    def __init__(self, loaders):
+        self.loaders = loaders
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def invalidate(self, kind=None):
+        with self.lock:
+            if kind is None:
+                self.indexes.clear()
+            else:
+                self.indexes.pop(kind, None)
+
+    def search(self, kind, search_term):
+        with self.lock:
+            index = self.indexes.get(kind)
+            if index is None:
+                index = InvertedIndex()
+                for doc_id, name, fields in self.loaders[kind]():
+                    index.add(doc_id, name, fields)
+                self.indexes[kind] = index
+        return index.search(search_term)
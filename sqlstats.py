@@ -0,0 +1,64 @@
+import re
+import threading
+from collections import Counter, deque
+
+# Statements that differ only in their parameters share a shape: bind
+# placeholders, literals and expanded IN lists are all reduced to "?".
+PLACEHOLDER_RE = re.compile(r"%\(\w+\)s|%s|\?|:\w+|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACE_RE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    shape = PLACEHOLDER_RE.sub('?', statement)
+    shape = IN_LIST_RE.sub('(?)', shape)
+    return SPACE_RE.sub(' ', shape).strip()
+
+
+class RequestStats:
+    # Statements issued while serving one request: count, total time, the
+    # `max_slowest` slowest statements, and shapes run at least
+    # `repeat_threshold` times, which is what an N+1 lazy load looks like.
+
+    def __init__(self, max_slowest=5, repeat_threshold=5):
+        self.max_slowest = max_slowest
+        self.repeat_threshold = repeat_threshold
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest = []
+        self.shapes = Counter()
+
+    def record(self, statement, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.shapes[statement_shape(statement)] += 1
+        self.slowest.append((elapsed_ms, statement))
+        self.slowest.sort(key=lambda item: -item[0])
+        del self.slowest[self.max_slowest:]
+
+    def repeated(self):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= self.repeat_threshold]
+
+    def summary(self):
+        return {
+            "statements": self.count,
+            "db_ms": round(self.total_ms, 2),
+            "slowest": [{"ms": round(ms, 2), "statement": statement} for ms, statement in self.slowest],
+            "n_plus_one": [{"count": n, "statement": shape} for shape, n in self.repeated()],
+        }
+
+
+class RecentRequests:
+    # The last `max_entries` request summaries, for the debug endpoint.
+
+    def __init__(self, max_entries=200):
+        self.entries = deque(maxlen=max_entries)
+        self.lock = threading.Lock()
+
+    def add(self, entry):
+        with self.lock:
+            self.entries.append(entry)
+
+    def snapshot(self):
+        with self.lock:
+            return list(reversed(self.entries))
@@ -2,3 +2,24 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Typeahead for the show form's artist/venue selects: typing into an input with
+// data-typeahead fills the select named by data-target with matching options.
+document.querySelectorAll('input[data-typeahead]').forEach(function (input) {
+  var select = document.getElementById(input.getAttribute('data-target'));
+  var timer = null;
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      var url = input.getAttribute('data-typeahead') + '?q=' + encodeURIComponent(input.value);
+      fetch(url).then(function (response) {
+        return response.json();
+      }).then(function (items) {
+        select.innerHTML = '';
+        items.forEach(function (item) {
+          select.appendChild(new Option(item.name, item.id));
+        });
+      });
+    }, 200);
+  });
+});
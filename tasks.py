@@ -0,0 +1,125 @@
+import os
+import queue
+import threading
+import time
+
+
+class TaskQueue:
+    # In-process background tasks: a queue of at most `max_queued` calls run by
+    # `workers` threads. A task that raises is retried up to `retries` times,
+    # `retry_delay` seconds apart, doubling each time, then logged and dropped.
+    # When the queue is full the caller runs the task itself, so that work is
+    # slowed down rather than lost; with no workers every task runs that way.
+    #
+    # shutdown() stops taking new tasks (they run in the caller) and waits up to
+    # `drain_timeout` seconds for the queued ones to finish. It is registered
+    # with atexit by the app, so a worker process that is restarted or stopped
+    # runs what its requests queued before it exits.
+
+    def __init__(self, logger, workers=2, max_queued=1000, retries=3, retry_delay=0.5, drain_timeout=30):
+        self.log = logger
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.drain_timeout = drain_timeout
+        self.workers = workers
+        self.max_queued = max_queued
+        self.stats = {'enqueued': 0, 'ran_inline': 0, 'completed': 0, 'retried': 0, 'failed': 0}
+        self.running = 0
+        self.lock = threading.Lock()
+        self.stopped = False
+        self.pid = None
+        self.queue = queue.Queue(max_queued)
+        self.threads = []
+
+    def start(self):
+        # Threads are started by the first task of each process: a worker
+        # forked from a parent that imported the app inherits none.
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.queue = queue.Queue(self.max_queued)
+                self.threads = [
+                    threading.Thread(target=self.work, name='tasks-{}'.format(i), daemon=True)
+                    for i in range(self.workers)
+                ]
+                for thread in self.threads:
+                    thread.start()
+
+    def count(self, stat, n=1):
+        with self.lock:
+            self.stats[stat] += n
+
+    def submit(self, function, *args):
+        if self.workers and not self.stopped:
+            self.start()
+            try:
+                self.queue.put_nowait((function, args))
+                self.count('enqueued')
+                return
+            except queue.Full:
+                pass
+        self.count('ran_inline')
+        self.run(function, args)
+
+    def work(self):
+        while True:
+            task = self.queue.get()
+            try:
+                if task is None:
+                    return
+                with self.lock:
+                    self.running += 1
+                self.run(*task)
+            finally:
+                if task is not None:
+                    with self.lock:
+                        self.running -= 1
+                self.queue.task_done()
+
+    def run(self, function, args):
+        name = getattr(function, '__name__', repr(function))
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                function(*args)
+            except Exception:
+                if attempt == self.retries:
+                    self.log.exception('task %s failed after %d attempts', name, attempt + 1)
+                    self.count('failed')
+                    return
+                self.log.warning('task %s failed, retrying in %.1fs', name, delay, exc_info=True)
+                self.count('retried')
+                time.sleep(delay)
+                delay *= 2
+            else:
+                self.count('completed')
+                return
+
+    def join(self):
+        # Waits for every queued task (for tests and benchmarks).
+        self.queue.join()
+
+    def shutdown(self):
+        if self.stopped or self.pid != os.getpid():
+            self.stopped = True
+            return
+        self.stopped = True
+        deadline = time.time() + self.drain_timeout
+        try:
+            for _ in self.threads:
+                # Behind every queued task; waits while the queue is full.
+                self.queue.put(None, timeout=max(deadline - time.time(), 0.001))
+        except queue.Full:
+            pass
+        for thread in self.threads:
+            thread.join(max(deadline - time.time(), 0))
+        left = sum(task is not None for task in list(self.queue.queue))
+        if left:
+            self.log.warning('%d background tasks still queued at shutdown', left)
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['running'] = self.running
+        stats['depth'] = self.queue.qsize()
+        return stats
@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its configuration when it is imported. Tests run against the
+# database in FYYUR_DATABASE_URI when it is set, which should be a disposable
+# one (its tables are created if missing, and tests add and delete rows), or
+# else a temporary SQLite file.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('FYYUR_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'fyyur.db'))
+os.environ.setdefault('FYYUR_IMAGE_PROXY_SECRET', 'test secret')
+
+
+@pytest.fixture(scope='session')
+def fyyur():
+    import app
+    with app.app.app_context():
+        app.db.create_all()
+    return app
+
+
+@pytest.fixture
+def client(fyyur):
+    return fyyur.app.test_client()
+
+
+@pytest.fixture
+def venue_and_artist(fyyur):
+    # The ids of a new venue and artist, removed with their shows afterwards.
+    app, db = fyyur.app, fyyur.db
+    with app.app_context():
+        venue = fyyur.Venue(name='Test Hall', city='Testville', state='TX', address='1 Main St',
+                            phone='555-555-5555', genres=['Jazz'], facebook_link='https://facebook.com/testhall')
+        artist = fyyur.Artist(name='Test Trio', city='Austin', state='TX', phone='555-555-5555', genres=['Jazz'],
+                              facebook_link='https://facebook.com/testtrio')
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        ids = venue.id, artist.id
+    yield ids
+    with app.app_context():
+        fyyur.Show.query.filter(db.or_(fyyur.Show.venue_id == ids[0], fyyur.Show.artist_id == ids[1])).delete()
+        fyyur.Venue.query.filter_by(id=ids[0]).delete()
+        fyyur.Artist.query.filter_by(id=ids[1]).delete()
+        db.session.commit()
+    fyyur.task_queue.join()
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import literal
+
+from plans import Fetch, fetch_all
+
+
+class CountingEngine:
+    # Stands in for an AsyncEngine: runs statements on the sync `engine` and
+    # records how many connections are open at once.
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.open = 0
+        self.most_open = 0
+
+    def connect(self):
+        return CountingConnection(self)
+
+
+class CountingConnection:
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def __aenter__(self):
+        self.engine.open += 1
+        self.engine.most_open = max(self.engine.most_open, self.engine.open)
+        # Hold the connection across a switch, as a real query would.
+        await asyncio.sleep(0.01)
+        self.connection = self.engine.engine.connect()
+        return self
+
+    async def execute(self, statement):
+        return self.connection.execute(statement)
+
+    async def __aexit__(self, *exc_info):
+        self.connection.close()
+        self.engine.open -= 1
+
+
+def test_fetches_share_at_most_max_connections(fyyur):
+    with fyyur.app.app_context():
+        engine = CountingEngine(fyyur.db.engine)
+        fetches = [Fetch(fyyur.db.session.query(literal(i)), 'scalar') for i in range(7)]
+        assert asyncio.run(fetch_all(engine, fetches, 2)) == list(range(7))
+    assert engine.most_open == 2
+
+
+async def asgi_request(application, path):
+    # The status and body of a GET request sent straight to an ASGI app.
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    path, _, query = path.partition('?')
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode(), 'headers': [],
+             'http_version': '1.1', 'scheme': 'http'}
+    await application(scope, receive, send)
+    return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+
+def asgi_get(application, path):
+    return asyncio.run(asgi_request(application, path))
+
+
+@pytest.fixture
+def venue_with_shows(fyyur):
+    app, db = fyyur.app, fyyur.db
+    with app.app_context():
+        venue = fyyur.Venue(name='Plan Hall', city='Austin', state='TX', phone='555-555-5555', genres=['Jazz'])
+        artist = fyyur.Artist(name='Plan Trio', city='Austin', state='TX', phone='555-555-5555', genres=['Jazz'])
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        now = datetime.now().replace(microsecond=0)
+        db.session.add_all([
+            fyyur.Show(name='Past', venue_id=venue.id, artist_id=artist.id, start_time=now - timedelta(days=30)),
+            fyyur.Show(name='Upcoming', venue_id=venue.id, artist_id=artist.id, start_time=now + timedelta(days=30)),
+        ])
+        db.session.commit()
+        venue_id, artist_id = venue.id, artist.id
+    yield venue_id
+    with app.app_context():
+        fyyur.Show.query.filter_by(venue_id=venue_id).delete()
+        fyyur.Venue.query.filter_by(id=venue_id).delete()
+        fyyur.Artist.query.filter_by(id=artist_id).delete()
+        db.session.commit()
+    fyyur.page_cache.invalidate(['venue:{}'.format(venue_id)])
+
+
+def test_plan_view_runs_its_fetches_on_the_loop(fyyur, venue_with_shows):
+    # An AsyncApp whose async engine is the sync one behind a counting shim,
+    # so that the dispatch runs on any database.
+    from asgi import AsyncApp
+    application = AsyncApp(fyyur.app, threads=2, plan_connections=2, async_plans=False)
+    with fyyur.app.app_context():
+        engine = CountingEngine(fyyur.db.engine)
+    application.engines = {None: engine}
+    status, body = asgi_get(application, '/venues/{}'.format(venue_with_shows))
+    assert status == 200
+    assert b'Plan Hall' in body and b'Plan Trio' in body
+    assert engine.most_open == 2
+    assert asgi_get(application, '/venues/999999')[0] == 404
+    application.executor.shutdown()
+
+
+def test_plan_views_do_not_hold_a_thread(fyyur, venue_with_shows):
+    # Four requests on a single thread: their fetches still all run at once.
+    from asgi import AsyncApp
+    application = AsyncApp(fyyur.app, threads=1, plan_connections=2, async_plans=False)
+    with fyyur.app.app_context():
+        engine = CountingEngine(fyyur.db.engine)
+    application.engines = {None: engine}
+
+    async def requests():
+        # Query strings keep the page cache out of the way.
+        return await asyncio.gather(*[
+            asgi_request(application, '/venues/{}?past_page={}'.format(venue_with_shows, i)) for i in range(1, 5)
+        ])
+    assert [status for status, _ in asyncio.run(requests())] == [200] * 4
+    assert engine.most_open == 8
+    application.executor.shutdown()
+
+
+def test_start_response_exc_info(fyyur):
+    from asgi import call_wsgi
+
+    def failing_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        try:
+            raise ValueError('broken')
+        except ValueError:
+            # Nothing is sent yet, so the error response replaces the first.
+            start_response('500 INTERNAL SERVER ERROR', [('Content-Type', 'text/plain')], sys.exc_info())
+        return [b'error']
+
+    messages = []
+    call_wsgi(failing_app, {}, messages.append)
+    assert messages[0]['status'] == 500
+    assert messages[1]['body'] == b'error'
+
+    def late_failing_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        yield b'partial'
+        try:
+            raise ValueError('broken')
+        except ValueError:
+            start_response('500 INTERNAL SERVER ERROR', [], sys.exc_info())
+
+    messages = []
+    with pytest.raises(ValueError, match='broken'):
+        call_wsgi(late_failing_app, {}, messages.append)
+    assert messages[0]['status'] == 200
+
+
+@pytest.mark.skipif(not os.environ['FYYUR_DATABASE_URI'].startswith('postgres'),
+                    reason='async engines need a Postgres FYYUR_DATABASE_URI')
+def test_plan_view_on_asyncpg(fyyur, venue_with_shows):
+    from asgi import AsyncApp
+    application = AsyncApp(fyyur.app, threads=2, plan_connections=2)
+    status, body = asgi_get(application, '/venues/{}'.format(venue_with_shows))
+    assert status == 200
+    assert b'Plan Hall' in body and b'Plan Trio' in body
+    application.executor.shutdown()
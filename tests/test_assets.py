@@ -0,0 +1,44 @@
+import gzip
+import os
+
+import assets
+
+CSS = '.quote::before { content: "/* not a comment */"; }\n/*# sourceMappingURL=a.css.map */\n'
+JS = "var url = 'http://example.com'; // a comment\nvar re = /\\/*x/;\nvar s = `a\n    b`;\n"
+
+
+def test_bundles_keep_their_sources_verbatim(tmp_path, monkeypatch):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'css' / 'a.css').write_text(CSS)
+    (tmp_path / 'js' / 'a.js').write_text(JS)
+    monkeypatch.setattr(assets, 'BUNDLES', {'css/site.css': ['css/a.css'], 'js/site.js': ['js/a.js']})
+    manifest = assets.build(str(tmp_path))
+    css = (tmp_path / manifest['css/site.css']).read_text()
+    js = (tmp_path / manifest['js/site.js']).read_text()
+    assert css == CSS.splitlines()[0]
+    assert js == JS.rstrip('\n')
+    assert gzip.decompress((tmp_path / (manifest['js/site.js'] + '.gz')).read_bytes()).decode() == js
+
+
+def test_gzipped_assets_are_served_inline_with_their_own_type(fyyur, client, tmp_path, monkeypatch):
+    dist = tmp_path / fyyur.app.config['ASSET_DIST'] / 'css'
+    dist.mkdir(parents=True)
+    (dist / 'site.0123456789ab.css').write_text(CSS)
+    (dist / 'site.0123456789ab.css.gz').write_bytes(gzip.compress(CSS.encode()))
+    monkeypatch.setattr(fyyur.app, 'static_folder', str(tmp_path))
+    path = '/static/{}/css/site.0123456789ab.css'.format(fyyur.app.config['ASSET_DIST'])
+
+    response = client.get(path, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.content_encoding == 'gzip'
+    assert response.mimetype == 'text/css'
+    assert 'Content-Disposition' not in response.headers
+    assert gzip.decompress(response.get_data()).decode() == CSS
+    response.close()
+
+    response = client.get(path)
+    assert response.content_encoding is None
+    assert response.mimetype == 'text/css'
+    assert response.get_data(as_text=True) == CSS
+    response.close()
@@ -0,0 +1,14 @@
+def test_typeahead_matches_escaped_name_prefixes(fyyur, client, venue_and_artist):
+    venue_id, _ = venue_and_artist
+    fyyur.choice_lookups['venue'].invalidate()
+
+    def names(term):
+        response = client.get('/shows/choices/venue', query_string={'q': term})
+        return [item['name'] for item in response.get_json()]
+
+    assert 'Test Hall' in names('test h')
+    assert 'Test Hall' not in names('hall')
+    assert 'Test Hall' not in names('te_t')
+    assert 'Test Hall' not in names('%hall')
+    with fyyur.app.app_context():
+        assert fyyur.choice_lookups['venue'].choices(venue_id, 999999) == [(venue_id, 'Test Hall')]
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+
+def counts(fyyur, model, row_id):
+    return fyyur.db.session.query(model.upcoming_shows_count, model.past_shows_count).filter(model.id == row_id).one()
+
+
+def test_show_writes_keep_the_counts_current(fyyur, venue_and_artist):
+    venue_id, artist_id = venue_and_artist
+    now = datetime.now()
+    with fyyur.app.app_context():
+        db, Show = fyyur.db, fyyur.Show
+        past = Show(name='Past', venue_id=venue_id, artist_id=artist_id, start_time=now - timedelta(days=1))
+        upcoming = Show(name='Upcoming', venue_id=venue_id, artist_id=artist_id, start_time=now + timedelta(days=1))
+        db.session.add_all([past, upcoming])
+        db.session.commit()
+        assert counts(fyyur, fyyur.Venue, venue_id) == (1, 1)
+        assert counts(fyyur, fyyur.Artist, artist_id) == (1, 1)
+
+        upcoming.start_time = now - timedelta(days=2)
+        db.session.commit()
+        assert counts(fyyur, fyyur.Venue, venue_id) == (0, 2)
+
+        db.session.delete(past)
+        db.session.commit()
+        assert counts(fyyur, fyyur.Artist, artist_id) == (0, 1)
+
+
+def test_a_show_starting_at_the_roll_counts_as_upcoming(fyyur, venue_and_artist):
+    # As the detail pages list it: upcoming while start_time >= now.
+    venue_id, artist_id = venue_and_artist
+    at = datetime.now().replace(microsecond=0) + timedelta(hours=1)
+    with fyyur.app.app_context():
+        db = fyyur.db
+        db.session.add(fyyur.Show(name='On the hour', venue_id=venue_id, artist_id=artist_id, start_time=at))
+        db.session.commit()
+        try:
+            fyyur.roll_show_counts(at)
+            assert counts(fyyur, fyyur.Venue, venue_id) == (1, 0)
+            fyyur.roll_show_counts(at, recount=True)
+            assert counts(fyyur, fyyur.Venue, venue_id) == (1, 0)
+            fyyur.roll_show_counts(at + timedelta(seconds=1))
+            assert counts(fyyur, fyyur.Venue, venue_id) == (0, 1)
+        finally:
+            fyyur.roll_show_counts(datetime.now(), recount=True)
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+
+def test_bulk_delete_removes_rows_and_their_shows(fyyur, client, venue_and_artist):
+    venue_id, artist_id = venue_and_artist
+    with fyyur.app.app_context():
+        other = fyyur.Venue(name='Other Hall', city='Austin', state='TX', phone='555-555-5555', genres=['Jazz'])
+        fyyur.db.session.add(other)
+        fyyur.db.session.flush()
+        fyyur.db.session.add_all([
+            fyyur.Show(name='Set {}'.format(i), venue_id=row_id, artist_id=artist_id,
+                       start_time=datetime.now() + timedelta(days=i))
+            for i, row_id in enumerate([venue_id, venue_id, other.id])
+        ])
+        fyyur.db.session.commit()
+        other_id = other.id
+
+    response = client.post('/api/v1/venues/delete', json={'ids': [venue_id, other_id, 999999]})
+    assert response.status_code == 200
+    assert response.get_json() == {'deleted': {'venues': 2, 'shows': 3}}
+    with fyyur.app.app_context():
+        assert fyyur.Venue.query.filter(fyyur.Venue.id.in_([venue_id, other_id])).count() == 0
+        assert fyyur.Show.query.filter_by(artist_id=artist_id).count() == 0
+        assert fyyur.Artist.query.get(artist_id) is not None
+
+
+def test_bulk_delete_rejects_bad_and_oversized_batches(fyyur, client, venue_and_artist):
+    venue_id, _ = venue_and_artist
+    assert client.post('/api/v1/venues/delete', json={'ids': [str(venue_id)]}).status_code == 400
+    limit = fyyur.app.config['DELETE_BATCH_SIZE']
+    response = client.post('/api/v1/venues/delete', json={'ids': [venue_id] + list(range(-limit, 0))})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'at most {} ids per request'.format(limit)}
+    with fyyur.app.app_context():
+        assert fyyur.Venue.query.get(venue_id) is not None
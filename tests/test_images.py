@@ -0,0 +1,197 @@
+import io
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+from images import ImageError, ImageProxy
+
+SIZES = {'small': 20, 'large': 60}
+
+
+def image_bytes(fmt='JPEG', size=(120, 80)):
+    out = io.BytesIO()
+    Image.linear_gradient('L').resize(size).convert('RGB').save(out, fmt)
+    return out.getvalue()
+
+
+class ImageHost(BaseHTTPRequestHandler):
+    # Local stand-in for the image hosts: serves `routes` ({path: (content
+    # type, body)}) and counts requests per path in `hits`.
+    routes = {}
+    hits = {}
+
+    def do_GET(self):
+        self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        content_type, body = self.routes.get(self.path, ('text/plain', b'not found'))
+        self.send_response(200 if self.path in self.routes else 404)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def host():
+    ImageHost.routes = {'/photo.jpg': ('image/jpeg', image_bytes())}
+    ImageHost.hits = {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHost)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:{}'.format(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_proxy(tmp_path):
+    proxies = []
+
+    def make(name='cache', max_bytes=10 * 1024 * 1024, **options):
+        proxy = ImageProxy(str(tmp_path / name), SIZES, b'secret', max_bytes, workers=2, timeout=5, **options)
+        proxies.append(proxy)
+        return proxy
+    yield make
+    for proxy in proxies:
+        proxy.executor.shutdown()
+
+
+def test_signature_covers_the_url_and_the_secret(make_proxy):
+    proxy = make_proxy()
+    url = 'https://images.example.com/a.jpg'
+    signature = proxy.sign(url)
+    assert proxy.verify(url, signature)
+    assert not proxy.verify(url + '?x', signature)
+    assert not proxy.verify(url, signature[:-1] + ('0' if signature[-1] != '0' else '1'))
+    other = ImageProxy(proxy.directory, SIZES, b'other secret', proxy.max_bytes)
+    assert not other.verify(url, signature)
+    other.executor.shutdown()
+
+
+def test_app_starts_without_a_secret():
+    env = dict(os.environ, FYYUR_IMAGE_PROXY_SECRET='')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = 'import app; assert app.image_proxy is None'
+    result = subprocess.run([sys.executable, '-c', script], cwd=root, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_without_a_proxy_pages_link_the_source(fyyur, client, monkeypatch, caplog):
+    monkeypatch.setattr(fyyur, 'image_proxy', None)
+    fyyur.warn_image_proxy_disabled.cache_clear()
+    url = 'https://images.example.com/a.jpg'
+    with fyyur.app.test_request_context():
+        assert fyyur.thumbnail_url(url) == url
+        assert fyyur.thumbnail_url(url, 'large') == url
+    assert [record.levelname for record in caplog.records if 'image proxy disabled' in record.message] == ['WARNING']
+    assert client.get('/images/small/0123', query_string={'url': url}).status_code == 404
+    fyyur.warn_image_proxy_disabled.cache_clear()
+
+
+def test_route_rejects_bad_signatures_and_sizes(fyyur, client):
+    url = 'https://images.example.com/a.jpg'
+    signature = fyyur.image_proxy.sign(url)
+    assert client.get('/images/small/{}'.format(signature), query_string={'url': url + 'x'}).status_code == 404
+    assert client.get('/images/huge/{}'.format(signature), query_string={'url': url}).status_code == 404
+
+
+def test_source_is_fetched_once_in_every_size(make_proxy, host):
+    proxy = make_proxy(allow_private=True)
+    url = host + '/photo.jpg'
+    thumbnails = {size: proxy.thumbnail(url, size, wait=5) for size in SIZES}
+    for size, side in SIZES.items():
+        assert max(Image.open(io.BytesIO(thumbnails[size])).size) == side
+    assert proxy.thumbnail(url, 'small', wait=5) == thumbnails['small']
+    assert ImageHost.hits == {'/photo.jpg': 1}
+
+
+def test_private_addresses_are_refused(make_proxy, host):
+    proxy = make_proxy()
+    with pytest.raises(ImageError, match='non-public'):
+        proxy.thumbnail(host + '/photo.jpg', 'small', wait=5)
+    assert ImageHost.hits == {}
+
+
+def test_connection_goes_to_the_address_checked(make_proxy, monkeypatch):
+    # A host that resolves to a public address for the check and a private one
+    # afterwards (DNS rebinding) is only ever connected to at the first.
+    resolved = []
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        address = '93.184.216.34' if not resolved else '127.0.0.1'
+        resolved.append(address)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, port))]
+
+    connected = []
+
+    def create_connection(address, *args, **kwargs):
+        connected.append(address)
+        raise ConnectionRefusedError('test')
+
+    monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+    monkeypatch.setattr(socket, 'create_connection', create_connection)
+    proxy = make_proxy()
+    with pytest.raises(ImageError):
+        proxy.thumbnail('http://rebinding.example.com/photo.jpg', 'small', wait=5)
+    assert connected == [('93.184.216.34', 80)]
+    assert resolved == ['93.184.216.34']
+
+
+def test_sources_over_the_size_limit_are_refused(make_proxy, host):
+    proxy = make_proxy(allow_private=True, max_source_bytes=100)
+    with pytest.raises(ImageError, match='larger than 100 bytes'):
+        proxy.thumbnail(host + '/photo.jpg', 'small', wait=5)
+
+
+@pytest.mark.parametrize('content_type, body, message', [
+    ('text/html', b'<html></html>', 'not an image'),
+    ('image/bmp', image_bytes('BMP'), 'cannot identify'),
+    ('image/jpeg', b'not really a jpeg', 'cannot identify'),
+])
+def test_sources_of_other_types_are_refused(make_proxy, host, content_type, body, message):
+    ImageHost.routes['/other'] = (content_type, body)
+    proxy = make_proxy(allow_private=True)
+    with pytest.raises(ImageError, match=message):
+        proxy.thumbnail(host + '/other', 'small', wait=5)
+    assert not os.listdir(proxy.directory)
+
+
+def test_failures_are_remembered(make_proxy, host):
+    proxy = make_proxy(allow_private=True, retry_after=60)
+    for _ in range(2):
+        with pytest.raises(ImageError):
+            proxy.thumbnail(host + '/missing.jpg', 'small', wait=5)
+    assert ImageHost.hits == {'/missing.jpg': 1}
+
+
+def test_cache_hits_and_least_recently_read_eviction(make_proxy, host):
+    for name in ('a', 'b', 'c'):
+        ImageHost.routes['/{}.jpg'.format(name)] = ImageHost.routes['/photo.jpg']
+    measure = make_proxy('measure', allow_private=True)
+    measure.thumbnail(host + '/photo.jpg', 'small', wait=5)
+    per_source = sum(entry.stat().st_size for entry in os.scandir(measure.directory))
+
+    proxy = make_proxy(max_bytes=int(per_source * 2.5), allow_private=True)
+    a, b, c = (host + '/{}.jpg'.format(name) for name in 'abc')
+    proxy.thumbnail(a, 'small', wait=5)
+    proxy.thumbnail(b, 'small', wait=5)
+    now = time.time()
+    for url, age in ((a, 50), (b, 100)):
+        for size in SIZES:
+            os.utime(proxy.path(url, size), (now - age, now - age))
+    # A cache hit: served from disk and marked as read.
+    proxy.thumbnail(a, 'large', wait=5)
+    assert ImageHost.hits['/a.jpg'] == 1
+
+    proxy.thumbnail(c, 'small', wait=5)
+    assert all(os.path.exists(proxy.path(url, size)) for url in (a, c) for size in SIZES)
+    assert not all(os.path.exists(proxy.path(b, size)) for size in SIZES)
+    assert sum(entry.stat().st_size for entry in os.scandir(proxy.directory)) <= proxy.max_bytes
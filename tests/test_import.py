@@ -0,0 +1,98 @@
+import csv
+import json
+
+import pytest
+
+VENUE_COLUMNS = ['name', 'city', 'state', 'address', 'phone', 'genres', 'facebook_link']
+
+
+def venue_row(i):
+    return ['Import Hall {}'.format(i), 'Importville', 'TX', '{} Main St'.format(i), '555-555-5555', 'Jazz,Blues',
+            'https://facebook.com/importhall{}'.format(i)]
+
+
+@pytest.fixture
+def imported(fyyur):
+    # Names of the venues imported into Importville, removed with their shows
+    # and the import checkpoints afterwards.
+    app, db = fyyur.app, fyyur.db
+
+    def names():
+        with app.app_context():
+            return [name for name, in db.session.query(fyyur.Venue.name).filter_by(city='Importville')
+                    .order_by(fyyur.Venue.name)]
+    yield names
+    with app.app_context():
+        ids = [venue_id for venue_id, in db.session.query(fyyur.Venue.id).filter_by(city='Importville')]
+        fyyur.delete_rows('venues', ids)
+        fyyur.ImportCheckpoint.query.delete()
+        db.session.commit()
+
+
+def run_import(fyyur, *args):
+    return fyyur.app.test_cli_runner().invoke(args=['import'] + [str(arg) for arg in args])
+
+
+def test_interrupted_import_resumes_after_the_last_committed_batch(fyyur, imported, tmp_path, monkeypatch):
+    path = tmp_path / 'venues.csv'
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(VENUE_COLUMNS)
+        writer.writerows(venue_row(i) for i in range(5))
+
+    # The second batch fails before its commit.
+    spec = fyyur.IMPORT_SPECS['venues']
+    calls = []
+
+    def changed(values):
+        calls.append(values)
+        if len(calls) == 2:
+            raise RuntimeError('connection lost')
+        spec.changed(values)
+    monkeypatch.setitem(fyyur.IMPORT_SPECS, 'venues', spec._replace(changed=changed))
+    result = run_import(fyyur, 'venues', path, '--batch-size', 2)
+    assert isinstance(result.exception, RuntimeError)
+    assert imported() == ['Import Hall 0', 'Import Hall 1']
+
+    monkeypatch.setitem(fyyur.IMPORT_SPECS, 'venues', spec)
+    result = run_import(fyyur, 'venues', path, '--batch-size', 2)
+    assert result.exit_code == 0, result.output
+    assert 'Resumed after 2 rows already imported.' in result.output
+    assert 'Done: 3 venues imported, 0 rejected.' in result.output
+    assert imported() == ['Import Hall {}'.format(i) for i in range(5)]
+
+    result = run_import(fyyur, 'venues', path, '--batch-size', 2)
+    assert 'Done: 0 venues imported' in result.output
+    assert len(imported()) == 5
+
+
+def test_rejected_rows_are_reported_and_the_rest_imported(fyyur, imported, tmp_path, venue_and_artist):
+    venues = tmp_path / 'venues.jsonl'
+    rows = [dict(zip(VENUE_COLUMNS, venue_row(0))), dict(zip(VENUE_COLUMNS, venue_row(1)), phone='not a phone')]
+    venues.write_text('\n'.join([json.dumps(rows[0]), '{"name": ', json.dumps(rows[1]), '[1, 2]']) + '\n')
+    result = run_import(fyyur, 'venues', venues)
+    assert result.exit_code == 0, result.output
+    assert 'Done: 1 venues imported, 3 rejected' in result.output
+    assert imported() == ['Import Hall 0']
+    rejects = [json.loads(line) for line in open(str(venues) + '.rejected.jsonl')]
+    assert [reject['line'] for reject in rejects] == [2, 3, 4]
+    assert rejects[0]['errors']['__all__'][0].startswith('invalid JSON')
+    assert rejects[1]['errors'] == {'phone': ['Invalid phone number.']}
+    assert rejects[2]['errors'] == {'__all__': ['expected a JSON object']}
+
+    _, artist_id = venue_and_artist
+    shows = tmp_path / 'shows.csv'
+    shows.write_text(
+        'name,start_time,end_time,artist_id,venue\n'
+        'Ok,2031-06-01 20:00:00,,{0},Import Hall 0\n'
+        'No venue,2031-06-01 20:00:00,,{0},Nowhere\n'
+        'Backwards,2031-06-01 20:00:00,2031-06-01 19:00:00,{0},Import Hall 0\n'.format(artist_id)
+    )
+    result = run_import(fyyur, 'shows', shows, '--rejects', tmp_path / 'rejects.jsonl')
+    assert 'Done: 1 shows imported, 2 rejected' in result.output
+    rejects = [json.loads(line) for line in open(tmp_path / 'rejects.jsonl')]
+    assert [reject['row']['name'] for reject in rejects] == ['No venue', 'Backwards']
+    assert rejects[0]['errors'] == {'venue_id': ["No venue named 'Nowhere'."]}
+    assert rejects[1]['errors'] == {'end_time': ['The show must end after it starts.']}
+    with fyyur.app.app_context():
+        assert [name for name, in fyyur.db.session.query(fyyur.Show.name).filter_by(artist_id=artist_id)] == ['Ok']
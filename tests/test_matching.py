@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from matching import MAX_GENRES, MatchIndex, popcount
+
+WEIGHTS = {'genres': 1.0, 'city': 0.0, 'state': 0.0, 'history': 0.0}
+
+
+@pytest.mark.parametrize('native', [True, False])
+def test_popcount_counts_every_byte(monkeypatch, native):
+    if not native:
+        monkeypatch.delattr(np, 'bitwise_count', raising=False)
+    values = np.array([0, 1, 0xff, 1 << 40, (1 << 64) - 1, 0x8000000000000001], dtype=np.uint64)
+    assert popcount(values).tolist() == [bin(int(value)).count('1') for value in values]
+    assert popcount(values & np.uint64(0xffffff), 3).tolist() == [0, 1, 8, 0, 24, 1]
+
+
+def test_genres_beyond_32_are_ranked():
+    genres = ['genre {}'.format(i) for i in range(MAX_GENRES)]
+    rows = [
+        (1, genres[60:64], 'Austin', 'TX', True),
+        (2, genres[:2] + genres[63:], 'Austin', 'TX', True),
+        (3, genres[:4], 'Austin', 'TX', True),
+    ]
+    index = MatchIndex(lambda ids: rows, genres)
+    page, total = index.rank(genres[60:64], 'Austin', 'TX', {}, WEIGHTS, 0, 3)
+    assert total == 3
+    assert [(row_id, score, shared) for row_id, score, shared, _ in page] == [
+        (1, 1.0, genres[60:64]),
+        (2, 0.25, genres[63:]),
+        (3, 0.0, []),
+    ]
+
+
+def test_more_genres_than_bits_are_refused():
+    with pytest.raises(ValueError):
+        MatchIndex(lambda ids: [], ['genre {}'.format(i) for i in range(MAX_GENRES + 1)])
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.mark.parametrize('path', ['/venues/999999', '/artists/999999', '/shows/999999'])
+def test_missing_rows_are_404s_and_not_cached(client, path):
+    for _ in range(2):
+        response = client.get(path)
+        assert response.status_code == 404
+        assert 'X-Cache' not in response.headers
+
+
+def test_sql_debug_endpoint_is_off_by_default(fyyur, client):
+    assert not fyyur.app.config['SQL_STATS_ENDPOINT']
+    assert client.get('/debug/sql').status_code == 404
+
+
+def test_editing_a_venue_drops_the_pages_of_its_artists(fyyur, client, venue_and_artist):
+    venue_id, artist_id = venue_and_artist
+    with fyyur.app.app_context():
+        fyyur.db.session.add(fyyur.Show(name='Late Set', venue_id=venue_id, artist_id=artist_id,
+                                        start_time=datetime.now() + timedelta(days=7)))
+        fyyur.db.session.commit()
+    fyyur.task_queue.join()
+    path = '/artists/{}'.format(artist_id)
+    assert client.get(path).headers['X-Cache'] == 'MISS'
+    assert client.get(path).headers['X-Cache'] == 'HIT'
+    response = client.post('/venues/{}/edit'.format(venue_id), data={
+        'name': 'Renamed Hall', 'city': 'Testville', 'state': 'TX', 'address': '1 Main St', 'phone': '555-555-5555',
+        'genres': 'Jazz', 'facebook_link': 'https://facebook.com/testhall',
+    }, follow_redirects=True)
+    assert b'Renamed Hall was successfully updated' in response.data
+    fyyur.task_queue.join()
+    response = client.get(path)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert b'Renamed Hall' in response.data
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+EVENING = datetime(2031, 5, 9, 20, 0)
+
+
+def times(start_hour, end_hour):
+    return {'start_time': EVENING.replace(hour=start_hour).strftime('%Y-%m-%d %H:%M:%S'),
+            'end_time': EVENING.replace(hour=end_hour).strftime('%Y-%m-%d %H:%M:%S')}
+
+
+@pytest.fixture
+def book(fyyur, client, venue_and_artist):
+    # Posts the show form for the fixture's venue and artist, following the
+    # redirect, and returns the page it ends on.
+    venue_id, artist_id = venue_and_artist
+    fyyur.choice_lookups['venue'].invalidate()
+    fyyur.choice_lookups['artist'].invalidate()
+
+    def book(name, start_hour, end_hour, show_id=None):
+        path = '/shows/create' if show_id is None else '/shows/{}/edit'.format(show_id)
+        data = dict(times(start_hour, end_hour), name=name, venue_id=venue_id, artist_id=artist_id)
+        return client.post(path, data=data, follow_redirects=True).data.decode()
+    return book
+
+
+def booked(fyyur, venue_id):
+    with fyyur.app.app_context():
+        return [(show.name, show.start_time.hour, show.end_time.hour)
+                for show in fyyur.Show.query.filter_by(venue_id=venue_id).order_by(fyyur.Show.start_time)]
+
+
+def show_ids(fyyur, venue_id):
+    with fyyur.app.app_context():
+        return fyyur.Show.query.filter_by(venue_id=venue_id).with_entities(fyyur.Show.id, fyyur.Show.name).all()
+
+
+def test_overlapping_booking_is_refused(fyyur, book, venue_and_artist):
+    assert 'Show was successfully listed!' in book('Headliner', 20, 22)
+    page = book('Interloper', 21, 23)
+    assert 'The venue is already booked from 2031-05-09 20:00 to 2031-05-09 22:00 for Headliner.' in page
+    assert booked(fyyur, venue_and_artist[0]) == [('Headliner', 20, 22)]
+
+
+def test_back_to_back_bookings_are_allowed(fyyur, book, venue_and_artist):
+    assert 'Show was successfully listed!' in book('Opener', 18, 20)
+    assert 'Show was successfully listed!' in book('Headliner', 20, 22)
+    assert booked(fyyur, venue_and_artist[0]) == [('Opener', 18, 20), ('Headliner', 20, 22)]
+
+
+def test_editing_a_show_does_not_conflict_with_itself(fyyur, book, venue_and_artist):
+    book('Headliner', 20, 22)
+    book('Late Set', 22, 23)
+    show_id = next(show_id for show_id, name in show_ids(fyyur, venue_and_artist[0]) if name == 'Headliner')
+    assert 'already booked' not in book('Headliner', 19, 22, show_id)
+    assert 'already booked' in book('Headliner', 19, 23, show_id)
+    assert booked(fyyur, venue_and_artist[0]) == [('Headliner', 19, 22), ('Late Set', 22, 23)]
+
+
+def test_window_filters(fyyur, client, book, venue_and_artist):
+    venue_id, _ = venue_and_artist
+    book('Headliner', 20, 22)
+
+    def window(path, start_hour, end_hour, **filters):
+        bounds = times(start_hour, end_hour)
+        response = client.get(path, query_string=dict(filters, **{'from': bounds['start_time'], 'to': bounds['end_time']}))
+        return response.status_code, response.get_json()
+
+    status, shows = window('/api/v1/shows', 21, 23, venue_id=venue_id)
+    assert status == 200 and [show['show_name'] for show in shows['data']] == ['Headliner']
+    assert window('/api/v1/shows', 22, 23, venue_id=venue_id)[1]['data'] == []
+
+    status, venues = window('/api/v1/venues/available', 18, 20, state='TX', city='Testville')
+    assert status == 200 and venue_id in [venue['id'] for venue in venues['data']]
+    status, venues = window('/api/v1/venues/available', 21, 22, state='TX', city='Testville')
+    assert venue_id not in [venue['id'] for venue in venues['data']]
+
+    assert window('/api/v1/shows', 22, 21)[0] == 400
+    assert client.get('/api/v1/venues/available', query_string={'from': '2031-05-09'}).status_code == 400
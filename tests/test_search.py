@@ -0,0 +1,44 @@
+import pytest
+
+
+@pytest.fixture
+def searchable(fyyur):
+    # A venue and an artist with a show between them, removed afterwards.
+    app, db = fyyur.app, fyyur.db
+    with app.app_context():
+        venue = fyyur.Venue(name='The 100% Lounge', city='San Francisco', state='CA', phone='555-555-5555',
+                            genres=['Jazz'])
+        artist = fyyur.Artist(name='Quokkaphonic', city='Oakland', state='CA', phone='555-555-5555', genres=['Funk'])
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        ids = venue.id, artist.id
+    yield ids
+    with app.app_context():
+        fyyur.Venue.query.filter_by(id=ids[0]).delete()
+        fyyur.Artist.query.filter_by(id=ids[1]).delete()
+        db.session.commit()
+
+
+def search(client, kind, term):
+    response = client.post('/{}/search'.format(kind), data={'search_term': term})
+    assert response.status_code == 200
+    return response.data.decode()
+
+
+@pytest.mark.parametrize('term, found', [
+    ('lounge', True),         # a word of the name
+    ('fran', True),           # a word prefix of the city
+    ('ranc', False),          # mid-word in the city, which is only prefix matched
+    ('ounge', True),          # mid-word in the name
+    ('100%', True),           # LIKE wildcards are taken literally
+    ('1%0', False),
+    ('san francisco ca', True),
+    ('san quokka', False),    # every word must match
+])
+def test_venue_search_matches_the_same_on_every_database(client, searchable, term, found):
+    assert ('The 100% Lounge' in search(client, 'venues', term)) is found
+
+
+def test_artist_search_matches_mid_word_in_the_name(client, searchable):
+    assert 'Quokkaphonic' in search(client, 'artists', 'kkapho')
+    assert 'Quokkaphonic' not in search(client, 'artists', 'akland')